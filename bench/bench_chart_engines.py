@@ -0,0 +1,78 @@
+"""
+Бенчмарк движков рендера простых графиков: Pillow (bot.services.plots_fast)
+vs matplotlib (bot.services.plots) на тех же данных.
+
+Каждый движок меряется в отдельном (spawn) процессе:
+- время импорта модуля рендера (для matplotlib - вместе с pyplot);
+- медиана / p95 времени рендера недельного и дневного графика;
+- размер PNG;
+- прирост RSS процесса (импорт + рендеры).
+
+Запуск из корня репозитория:
+    python -m bench.bench_chart_engines --repeats 30
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+
+from bench.bench_chart_render import _week_payload
+from bench.bench_food_catalog import _in_fresh_process, _rss_kb
+
+DAY_PAYLOAD = {"water_ml": 1200, "water_goal_ml": 2300, "calories_in": 1800.5, "calorie_goal": 2100}
+
+
+def _measure(engine: str, repeats: int) -> dict:
+    rss0 = _rss_kb()
+    t0 = time.perf_counter()
+    from bot.services.charts import render_chart
+
+    if engine == "matplotlib":
+        from bot.services import plots
+
+        plots._pyplot()
+    else:
+        from bot.services import plots_fast
+
+        plots_fast.warmup()
+    result = {"import_ms": (time.perf_counter() - t0) * 1000}
+
+    for kind, payload in (("week", _week_payload(1)), ("day", DAY_PAYLOAD)):
+        # Первый рендер (кэши шрифтов и т.п.) - отдельно
+        t0 = time.perf_counter()
+        png = render_chart(kind, payload, engine)
+        first = (time.perf_counter() - t0) * 1000
+
+        samples = []
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            render_chart(kind, payload, engine)
+            samples.append((time.perf_counter() - t0) * 1000)
+        samples.sort()
+        result[kind] = (first, statistics.median(samples), samples[max(0, int(len(samples) * 0.95) - 1)], len(png))
+
+    result["rss_kib"] = _rss_kb() - rss0
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeats", type=int, default=30)
+    args = parser.parse_args()
+
+    results = {engine: _in_fresh_process(_measure, engine, args.repeats) for engine in ("fast", "matplotlib")}
+
+    print(f"{'engine':<12}{'import, ms':>12}{'RSS +KiB':>12}")
+    for engine, r in results.items():
+        print(f"{engine:<12}{r['import_ms']:>12.1f}{r['rss_kib']:>12}")
+    print()
+    print(f"{'chart':<8}{'engine':<12}{'first, ms':>11}{'median, ms':>12}{'p95, ms':>10}{'PNG, KiB':>10}")
+    for kind in ("week", "day"):
+        for engine, r in results.items():
+            first, median, p95, size = r[kind]
+            print(f"{kind:<8}{engine:<12}{first:>11.1f}{median:>12.1f}{p95:>10.1f}{size / 1024:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Бенчмарк рендера графиков при параллельных запросах: насколько стоит event loop.
+
+Варианты:
+- inline - рендер прямо в корутине (как было в хэндлерах): loop стоит всё время рендера;
+- thread - asyncio.to_thread: loop свободен, но рендер держит GIL;
+- process pool - ChartRenderer (bot.services.charts), прогретые процессы.
+
+Параллельно с графиками крутится «пульс» - корутина, которая просыпается каждые
+--tick-ms мс и записывает, на сколько опоздала. Опоздание = время, когда loop
+не мог обработать апдейты других пользователей.
+
+Запуск из корня репозитория:
+    python -m bench.bench_chart_render --charts 20 --workers 2
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import date, timedelta
+
+from bot.services.charts import ChartRenderer, render_chart
+
+
+def _week_payload(i: int) -> dict:
+    days = [date.today() - timedelta(days=d) for d in range(6, -1, -1)]
+    return {
+        "dates": days,
+        "water": [1500 + 100 * ((d + i) % 5) for d in range(7)],
+        "cal_in": [1800.0 + 50 * ((d * i) % 7) for d in range(7)],
+        "cal_out": [300.0 + 20 * d for d in range(7)],
+    }
+
+
+async def _heartbeat(tick_s: float, lags: list[float], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        await asyncio.sleep(tick_s)
+        lags.append(max(0.0, time.perf_counter() - t0 - tick_s) * 1000.0)
+
+
+async def _run(render, charts: int, tick_s: float) -> tuple[float, list[float]]:
+    """
+    charts параллельных рендеров недельного графика; (время всей пачки в с, опоздания пульса в мс).
+    """
+    lags: list[float] = []
+    stop = asyncio.Event()
+    beat = asyncio.create_task(_heartbeat(tick_s, lags, stop))
+    await asyncio.sleep(tick_s * 3)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(render("week", _week_payload(i)) for i in range(charts)))
+    wall = time.perf_counter() - t0
+
+    stop.set()
+    await beat
+    return wall, lags
+
+
+def _report(title: str, charts: int, wall: float, lags: list[float]) -> None:
+    lags = sorted(lags)
+    p99 = lags[min(len(lags) - 1, int(len(lags) * 0.99))]
+    print(
+        f"{title:<14} {charts / wall:6.1f} charts/s   loop lag: median={statistics.median(lags):7.1f} ms  "
+        f"p99={p99:7.1f} ms  max={lags[-1]:7.1f} ms"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--charts", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--tick-ms", type=float, default=5.0)
+    args = parser.parse_args()
+    tick_s = args.tick_ms / 1000.0
+
+    async def inline(kind: str, payload: dict) -> bytes:
+        return render_chart(kind, payload)
+
+    async def thread(kind: str, payload: dict) -> bytes:
+        return await asyncio.to_thread(render_chart, kind, payload)
+
+    # Прогрев импорта matplotlib в этом процессе - чтобы inline / thread не платили за него
+    render_chart("week", _week_payload(0))
+
+    renderer = ChartRenderer(args.workers, max_pending=args.charts, timeout_s=60.0)
+    t0 = time.perf_counter()
+    await renderer.start()
+    print(f"process pool: {args.workers} workers warmed up in {time.perf_counter() - t0:.2f} s")
+
+    try:
+        for title, render in (("inline", inline), ("thread", thread), ("process pool", renderer.render)):
+            wall, lags = await _run(render, args.charts, tick_s)
+            _report(title, args.charts, wall, lags)
+    finally:
+        renderer.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,146 @@
+"""
+Бенчмарк офлайн-справочника продуктов (bot.services.food_catalog):
+mmap-файл с trigram/префиксным индексом vs «наивный» справочник - CSV,
+прочитанный в список Python-объектов, и линейный поиск подстроки.
+
+Генерирует синтетический CSV (по умолчанию 100k продуктов, по 2 синонима),
+собирает бинарник и меряет:
+- время сборки и размер файла;
+- время загрузки (открытие + первый поиск) и прирост RSS процесса;
+- медианную / p95 латентность поиска по запросам (точные, префиксы, опечатки).
+
+Запуск из корня репозитория:
+    python -m bench.bench_food_catalog --items 100000
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import multiprocessing
+import os
+import statistics
+import tempfile
+import time
+
+from bench.bench_food_search import QUERIES, _fake_names
+from bot.db import fts
+from bot.services.food_catalog import FoodCatalog, build_catalog, read_csv
+
+
+def _rss_kb() -> int:
+    """
+    Текущий RSS процесса (Linux, /proc); 0, если недоступно.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def _write_csv(path: str, n: int) -> None:
+    names = _fake_names(n)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["name_ru", "name_en", "aliases", "kcal_per_100g"])
+        for i, name in enumerate(names):
+            w.writerow([name, f"item {i}", f"{name} вариант;alias {i}", 50 + i % 400])
+
+
+def _naive_search(items: list[tuple[str, list[str], float]], query: str, limit: int = 5) -> list[dict]:
+    """
+    Базовая линия: полный проход по всем ключам с проверкой подстрок.
+    """
+    q = fts.normalize(query)
+    words = q.split()
+    found = [
+        (fts.rank_key(k, q), name, kcal)
+        for name, keys, kcal in items
+        for k in keys
+        if all(w in k for w in words)
+    ]
+    found.sort(key=lambda t: t[0])
+    return [{"name": name, "kcal_per_100g": kcal} for _, name, kcal in found[:limit]]
+
+
+def _latency(search, repeats: int) -> dict[str, tuple[float, float]]:
+    """
+    (медиана, p95) латентности в микросекундах по каждому запросу.
+    """
+    result = {}
+    for q in QUERIES:
+        samples = []
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            search(q)
+            samples.append((time.perf_counter() - t0) * 1e6)
+        samples.sort()
+        result[q] = (statistics.median(samples), samples[max(0, int(len(samples) * 0.95) - 1)])
+    return result
+
+
+def _measure_mmap(bin_path: str, repeats: int) -> tuple[float, int, dict]:
+    rss0 = _rss_kb()
+    t0 = time.perf_counter()
+    catalog = FoodCatalog(bin_path)
+    catalog.search(QUERIES[0])
+    load_ms = (time.perf_counter() - t0) * 1000
+    latency = _latency(catalog.search, repeats)
+    # RSS после всех поисков: сюда входят и прочитанные страницы файла (page cache, общий)
+    rss = _rss_kb() - rss0
+    catalog.close()
+    return load_ms, rss, latency
+
+
+def _measure_naive(csv_path: str, repeats: int) -> tuple[float, int, dict]:
+    rss0 = _rss_kb()
+    t0 = time.perf_counter()
+    items = read_csv(csv_path)
+    load_ms = (time.perf_counter() - t0) * 1000
+    latency = _latency(lambda q: _naive_search(items, q), repeats)
+    return load_ms, _rss_kb() - rss0, latency
+
+
+def _in_fresh_process(fn, *args):
+    """
+    Замер в отдельном (spawn) процессе - RSS не искажён мусором от сборки и другого варианта.
+    """
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        return pool.apply(fn, args)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=100_000)
+    parser.add_argument("--repeats", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "catalog.csv")
+        bin_path = os.path.join(tmp, "catalog.bin")
+        _write_csv(csv_path, args.items)
+
+        t0 = time.perf_counter()
+        size = build_catalog(read_csv(csv_path), bin_path)
+        print(f"items={args.items}: build {time.perf_counter() - t0:.2f} s, file {size / 1024:.0f} KiB")
+
+        results = {
+            "mmap": _in_fresh_process(_measure_mmap, bin_path, args.repeats),
+            "csv in memory": _in_fresh_process(_measure_naive, csv_path, max(3, args.repeats // 50)),
+        }
+
+    print(f"{'':<16}{'load, ms':>10}{'RSS +KiB':>12}")
+    for name, (load_ms, rss, _) in results.items():
+        print(f"{name:<16}{load_ms:>10.2f}{rss:>12}")
+    print()
+    print("latency, us (median / p95)")
+    print(f"{'query':<16}" + "".join(f"{name:>24}" for name in results))
+    for q in QUERIES:
+        print(f"{q:<16}" + "".join(f"{lat[q][0]:>13.1f} / {lat[q][1]:<8.1f}" for _, _, lat in results.values()))
+
+
+if __name__ == "__main__":
+    main()
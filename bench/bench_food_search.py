@@ -0,0 +1,110 @@
+"""
+Бенчмарк поиска кастомных продуктов: ILIKE '%q%' (полный скан) vs FTS5 trigram-индекс.
+
+Заполняет food_custom синтетическими названиями (по умолчанию 100k строк)
+и меряет латентность Repo.find_custom_food для набора запросов
+(точные, префиксы, с опечатками).
+
+Запуск из корня репозитория:
+    python -m bench.bench_food_search --rows 100000
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import insert
+
+from bot.db import fts
+from bot.db.models import FoodCustom
+from bot.db.repo import Repo
+from bot.db.session import SqliteProfile, init_db, make_engine, make_session_factory
+
+BASE_WORDS = [
+    "банан", "овсянка", "гречка", "курица", "грудка", "творог", "кефир", "яблоко",
+    "рис", "лосось", "тунец", "омлет", "сыр", "хлеб", "молоко", "йогурт",
+    "chicken", "breast", "oatmeal", "banana", "rice", "salmon", "cheese", "bread",
+]
+QUERIES = ["банан", "грудка кур", "овсянк", "chicken breast", "бвнан", "творогг", "salmn"]
+
+
+SYLLABLES = ["ка", "ро", "ми", "ла", "то", "не", "ва", "ри", "со", "пу", "ко", "да", "ле", "ту", "ма", "ни"]
+
+
+def _fake_names(n: int, seed: int = 42) -> list[str]:
+    """
+    Уникальные названия: одно «реальное» слово + 1-2 синтетических слова + номер
+    (номер - чтобы не упереться в uq_food_name).
+    """
+    rnd = random.Random(seed)
+
+    def word() -> str:
+        return "".join(rnd.choice(SYLLABLES) for _ in range(rnd.randint(2, 4)))
+
+    return [
+        f"{rnd.choice(BASE_WORDS)} {' '.join(word() for _ in range(rnd.randint(1, 2)))} {i}"
+        for i in range(n)
+    ]
+
+
+async def _measure(session_factory, repeats: int) -> dict[str, float]:
+    """
+    Медианная латентность (мс) по каждому запросу.
+    """
+    result: dict[str, float] = {}
+    async with session_factory() as session:
+        repo = Repo(session)
+        for q in QUERIES:
+            samples = []
+            for _ in range(repeats):
+                t0 = time.perf_counter()
+                await repo.find_custom_food(q, limit=5)
+                samples.append((time.perf_counter() - t0) * 1000.0)
+            result[q] = statistics.median(samples)
+    return result
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_engine(os.path.join(tmp, "bench.db"), SqliteProfile())
+        await init_db(engine)
+        session_factory = make_session_factory(engine)
+
+        names = _fake_names(args.rows)
+        async with session_factory() as session:
+            for i in range(0, len(names), 10_000):
+                await session.execute(
+                    insert(FoodCustom),
+                    [{"name": n, "kcal_per_100g": 100.0} for n in names[i:i + 10_000]],
+                )
+            await session.commit()
+
+        fts_enabled = fts.is_enabled()
+        timings = {}
+        for mode in ("ilike", "fts5"):
+            if mode == "fts5" and not fts_enabled:
+                continue
+            fts._fts_enabled = mode == "fts5"
+            timings[mode] = await _measure(session_factory, args.repeats)
+        fts._fts_enabled = fts_enabled
+
+        await engine.dispose()
+
+    print(f"rows={args.rows}, median latency, ms")
+    print(f"{'query':<16}" + "".join(f"{m:>10}" for m in timings))
+    for q in QUERIES:
+        print(f"{q:<16}" + "".join(f"{timings[m][q]:>10.2f}" for m in timings))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,101 @@
+"""
+Бенчмарк исходящих HTTP-запросов: новая ClientSession на каждый вызов
+(как раньше в сервисах) vs общий клиент make_http_session (keep-alive пул + кэш DNS).
+
+Поднимает локальный stub-сервер (aiohttp.web) с JSON-ответом в духе OpenWeather
+и меряет латентность последовательных и параллельных запросов.
+Stub работает по HTTP без TLS и с localhost-резолвом, так что реальный выигрыш
+(TLS-рукопожатие + DNS внешнего API) ещё больше.
+
+Запуск из корня репозитория:
+    python -m bench.bench_http_session --requests 500 --concurrency 20
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from aiohttp import web
+
+from bot.services.http import make_http_session, use_session
+
+STUB_PAYLOAD = {"main": {"temp": 21.5}, "name": "Moscow"}
+
+
+async def _stub_handler(request: web.Request) -> web.Response:
+    return web.json_response(STUB_PAYLOAD)
+
+
+async def _start_stub() -> tuple[web.AppRunner, str]:
+    app = web.Application()
+    app.router.add_get("/data/2.5/weather", _stub_handler)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "localhost", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://localhost:{port}/data/2.5/weather"
+
+
+async def _fetch(url: str, session) -> float:
+    """
+    Один запрос тем же путём, что и сервисы (use_session), - латентность в мс.
+    """
+    t0 = time.perf_counter()
+    async with use_session(session) as http:
+        async with http.get(url, params={"q": "Moscow", "units": "metric"}) as resp:
+            await resp.json()
+    return (time.perf_counter() - t0) * 1000.0
+
+
+async def _run(url: str, shared: bool, requests: int, concurrency: int) -> list[float]:
+    session = make_http_session() if shared else None
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one() -> float:
+        async with sem:
+            return await _fetch(url, session)
+
+    try:
+        # Прогрев (для общего клиента - открываем соединения пула)
+        await asyncio.gather(*(one() for _ in range(concurrency)))
+        return await asyncio.gather(*(one() for _ in range(requests)))
+    finally:
+        if session is not None:
+            await session.close()
+
+
+def _report(title: str, samples: list[float], wall_s: float) -> None:
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(
+        f"{title:<22} median={statistics.median(samples):7.2f} ms  "
+        f"p95={p95:7.2f} ms  throughput={len(samples) / wall_s:8.1f} req/s"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    runner, url = await _start_stub()
+    try:
+        for title, shared, conc in (
+            ("per-call, sequential", False, 1),
+            ("shared, sequential", True, 1),
+            (f"per-call, x{args.concurrency}", False, args.concurrency),
+            (f"shared, x{args.concurrency}", True, args.concurrency),
+        ):
+            t0 = time.perf_counter()
+            samples = await _run(url, shared, args.requests, conc)
+            _report(title, samples, time.perf_counter() - t0)
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,91 @@
+"""
+Бенчмарк конкурентного логирования: SQLite по умолчанию vs SqliteProfile
+(WAL + PRAGMA + один писатель и пул читателей).
+
+Каждый «пользователь» параллельно пишет логи еды (upsert DayStat + FoodLog)
+и читает свою дневную статистику, как это делают хэндлеры.
+
+Запуск из корня репозитория:
+    python -m bench.bench_sqlite_profile --users 50 --logs 20
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from datetime import date
+
+from sqlalchemy.exc import OperationalError
+
+from bot.db.models import FoodLog
+from bot.db.repo import Repo
+from bot.db.session import (
+    SqliteProfile,
+    init_db,
+    make_engine,
+    make_read_engine,
+    make_session_factory,
+)
+
+
+async def _user_load(session_factory, tg_id: int, logs: int, errors: list[int]) -> None:
+    """
+    Нагрузка одного пользователя: logs записей еды, после каждой - чтение итогов.
+    """
+    async with session_factory() as session:
+        user = await Repo(session).get_or_create_user(tg_id)
+
+    for _ in range(logs):
+        try:
+            async with session_factory() as session:
+                repo = Repo(session)
+                await repo.add_day_totals(user.id, date.today(), calories_in=100.0)
+                session.add(FoodLog(user_id=user.id, day=date.today(), name="банан", grams=100.0, kcal=100.0))
+                await session.commit()
+
+            async with session_factory() as session:
+                await Repo(session).get_or_create_day(user.id, date.today())
+        except OperationalError:
+            # "database is locked" и подобные
+            errors[0] += 1
+
+
+async def _run(profile: SqliteProfile | None, users: int, logs: int) -> tuple[float, int]:
+    """
+    Прогоняет нагрузку на чистой базе, возвращает (логов/сек, число ошибок).
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+
+        engine = make_engine(db_path, profile)
+        read_engine = make_read_engine(db_path, profile) if profile and profile.read_pool_size else None
+        await init_db(engine)
+        session_factory = make_session_factory(engine, read_engine)
+
+        errors = [0]
+        t0 = time.perf_counter()
+        await asyncio.gather(*(_user_load(session_factory, i, logs, errors) for i in range(users)))
+        elapsed = time.perf_counter() - t0
+
+        if read_engine is not None:
+            await read_engine.dispose()
+        await engine.dispose()
+
+    return users * logs / elapsed, errors[0]
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--logs", type=int, default=20)
+    args = parser.parse_args()
+
+    for title, profile in (("default", None), ("profile", SqliteProfile())):
+        rate, errors = await _run(profile, args.users, args.logs)
+        print(f"{title:>8}: {rate:8.1f} logs/s, errors={errors}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,4 +1,5 @@
 import os
+from pathlib import Path
 
 from dotenv import load_dotenv
 from pydantic import BaseModel
@@ -19,12 +20,103 @@ class Settings(BaseModel):
     calorieninjas_api_key: str = os.getenv("CALORIENINJAS_API_KEY", "")
 
     # Приложение
+    # Путь к файлу SQLite или полный URL БД (sqlite+aiosqlite:///..., postgresql+asyncpg://...)
     db_path: str = os.getenv("DB_PATH", "bot.db")
     log_level: str = os.getenv("LOG_LEVEL", "INFO")
 
+    # Профиль SQLite (PRAGMA на каждом соединении + пул читателей)
+    db_journal_mode: str = os.getenv("DB_JOURNAL_MODE", "WAL")
+    db_synchronous: str = os.getenv("DB_SYNCHRONOUS", "NORMAL")
+    db_cache_size_kib: int = int(os.getenv("DB_CACHE_SIZE_KIB", "16384"))
+    db_mmap_size_mb: int = int(os.getenv("DB_MMAP_SIZE_MB", "128"))
+    db_temp_store: str = os.getenv("DB_TEMP_STORE", "MEMORY")
+    db_busy_timeout_ms: int = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+    # 0 - без отдельного пула читателей (все запросы через одного писателя)
+    db_read_pool_size: int = int(os.getenv("DB_READ_POOL_SIZE", "4"))
+
+    # Пул соединений серверной СУБД (PostgreSQL); для SQLite не используется
+    db_pool_size: int = int(os.getenv("DB_POOL_SIZE", "10"))
+    db_max_overflow: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    db_pool_pre_ping: bool = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+    db_pool_timeout_s: float = float(os.getenv("DB_POOL_TIMEOUT_S", "30"))
+    db_pool_recycle_s: int = int(os.getenv("DB_POOL_RECYCLE_S", "1800"))
+    # 0 - выключить кэш prepared statements (нужно за PgBouncer в transaction mode)
+    db_statement_cache_size: int = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+
+    # Write-behind очередь логов (0 / 1): пакетная запись раз в N мс или M событий
+    write_behind_enabled: bool = os.getenv("WRITE_BEHIND_ENABLED", "0") == "1"
+    write_behind_flush_ms: int = int(os.getenv("WRITE_BEHIND_FLUSH_MS", "200"))
+    write_behind_max_batch: int = int(os.getenv("WRITE_BEHIND_MAX_BATCH", "200"))
+
+    # Архивация старых логов (0 / 1) в тихие часы (локальное время, [start, end))
+    retention_enabled: bool = os.getenv("RETENTION_ENABLED", "0") == "1"
+    retention_days: int = int(os.getenv("RETENTION_DAYS", "365"))
+    retention_quiet_start_hour: int = int(os.getenv("RETENTION_QUIET_START_HOUR", "3"))
+    retention_quiet_end_hour: int = int(os.getenv("RETENTION_QUIET_END_HOUR", "6"))
+    retention_vacuum_pages: int = int(os.getenv("RETENTION_VACUUM_PAGES", "2000"))
+
+    # Общий HTTP-клиент внешних API: пул соединений, keep-alive, кэш DNS, таймауты
+    http_limit: int = int(os.getenv("HTTP_LIMIT", "100"))
+    http_limit_per_host: int = int(os.getenv("HTTP_LIMIT_PER_HOST", "10"))
+    http_keepalive_s: float = float(os.getenv("HTTP_KEEPALIVE_S", "30"))
+    http_dns_ttl_s: int = int(os.getenv("HTTP_DNS_TTL_S", "300"))
+    http_timeout_total_s: float = float(os.getenv("HTTP_TIMEOUT_TOTAL_S", "6"))
+    http_timeout_connect_s: float = float(os.getenv("HTTP_TIMEOUT_CONNECT_S", "3"))
+    http_timeout_read_s: float = float(os.getenv("HTTP_TIMEOUT_READ_S", "3"))
+
+    # Кэш профилей пользователей (LRU + TTL)
+    profile_cache_size: int = int(os.getenv("PROFILE_CACHE_SIZE", "10000"))
+    profile_cache_ttl_s: float = float(os.getenv("PROFILE_CACHE_TTL_S", "600"))
+
+    # Как часто писать снимок метрик в лог (секунды, 0 - не писать)
+    metrics_log_interval_s: float = float(os.getenv("METRICS_LOG_INTERVAL_S", "300"))
+
+    # Погода: кэш по городам (свежесть / предел устаревания), ожидание при промахе, фоновое обновление
+    weather_ttl_s: float = float(os.getenv("WEATHER_TTL_S", "1800"))
+    weather_stale_s: float = float(os.getenv("WEATHER_STALE_S", "10800"))
+    weather_negative_ttl_s: float = float(os.getenv("WEATHER_NEGATIVE_TTL_S", "3600"))
+    weather_wait_s: float = float(os.getenv("WEATHER_WAIT_S", "1"))
+    weather_refresh_interval_s: float = float(os.getenv("WEATHER_REFRESH_INTERVAL_S", "600"))
+
+    # Внешние API: circuit breaker (окно, порог ошибок, время «открытия») и адаптивный таймаут
+    breaker_window: int = int(os.getenv("BREAKER_WINDOW", "50"))
+    breaker_min_calls: int = int(os.getenv("BREAKER_MIN_CALLS", "5"))
+    breaker_failure_rate: float = float(os.getenv("BREAKER_FAILURE_RATE", "0.5"))
+    breaker_open_s: float = float(os.getenv("BREAKER_OPEN_S", "30"))
+    provider_timeout_min_s: float = float(os.getenv("PROVIDER_TIMEOUT_MIN_S", "0.5"))
+    provider_timeout_p95_factor: float = float(os.getenv("PROVIDER_TIMEOUT_P95_FACTOR", "2"))
+
+    # Кэш ответов API поиска еды: память (LRU) + таблица в БД; TTL найденного и «ничего не найдено»
+    food_cache_size: int = int(os.getenv("FOOD_CACHE_SIZE", "2000"))
+    food_cache_ttl_s: float = float(os.getenv("FOOD_CACHE_TTL_S", str(7 * 24 * 3600)))
+    food_cache_negative_ttl_s: float = float(os.getenv("FOOD_CACHE_NEGATIVE_TTL_S", "3600"))
+
+    # Офлайн-справочник продуктов (mmap-файл, см. bot.services.food_catalog); пусто - выключен
+    food_catalog_path: str = os.getenv("FOOD_CATALOG_PATH", str(Path(__file__).resolve().parent / "data" / "food_catalog.bin"))
+
+    # Общий бюджет времени на поиск еды по всем источникам (секунды)
+    food_search_budget_s: float = float(os.getenv("FOOD_SEARCH_BUDGET_S", "3"))
+
     # Фичефлаг автоперевода (0 / 1)
     translate_enabled: bool = os.getenv("TRANSLATE_ENABLED", "0") == "1"
 
+    # Перевод: потоки пула, таймаут одного перевода, размер и TTL кэша (память + БД)
+    translate_workers: int = int(os.getenv("TRANSLATE_WORKERS", "2"))
+    translate_timeout_s: float = float(os.getenv("TRANSLATE_TIMEOUT_S", "3"))
+    translate_cache_size: int = int(os.getenv("TRANSLATE_CACHE_SIZE", "2000"))
+    translate_cache_ttl_s: float = float(os.getenv("TRANSLATE_CACHE_TTL_S", str(30 * 24 * 3600)))
+
+    # Графики: процессы пула рендера (0 - рендер в потоке без пула), лимит очереди, таймаут одного графика
+    chart_workers: int = int(os.getenv("CHART_WORKERS", "2"))
+    chart_max_pending: int = int(os.getenv("CHART_MAX_PENDING", "16"))
+    chart_timeout_s: float = float(os.getenv("CHART_TIMEOUT_S", "10"))
+    # Движок простых графиков: fast (Pillow) / matplotlib
+    chart_engine: str = os.getenv("CHART_ENGINE", "fast")
+
+    # Кэш отправленных графиков (Telegram file_id по хэшу данных): размер и TTL
+    chart_cache_size: int = int(os.getenv("CHART_CACHE_SIZE", "10000"))
+    chart_cache_ttl_s: float = float(os.getenv("CHART_CACHE_TTL_S", str(7 * 24 * 3600)))
+
 
 # Singleton с настройками приложения
 settings = Settings()
@@ -0,0 +1,269 @@
+from __future__ import annotations
+
+from datetime import date
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from bot.db.models import DayStat, FoodLog, User, WorkoutLog
+from bot.db.profile_cache import ProfileCache, UserProfile
+from bot.db.repo import Repo
+from bot.db.write_behind import DayTotals, FoodEvent, MealEvent, WaterEvent, WorkoutEvent, WriteBehindQueue
+from bot.services.chart_cache import ChartCache
+
+
+class UserContext:
+    """
+    Контекст одного апдейта: одна AsyncSession на весь апдейт
+    и лениво загружаемые (не более одного раза) профиль, User и DayStat за сегодня.
+
+    Профиль (UserProfile) сначала ищется в ProfileCache - для большинства
+    хэндлеров ORM-объект User вообще не загружается.
+
+    Записи логов (add_water / add_food / add_workout) идут либо сразу в БД,
+    либо через WriteBehindQueue, если она включена; закэшированные графики
+    за сегодняшний день при этом инвалидируются.
+    """
+    __slots__ = ("session", "repo", "tg_id", "profiles", "writer", "charts", "_user", "_profile", "_day")
+
+    def __init__(
+        self,
+        session: AsyncSession,
+        tg_id: int | None,
+        profiles: ProfileCache | None = None,
+        writer: WriteBehindQueue | None = None,
+        charts: ChartCache | None = None,
+    ):
+        self.session = session
+        self.repo = Repo(session)
+
+        # Telegram id автора апдейта (для CallbackQuery - нажавший кнопку, а не бот)
+        self.tg_id = tg_id
+
+        # Общий для процесса кэш профилей (None - без кэша)
+        self.profiles = profiles
+
+        # Write-behind очередь логов (None - запись сразу в БД)
+        self.writer = writer
+
+        # Кэш отправленных графиков (None - без кэша)
+        self.charts = charts
+
+        self._user: User | None = None
+        self._profile: UserProfile | None = None
+        self._day: DayStat | None = None
+
+    async def user(self) -> User:
+        """
+        Возвращает пользователя (создаёт при первом обращении). Запрос к БД - один раз за апдейт.
+
+        Нужен только там, где User изменяется (сохранение профиля);
+        для чтения полей профиля используйте profile().
+        """
+        if self._user is None:
+            self._user = await self.repo.get_or_create_user(self.tg_id)
+            self.refresh_profile()
+        return self._user
+
+    async def profile(self) -> UserProfile:
+        """
+        Возвращает снимок профиля: из кэша, иначе загружает User из БД.
+        """
+        if self._profile is None and self.profiles is not None:
+            self._profile = self.profiles.get(self.tg_id)
+        if self._profile is None:
+            await self.user()
+        return self._profile
+
+    def refresh_profile(self) -> None:
+        """
+        Обновляет снимок профиля (и запись в кэше) по загруженному User.
+
+        Вызывается после изменения полей User и commit (write-through).
+        """
+        self._profile = UserProfile.from_user(self._user)
+        if self.profiles is not None:
+            self.profiles.put(self._profile)
+
+    async def today(self) -> DayStat:
+        """
+        Возвращает дневную статистику за сегодня (создаёт при отсутствии).
+
+        Repo.add_day_totals обновляет этот же объект через identity map,
+        поэтому после записи значения остаются актуальными.
+        """
+        if self._day is None:
+            profile = await self.profile()
+            self._day = await self.repo.get_or_create_day(profile.id, date.today())
+        return self._day
+
+    async def today_totals(self) -> DayTotals:
+        """
+        Итоги за сегодня с учётом событий, которые ещё ждут записи в очереди.
+        """
+        totals = DayTotals.from_stat(await self.today())
+        if self.writer is not None:
+            profile = await self.profile()
+            totals = totals.plus(self.writer.pending_totals(profile.id, date.today()))
+        return totals
+
+    def _invalidate_charts(self, user_id: int) -> None:
+        if self.charts is not None:
+            self.charts.invalidate(user_id, date.today())
+
+    async def add_water(self, ml: int) -> None:
+        """
+        Логирует воду за сегодня.
+        """
+        profile = await self.profile()
+        self._invalidate_charts(profile.id)
+        if self.writer is not None:
+            self.writer.submit(WaterEvent(profile.id, date.today(), int(ml)))
+            return
+
+        # Атомарно увеличиваем воду за сегодня (строка DayStat создаётся при необходимости)
+        await self.repo.add_day_totals(profile.id, date.today(), water_ml=int(ml))
+        await self.session.commit()
+
+    async def add_food(self, name: str, grams: float, kcal: float) -> None:
+        """
+        Логирует приём пищи: событие FoodLog + calories_in за сегодня.
+        """
+        profile = await self.profile()
+        self._invalidate_charts(profile.id)
+        if self.writer is not None:
+            self.writer.submit(FoodEvent(profile.id, date.today(), name, float(grams), float(kcal)))
+            return
+
+        # Агрегация по текущему дню (локальная дата), атомарно на стороне БД
+        await self.repo.add_day_totals(profile.id, date.today(), calories_in=float(kcal))
+
+        # Событие (лог приёма пищи)
+        self.session.add(
+            FoodLog(
+                user_id=profile.id,
+                day=date.today(),
+                name=name,
+                grams=float(grams),
+                kcal=float(kcal),
+            )
+        )
+        # Личный индекс «недавние / частые» - в той же транзакции
+        await self.repo.touch_favorites(
+            [{"user_id": profile.id, "name": name, "grams": float(grams), "kcal": float(kcal)}]
+        )
+        await self.session.commit()
+
+    async def add_meal(self, items: list[tuple[str, float, float]]) -> None:
+        """
+        Логирует приём пищи из нескольких продуктов ((название, граммы, ккал), ...):
+        все строки FoodLog и одна дельта calories_in - одной транзакцией.
+        """
+        profile = await self.profile()
+        self._invalidate_charts(profile.id)
+        items = [(name, float(grams), float(kcal)) for name, grams, kcal in items]
+        if self.writer is not None:
+            self.writer.submit(MealEvent(profile.id, date.today(), tuple(items)))
+            return
+
+        await self.repo.add_day_totals(
+            profile.id, date.today(), calories_in=sum(kcal for _, _, kcal in items)
+        )
+        self.session.add_all(
+            FoodLog(user_id=profile.id, day=date.today(), name=name, grams=grams, kcal=kcal)
+            for name, grams, kcal in items
+        )
+        await self.repo.touch_favorites(
+            [{"user_id": profile.id, "name": name, "grams": grams, "kcal": kcal} for name, grams, kcal in items]
+        )
+        await self.session.commit()
+
+    async def add_workout(
+        self,
+        workout_type: str,
+        minutes: int,
+        intensity: str,
+        kcal_burned: float,
+        extra_water_ml: int,
+    ) -> None:
+        """
+        Логирует тренировку: событие WorkoutLog + calories_out и вода за сегодня.
+        """
+        profile = await self.profile()
+        self._invalidate_charts(profile.id)
+        if self.writer is not None:
+            self.writer.submit(
+                WorkoutEvent(
+                    profile.id,
+                    date.today(),
+                    workout_type,
+                    int(minutes),
+                    intensity,
+                    float(kcal_burned),
+                    int(extra_water_ml),
+                )
+            )
+            return
+
+        # Обновление агрегатов за сегодня (один upsert)
+        await self.repo.add_day_totals(
+            profile.id,
+            date.today(),
+            calories_out=float(kcal_burned),
+            water_ml=int(extra_water_ml),
+        )
+
+        # Лог тренировки
+        self.session.add(
+            WorkoutLog(
+                user_id=profile.id,
+                day=date.today(),
+                workout_type=workout_type,
+                minutes=int(minutes),
+                intensity=intensity,
+                kcal_burned=float(kcal_burned),
+                extra_water_ml=int(extra_water_ml),
+            )
+        )
+        await self.session.commit()
+
+    async def release(self) -> None:
+        """
+        Завершает текущую транзакцию и отпускает соединение в пул.
+
+        Вызывается перед долгими сетевыми запросами (погода, поиск еды),
+        чтобы апдейт не держал соединение БД во время ожидания.
+        """
+        await self.session.commit()
+
+
+class UserContextMiddleware(BaseMiddleware):
+    """
+    Outer-middleware: открывает одну сессию БД на апдейт и кладёт UserContext
+    в data["ctx"] для хэндлеров.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker,
+        profiles: ProfileCache | None = None,
+        writer: WriteBehindQueue | None = None,
+        charts: ChartCache | None = None,
+    ):
+        self.session_factory = session_factory
+        self.profiles = profiles
+        self.writer = writer
+        self.charts = charts
+
+    async def __call__(self, handler, event: TelegramObject, data: dict):
+        """
+        Оборачивает обработку апдейта в контекст сессии.
+        """
+        # event_from_user заполняет встроенный middleware aiogram
+        tg_user = data.get("event_from_user")
+        tg_id = tg_user.id if tg_user else None
+
+        async with self.session_factory() as session:
+            data["ctx"] = UserContext(session, tg_id, self.profiles, self.writer, self.charts)
+            return await handler(event, data)
@@ -0,0 +1,100 @@
+"""
+Пересборка личного индекса продуктов (FoodFavorite: недавние / частые) с нуля.
+
+В обычной работе индекс обновляется инкрементально (Repo.touch_favorites) вместе
+с записью FoodLog. Пересборка нужна после ручных правок логов или для заполнения
+индекса по уже существующей истории.
+
+Источник - FoodLog: продукты из архивированных (bot.db.retention) логов в индекс
+после пересборки не попадают - это давно не использованные продукты.
+
+Запуск:
+    python -m bot.db.favorites rebuild [--chunk 500]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from .models import FoodFavorite, FoodLog, User
+
+logger = logging.getLogger("bot")
+
+
+async def rebuild_favorites(session_factory: async_sessionmaker, chunk_users: int = 500) -> int:
+    """
+    Пересобирает FoodFavorite пачками по chunk_users пользователей
+    (одна транзакция на пачку). Возвращает количество обработанных пользователей.
+    """
+    done = 0
+    last_id = 0
+
+    while True:
+        async with session_factory() as session:
+            res = await session.execute(
+                select(User.id).where(User.id > last_id).order_by(User.id).limit(chunk_users)
+            )
+            user_ids = list(res.scalars().all())
+            if not user_ids:
+                return done
+
+            favorites: dict[tuple[int, str], dict] = {}
+
+            # Потоково читаем логи пачки в хронологическом порядке: последняя запись продукта побеждает
+            stream = await session.stream(
+                select(FoodLog.user_id, FoodLog.name, FoodLog.grams, FoodLog.kcal, FoodLog.created_at)
+                .where(FoodLog.user_id >= user_ids[0], FoodLog.user_id <= user_ids[-1])
+                .order_by(FoodLog.user_id, FoodLog.created_at)
+            )
+            async for user_id, name, grams, kcal, created_at in stream:
+                if not grams or grams <= 0:
+                    continue
+                row = favorites.setdefault(
+                    (user_id, name), {"user_id": user_id, "name": name, "use_count": 0}
+                )
+                row["use_count"] += 1
+                row["kcal_per_100g"] = float(kcal) / float(grams) * 100.0
+                row["last_grams"] = float(grams)
+                row["last_used_at"] = created_at
+
+            await session.execute(
+                delete(FoodFavorite).where(
+                    FoodFavorite.user_id >= user_ids[0], FoodFavorite.user_id <= user_ids[-1]
+                )
+            )
+            if favorites:
+                await session.execute(insert(FoodFavorite), list(favorites.values()))
+
+            await session.commit()
+
+        done += len(user_ids)
+        last_id = user_ids[-1]
+        logger.info("food favorites rebuilt for %d users", done)
+
+
+async def _main(chunk: int) -> None:
+    from bot.config import settings
+    from bot.db.session import init_db, make_engine, make_session_factory
+
+    engine = make_engine(settings.db_path)
+    await init_db(engine)
+    try:
+        total = await rebuild_favorites(make_session_factory(engine), chunk)
+    finally:
+        await engine.dispose()
+    print(f"food favorites rebuilt: {total} users")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Пересборка личного индекса продуктов (FoodFavorite)")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--chunk", type=int, default=500, help="пользователей на транзакцию")
+    args = parser.parse_args()
+
+    asyncio.run(_main(args.chunk))
@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import logging
+
+from sqlalchemy.exc import DBAPIError, OperationalError
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+logger = logging.getLogger("bot")
+
+# Индекс FTS5 с trigram-токенизатором поверх food_custom.name (external content).
+# Триггеры держат индекс в синхронизации с таблицей при любом INSERT/UPDATE/DELETE.
+FOOD_FTS_DDL = (
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS food_custom_fts USING fts5(
+        name,
+        content='food_custom',
+        content_rowid='id',
+        tokenize='trigram'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS food_custom_fts_ai AFTER INSERT ON food_custom BEGIN
+        INSERT INTO food_custom_fts(rowid, name) VALUES (new.id, new.name);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS food_custom_fts_ad AFTER DELETE ON food_custom BEGIN
+        INSERT INTO food_custom_fts(food_custom_fts, rowid, name) VALUES ('delete', old.id, old.name);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS food_custom_fts_au AFTER UPDATE OF name ON food_custom BEGIN
+        INSERT INTO food_custom_fts(food_custom_fts, rowid, name) VALUES ('delete', old.id, old.name);
+        INSERT INTO food_custom_fts(rowid, name) VALUES (new.id, new.name);
+    END
+    """,
+)
+
+# PostgreSQL: GIN-индекс pg_trgm - ILIKE '%q%' по name идёт через индекс, а не полным сканом
+FOOD_PG_TRGM_DDL = (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_food_custom_name_trgm ON food_custom USING gin (name gin_trgm_ops)",
+)
+
+# Максимум триграмм в запросе (длинные строки дальше не уточняют поиск)
+MAX_QUERY_TRIGRAMS = 32
+
+# Минимальная доля общих триграмм, чтобы нечёткое совпадение попало в выдачу
+MIN_SIMILARITY = 0.3
+
+# Флаг доступности FTS5 в текущей сборке SQLite (выставляется в ensure_food_fts)
+_fts_enabled = False
+
+
+def is_enabled() -> bool:
+    """
+    True, если индекс food_custom_fts создан и им можно пользоваться.
+    """
+    return _fts_enabled
+
+
+async def ensure_food_fts(conn: AsyncConnection) -> bool:
+    """
+    Создаёт FTS5-индекс и триггеры (если их ещё нет) и заполняет индекс
+    по уже существующим строкам food_custom.
+
+    Если SQLite собран без FTS5 / trigram (SQLite < 3.34) или база не SQLite -
+    возвращает False, и поиск работает через ILIKE (в PostgreSQL - ускоренный
+    индексом pg_trgm, см. ensure_food_pg_trgm).
+    """
+    global _fts_enabled
+
+    if conn.dialect.name != "sqlite":
+        _fts_enabled = False
+        if conn.dialect.name == "postgresql":
+            await ensure_food_pg_trgm(conn)
+        return False
+
+    res = await conn.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'food_custom_fts'"
+    )
+    existed = res.first() is not None
+
+    try:
+        for ddl in FOOD_FTS_DDL:
+            await conn.exec_driver_sql(ddl)
+
+        # Индекс создан впервые - заполняем по существующим данным
+        if not existed:
+            await conn.exec_driver_sql("INSERT INTO food_custom_fts(food_custom_fts) VALUES ('rebuild')")
+    except OperationalError as e:
+        logger.warning("FTS5 недоступен, поиск продуктов через ILIKE: %s", e)
+        _fts_enabled = False
+        return False
+
+    _fts_enabled = True
+    return True
+
+
+async def ensure_food_pg_trgm(conn: AsyncConnection) -> bool:
+    """
+    PostgreSQL: включает расширение pg_trgm и создаёт GIN-индекс по food_custom.name.
+
+    Без прав на CREATE EXTENSION возвращает False - поиск остаётся ILIKE, но без индекса.
+    DDL выполняется в SAVEPOINT, чтобы ошибка не прерывала внешнюю транзакцию init_db.
+    """
+    try:
+        async with conn.begin_nested():
+            for ddl in FOOD_PG_TRGM_DDL:
+                await conn.exec_driver_sql(ddl)
+    except DBAPIError as e:
+        logger.warning("pg_trgm недоступен, поиск продуктов через ILIKE без индекса: %s", e)
+        return False
+    return True
+
+
+def normalize(text: str) -> str:
+    """
+    Нормализация строки для поиска: нижний регистр и схлопывание пробелов
+    (так же регистр сворачивает trigram-токенизатор при индексации).
+    """
+    return " ".join(text.lower().split())
+
+
+def trigrams(text: str) -> list[str]:
+    """
+    Уникальные триграммы нормализованной строки (в порядке появления).
+    """
+    q = normalize(text)
+    grams: list[str] = []
+    for i in range(len(q) - 2):
+        g = q[i:i + 3]
+        if g not in grams:
+            grams.append(g)
+    return grams
+
+
+def _literal(text: str) -> str:
+    """
+    Строковый литерал FTS5 (кавычки внутри удваиваются).
+    """
+    return '"' + text.replace('"', '""') + '"'
+
+
+def substring_match_query(text: str) -> str | None:
+    """
+    Выражение MATCH для поиска подстрок: каждое слово запроса (от 3 символов)
+    должно встретиться в названии как подстрока, порядок слов не важен
+    ("грудка кур" находит "Курица, грудка").
+
+    Возвращает None, если в запросе нет слов длиной от 3 символов
+    (trigram-токенизатор их не индексирует).
+    """
+    words = [w for w in normalize(text).split() if len(w) >= 3]
+    if not words:
+        return None
+    return " AND ".join(_literal(w) for w in words)
+
+
+def fuzzy_match_query(text: str) -> str | None:
+    """
+    Выражение MATCH для нечёткого поиска: OR по всем триграммам запроса.
+
+    Строки с опечатками содержат часть триграмм запроса и ранжируются по bm25.
+    Возвращает None для запросов короче 3 символов.
+    """
+    # Триграммы на стыке слов только шумят - берём триграммы внутри слов
+    grams = [g for g in trigrams(text) if " " not in g]
+    if not grams:
+        return None
+
+    return " OR ".join(_literal(g) for g in grams[:MAX_QUERY_TRIGRAMS])
+
+
+def similarity(name: str, query: str) -> float:
+    """
+    Доля триграмм запроса, которые встречаются в названии (0..1).
+    """
+    q_grams = trigrams(query)
+    if not q_grams:
+        return 0.0
+    n_grams = set(trigrams(name))
+    return sum(1 for g in q_grams if g in n_grams) / len(q_grams)
+
+
+def rank_key(name: str, query: str) -> tuple[int, float, int]:
+    """
+    Ключ сортировки кандидатов: префикс > весь запрос подстрокой > все слова запроса >
+    нечёткие совпадения; внутри группы - по убыванию похожести, затем короче название.
+    """
+    n = normalize(name)
+    q = normalize(query)
+    if n.startswith(q):
+        tier = 0
+    elif q in n:
+        tier = 1
+    elif all(w in n for w in q.split()):
+        tier = 2
+    else:
+        tier = 3
+    return tier, -similarity(n, q), len(n)
@@ -0,0 +1,294 @@
+"""
+Потоковый экспорт и импорт истории пользователя (DayStat, FoodLog, WorkoutLog).
+
+Экспорт читает строки курсором (session.stream + yield_per: в PostgreSQL -
+server-side cursor) и отдаёт их асинхронным генератором, так что история
+целиком в памяти не собирается. Архивные логи (log_archives) входят в экспорт.
+
+Формат - одна запись на строку, поле "table" указывает источник:
+- JSONL: {"table": "food_logs", "day": "2026-01-31", "name": ..., ...}
+- CSV: общий заголовок EXPORT_FIELDS, незаполненные для таблицы колонки пустые.
+
+Импорт принимает тот же формат: логи вставляются пачками (executemany),
+а дневные итоги пересчитываются за один проход по файлу (см. import_history).
+
+Запуск (админ):
+    python -m bot.db.history_io export <tg_id> [--format jsonl|csv] [-o file]
+    python -m bot.db.history_io import <tg_id> <file.jsonl|file.csv>
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import csv
+import io
+import json
+import sys
+from datetime import date, datetime
+from typing import AsyncIterator, Callable, Iterable, Iterator, TextIO
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from .models import DayStat, FoodLog, LogArchive, WorkoutLog
+from .repo import Repo
+from .retention import ARCHIVED_MODELS, decode_rows
+from .write_behind import DayTotals
+
+# Сколько строк драйвер отдаёт за один fetch при потоковом чтении
+STREAM_CHUNK = 500
+
+# Размер пачки INSERT при импорте
+IMPORT_BATCH = 1000
+
+
+def _to_date(v) -> date:
+    return v if isinstance(v, date) else date.fromisoformat(v)
+
+
+def _to_datetime(v) -> datetime | None:
+    if v in (None, ""):
+        return None
+    return v if isinstance(v, datetime) else datetime.fromisoformat(v)
+
+
+# Таблица -> (модель, колонка -> приведение типа). Порядок колонок = порядок в файле.
+EXPORT_TABLES: dict[str, tuple[type, dict[str, Callable]]] = {
+    "day_stats": (
+        DayStat,
+        {"day": _to_date, "water_ml": int, "calories_in": float, "calories_out": float},
+    ),
+    "food_logs": (
+        FoodLog,
+        {"day": _to_date, "name": str, "grams": float, "kcal": float, "created_at": _to_datetime},
+    ),
+    "workout_logs": (
+        WorkoutLog,
+        {
+            "day": _to_date,
+            "workout_type": str,
+            "minutes": int,
+            "intensity": str,
+            "kcal_burned": float,
+            "extra_water_ml": int,
+            "created_at": _to_datetime,
+        },
+    ),
+}
+
+# Заголовок CSV: "table" + объединение колонок всех таблиц
+EXPORT_FIELDS = ["table"] + list(
+    dict.fromkeys(col for _, cols in EXPORT_TABLES.values() for col in cols)
+)
+
+# Таблица экспорта -> вид архива (LogArchive.kind)
+_ARCHIVE_KINDS = {model.__tablename__: kind for kind, model in ARCHIVED_MODELS.items()}
+
+
+async def iter_history(session: AsyncSession, user_id: int) -> AsyncIterator[dict]:
+    """
+    Все записи истории пользователя: DayStat, затем логи (архивные, потом текущие)
+    в хронологическом порядке. Строки читаются курсором порциями по STREAM_CHUNK.
+    """
+    for table, (model, cols) in EXPORT_TABLES.items():
+        kind = _ARCHIVE_KINDS.get(table)
+        if kind is not None:
+            archived = await session.stream_scalars(
+                select(LogArchive.payload)
+                .where(LogArchive.user_id == user_id, LogArchive.kind == kind)
+                .order_by(LogArchive.day_from, LogArchive.id)
+                .execution_options(yield_per=STREAM_CHUNK)
+            )
+            async for payload in archived:
+                for row in decode_rows(payload):
+                    yield {"table": table, **{c: row.get(c) for c in cols}}
+
+        result = await session.stream(
+            select(*(getattr(model, c) for c in cols))
+            .where(model.user_id == user_id)
+            .order_by(model.day, model.id)
+            .execution_options(yield_per=STREAM_CHUNK)
+        )
+        async for row in result.mappings():
+            yield {"table": table, **row}
+
+
+def _json_default(v):
+    return v.isoformat()
+
+
+async def iter_export_lines(records: AsyncIterator[dict], fmt: str = "jsonl") -> AsyncIterator[str]:
+    """
+    Записи -> строки файла выбранного формата ("jsonl" / "csv", с заголовком).
+    """
+    if fmt == "jsonl":
+        async for rec in records:
+            yield json.dumps(rec, ensure_ascii=False, default=_json_default) + "\n"
+        return
+
+    if fmt != "csv":
+        raise ValueError(f"unknown export format: {fmt!r}")
+
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=EXPORT_FIELDS, extrasaction="ignore")
+    writer.writeheader()
+    yield buf.getvalue()
+    buf.seek(0)
+    buf.truncate()
+    async for rec in records:
+        writer.writerow({k: (v.isoformat() if isinstance(v, (date, datetime)) else v) for k, v in rec.items()})
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+
+
+async def write_export(session: AsyncSession, user_id: int, out: TextIO, fmt: str = "jsonl") -> int:
+    """
+    Пишет историю пользователя в текстовый файл out. Возвращает количество записей.
+    """
+    count = 0
+
+    async def counted() -> AsyncIterator[dict]:
+        nonlocal count
+        async for rec in iter_history(session, user_id):
+            count += 1
+            yield rec
+
+    async for line in iter_export_lines(counted(), fmt):
+        out.write(line)
+    return count
+
+
+def read_records(lines: Iterable[str], fmt: str) -> Iterator[dict]:
+    """
+    Построчное чтение файла экспорта (jsonl / csv) в записи с приведёнными типами.
+    Записи неизвестных таблиц пропускаются.
+    """
+    raw = (json.loads(line) for line in lines if line.strip()) if fmt == "jsonl" else csv.DictReader(lines)
+    for rec in raw:
+        spec = EXPORT_TABLES.get(rec.get("table"))
+        if spec is None:
+            continue
+        _, cols = spec
+        yield {"table": rec["table"], **{c: conv(rec[c]) for c, conv in cols.items() if c in rec}}
+
+
+async def import_history(
+    session_factory: async_sessionmaker,
+    user_id: int,
+    records: Iterable[dict],
+    batch_size: int = IMPORT_BATCH,
+) -> dict[str, int]:
+    """
+    Импортирует записи истории пользователю user_id (к уже существующей истории).
+
+    Логи вставляются пачками по batch_size (executemany). Дневные итоги считаются
+    за тот же проход: для дня, у которого в файле есть строка day_stats, берётся она
+    (в ней и вода, которой нет в логах), иначе - сумма логов за день.
+    Итоги применяются одним пакетным upsert (вместе с роллапами) в той же транзакции,
+    личный индекс продуктов (FoodFavorite) обновляется вместе с каждой пачкой логов.
+
+    Возвращает количество импортированных записей по таблицам.
+    """
+    counts = {table: 0 for table in EXPORT_TABLES}
+    from_stats: dict[date, DayTotals] = {}
+    from_logs: dict[date, DayTotals] = {}
+    batches: dict[str, list[dict]] = {"food_logs": [], "workout_logs": []}
+
+    async with session_factory() as session:
+
+        repo = Repo(session)
+
+        async def flush(table: str) -> None:
+            rows = batches[table]
+            if rows:
+                await session.execute(insert(EXPORT_TABLES[table][0]), rows)
+                if table == "food_logs":
+                    await repo.touch_favorites(rows)
+                rows.clear()
+
+        for rec in records:
+            table = rec.pop("table")
+            counts[table] += 1
+            day = rec["day"]
+
+            if table == "day_stats":
+                from_stats[day] = DayTotals(rec["water_ml"], rec["calories_in"], rec["calories_out"])
+                continue
+
+            if table == "food_logs":
+                delta = DayTotals(0, rec["kcal"], 0.0)
+            else:
+                delta = DayTotals(rec["extra_water_ml"], 0.0, rec["kcal_burned"])
+            from_logs[day] = from_logs.get(day, DayTotals(0, 0.0, 0.0)).plus(delta)
+
+            if rec.get("created_at") is None:
+                rec.pop("created_at", None)
+            batches[table].append({"user_id": user_id, **rec})
+            if len(batches[table]) >= batch_size:
+                await flush(table)
+
+        for table in batches:
+            await flush(table)
+
+        totals = [
+            {
+                "user_id": user_id,
+                "day": day,
+                "water_ml": t.water_ml,
+                "calories_in": t.calories_in,
+                "calories_out": t.calories_out,
+            }
+            for day, t in sorted({**from_logs, **from_stats}.items())
+        ]
+        # Многострочный upsert - пачками, чтобы не упереться в лимит параметров запроса
+        for i in range(0, len(totals), batch_size):
+            await repo.add_day_totals_many(totals[i:i + batch_size])
+        await session.commit()
+
+    return counts
+
+
+async def _main(args) -> None:
+    from bot.config import settings
+    from bot.db.session import init_db, make_engine, make_session_factory
+
+    engine = make_engine(settings.db_path)
+    await init_db(engine)
+    session_factory = make_session_factory(engine)
+    try:
+        async with session_factory() as session:
+            user = await Repo(session).get_or_create_user(args.tg_id)
+
+        if args.command == "export":
+            out = open(args.output, "w", encoding="utf-8", newline="") if args.output else sys.stdout
+            try:
+                async with session_factory() as session:
+                    count = await write_export(session, user.id, out, args.format)
+            finally:
+                if out is not sys.stdout:
+                    out.close()
+            print(f"exported {count} records", file=sys.stderr)
+        else:
+            fmt = "csv" if args.path.endswith(".csv") else "jsonl"
+            with open(args.path, encoding="utf-8", newline="") as f:
+                counts = await import_history(session_factory, user.id, read_records(f, fmt))
+            print(f"imported {counts}", file=sys.stderr)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Экспорт / импорт истории пользователя")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_export = sub.add_parser("export", help="выгрузить историю (в stdout или файл)")
+    p_export.add_argument("tg_id", type=int)
+    p_export.add_argument("--format", choices=["jsonl", "csv"], default="jsonl")
+    p_export.add_argument("-o", "--output")
+
+    p_import = sub.add_parser("import", help="загрузить историю из файла экспорта")
+    p_import.add_argument("tg_id", type=int)
+    p_import.add_argument("path")
+
+    asyncio.run(_main(parser.parse_args()))
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 import enum
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 
 from sqlalchemy import (
     BigInteger,
@@ -10,8 +10,11 @@ from sqlalchemy import (
     DateTime,
     Float,
     ForeignKey,
+    Index,
     Integer,
+    LargeBinary,
     String,
+    Text,
     UniqueConstraint,
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship
@@ -80,13 +83,15 @@ class DayStat(Base):
     Агрегированная статистика пользователя за день.
 
     Уникальность: один user_id + один day.
+    Индекс уникальности (user_id, day) обслуживает и точечные, и диапазонные чтения
+    по пользователю, поэтому отдельные индексы по user_id/day не нужны.
     """
     __tablename__ = "day_stats"
     __table_args__ = (UniqueConstraint("user_id", "day", name="uq_user_day"),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
-    day: Mapped[date] = mapped_column(Date, index=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
+    day: Mapped[date] = mapped_column(Date)
 
     water_ml: Mapped[int] = mapped_column(Integer, default=0)
     calories_in: Mapped[float] = mapped_column(Float, default=0.0)
@@ -95,6 +100,31 @@ class DayStat(Base):
     user: Mapped["User"] = relationship(back_populates="days")
 
 
+class WeekStat(Base):
+    """
+    Недельный роллап DayStat (неделя начинается с понедельника): из него строятся
+    графики за длинный период (90 дней / год), без чтения сотен дневных строк.
+
+    Обновляется инкрементально теми же upsert-ами, что и DayStat (см. Repo.add_day_totals);
+    пересчёт с нуля - python -m bot.db.rollups rebuild.
+    """
+    __tablename__ = "week_stats"
+    __table_args__ = (UniqueConstraint("user_id", "week_start", name="uq_user_week"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
+    week_start: Mapped[date] = mapped_column(Date)
+
+    water_ml: Mapped[int] = mapped_column(Integer, default=0)
+    calories_in: Mapped[float] = mapped_column(Float, default=0.0)
+    calories_out: Mapped[float] = mapped_column(Float, default=0.0)
+
+    @staticmethod
+    def bucket(day: date) -> date:
+        """Понедельник недели, в которую попадает day."""
+        return day - timedelta(days=day.weekday())
+
+
 class FoodCustom(Base):
     """
     Кастомные продукты (fallback, когда внешние API не помогли).
@@ -109,14 +139,43 @@ class FoodCustom(Base):
     kcal_per_100g: Mapped[float] = mapped_column(Float)
 
 
+class ProviderCacheEntry(Base):
+    """
+    Второй (персистентный) уровень кэша ответов внешних API поиска еды
+    (см. bot.services.provider_cache).
+
+    Ключ - (provider, нормализованный запрос); payload - JSON-список результатов,
+    пустой список - негативная запись («ничего не найдено») с коротким TTL.
+    """
+    __tablename__ = "provider_cache"
+    __table_args__ = (
+        UniqueConstraint("provider", "query", name="uq_provider_query"),
+        Index("ix_provider_cache_expires", "expires_at"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    provider: Mapped[str] = mapped_column(String(32))
+    query: Mapped[str] = mapped_column(String(256))
+
+    payload: Mapped[str] = mapped_column(Text)
+    expires_at: Mapped[datetime] = mapped_column(DateTime)
+
+
 class FoodLog(Base):
     """
     Лог приёмов пищи (события), которые затем суммируются в DayStat.calories_in.
+
+    Составные индексы (user_id, day) и (user_id, created_at) - под историю пользователя
+    за период и последние записи; индекс по day - под выборки по дате для всех пользователей.
     """
     __tablename__ = "food_logs"
+    __table_args__ = (
+        Index("ix_food_logs_user_day", "user_id", "day"),
+        Index("ix_food_logs_user_created", "user_id", "created_at"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
     day: Mapped[date] = mapped_column(Date, index=True)
 
     name: Mapped[str] = mapped_column(String(256))
@@ -126,14 +185,46 @@ class FoodLog(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
 
+class FoodFavorite(Base):
+    """
+    Личный индекс продуктов пользователя (недавние и частые) - производная от FoodLog.
+
+    Обновляется инкрементально при каждой записи FoodLog (Repo.touch_favorites),
+    пересобирается с нуля командой python -m bot.db.favorites rebuild.
+    Хранит последние граммы и калорийность - для записи «ещё раз» в одно нажатие.
+    """
+    __tablename__ = "food_favorites"
+    __table_args__ = (
+        UniqueConstraint("user_id", "name", name="uq_food_favorite"),
+        Index("ix_food_favorites_user_used", "user_id", "last_used_at"),
+        Index("ix_food_favorites_user_count", "user_id", "use_count"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
+
+    name: Mapped[str] = mapped_column(String(256))
+    kcal_per_100g: Mapped[float] = mapped_column(Float)
+    last_grams: Mapped[float] = mapped_column(Float)
+
+    use_count: Mapped[int] = mapped_column(Integer, default=1)
+    last_used_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
 class WorkoutLog(Base):
     """
     Лог тренировок (события), которые затем суммируются в DayStat.calories_out.
+
+    Индексы - как у FoodLog.
     """
     __tablename__ = "workout_logs"
+    __table_args__ = (
+        Index("ix_workout_logs_user_day", "user_id", "day"),
+        Index("ix_workout_logs_user_created", "user_id", "created_at"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
     day: Mapped[date] = mapped_column(Date, index=True)
 
     workout_type: Mapped[str] = mapped_column(String(64))
@@ -143,3 +234,27 @@ class WorkoutLog(Base):
     extra_water_ml: Mapped[int] = mapped_column(Integer, default=0)
 
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class LogArchive(Base):
+    """
+    Архив старых строк FoodLog / WorkoutLog (см. bot.db.retention).
+
+    Одна строка - пачка логов одного пользователя одного вида (kind = "food" / "workout")
+    за один календарный месяц: payload - zlib-сжатый JSON-список строк (без user_id).
+    day_from / day_to - фактический диапазон дней в пачке, по нему ищутся пачки,
+    пересекающиеся с запрошенным периодом. DayStat при архивации не меняется.
+    """
+    __tablename__ = "log_archives"
+    __table_args__ = (Index("ix_log_archives_user_kind_day", "user_id", "kind", "day_from"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
+    kind: Mapped[str] = mapped_column(String(16))
+
+    day_from: Mapped[date] = mapped_column(Date)
+    day_to: Mapped[date] = mapped_column(Date)
+    row_count: Mapped[int] = mapped_column(Integer)
+    payload: Mapped[bytes] = mapped_column(LargeBinary)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from bot.utils.cache import TTLCache
+
+from .models import User
+
+
+@dataclass(frozen=True, slots=True)
+class UserProfile:
+    """
+    Неизменяемый снимок профиля пользователя (без привязки к сессии БД).
+
+    Хранится в ProfileCache, чтобы хэндлеры, которым нужны только поля профиля
+    (цели, выбор меню, вес), не ходили в БД за User на каждом апдейте.
+    """
+    id: int
+    tg_id: int
+    sex: str | None
+    weight_kg: float | None
+    height_cm: float | None
+    age: int | None
+    activity_min_per_day: int | None
+    city: str | None
+    goal: str | None
+    calorie_goal_manual: int | None
+    profile_completed: bool
+
+    @classmethod
+    def from_user(cls, user: User) -> "UserProfile":
+        """
+        Создаёт снимок из ORM-объекта User.
+        """
+        return cls(
+            id=user.id,
+            tg_id=user.tg_id,
+            sex=user.sex,
+            weight_kg=user.weight_kg,
+            height_cm=user.height_cm,
+            age=user.age,
+            activity_min_per_day=user.activity_min_per_day,
+            city=user.city,
+            goal=user.goal,
+            calorie_goal_manual=user.calorie_goal_manual,
+            profile_completed=bool(user.profile_completed),
+        )
+
+    @property
+    def is_complete(self) -> bool:
+        """
+        Достаточно ли данных, чтобы считать цели по воде и калориям.
+        """
+        return bool(
+            self.sex
+            and self.weight_kg
+            and self.height_cm
+            and self.age
+            and self.activity_min_per_day is not None
+            and self.city
+            and self.goal
+        )
+
+
+class ProfileCache:
+    """
+    Кэш снимков профиля по tg_id (LRU + TTL) с write-through обновлением.
+
+    TTL ограничивает устаревание, если профиль меняет другой процесс бота.
+    """
+
+    def __init__(self, maxsize: int = 10_000, ttl_s: float = 600.0):
+        self._cache: TTLCache[int, UserProfile] = TTLCache(maxsize, ttl_s)
+
+    def get(self, tg_id: int) -> UserProfile | None:
+        """
+        Возвращает снимок профиля или None (промах / устарел).
+        """
+        return self._cache.get(tg_id)
+
+    def put(self, profile: UserProfile) -> None:
+        """
+        Кладёт/обновляет снимок (вызывается после загрузки или сохранения User).
+        """
+        self._cache.set(profile.tg_id, profile)
+
+    def invalidate(self, tg_id: int) -> None:
+        """
+        Удаляет снимок (следующее обращение загрузит User из БД).
+        """
+        self._cache.pop(tg_id)
+
+    def stats(self) -> dict:
+        """
+        Счётчики попаданий/промахов для метрик.
+        """
+        return self._cache.stats()
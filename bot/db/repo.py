@@ -1,11 +1,87 @@
 from __future__ import annotations
 
-from datetime import date
+from datetime import date, datetime
 
-from sqlalchemy import select
+from sqlalchemy import case, delete, func, literal_column, or_, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from .models import DayStat, FoodCustom, User
+from . import fts
+from .models import (
+    DayStat,
+    FoodCustom,
+    FoodFavorite,
+    FoodLog,
+    LogArchive,
+    ProviderCacheEntry,
+    User,
+    WeekStat,
+    WorkoutLog,
+)
+from .retention import decode_rows
+
+
+# INSERT с поддержкой ON CONFLICT для каждого поддерживаемого диалекта
+_UPSERT_INSERTS = {
+    "sqlite": sqlite_insert,
+    "postgresql": pg_insert,
+}
+
+
+# Сколько самых частых продуктов пользователя просматривает Repo.find_favorites
+FAVORITES_SCAN = 500
+
+
+def _totals_upsert(dialect: str, model, key_cols: list, rows: list[dict]):
+    """
+    INSERT ... ON CONFLICT(<key_cols>) DO UPDATE, прибавляющий water_ml / calories_in /
+    calories_out из rows к существующей строке агрегата (DayStat / WeekStat).
+
+    dialect - имя диалекта БД ("sqlite" / "postgresql"): синтаксис у них общий,
+    но конструкция insert() для каждого своя.
+    """
+    try:
+        insert = _UPSERT_INSERTS[dialect]
+    except KeyError:
+        raise NotImplementedError(f"upsert is not supported for dialect {dialect!r}") from None
+
+    stmt = insert(model).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=key_cols,
+        set_={
+            "water_ml": model.water_ml + stmt.excluded.water_ml,
+            "calories_in": model.calories_in + stmt.excluded.calories_in,
+            "calories_out": model.calories_out + stmt.excluded.calories_out,
+        },
+    )
+
+
+def _like_escape(value: str) -> str:
+    """
+    Экранирует спецсимволы LIKE (escape-символ - обратный слэш).
+    """
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _case_variants(query_str: str) -> list[str]:
+    """
+    Варианты регистра запроса: LIKE / ILIKE в SQLite сворачивает только ASCII,
+    поэтому «кур» отдельно ищется и как «Кур» / «КУР».
+    """
+    q = " ".join(query_str.split())
+    return list(dict.fromkeys((q, q.lower(), q.capitalize(), q.upper())))
+
+
+def _prefix_first(query_str: str) -> tuple:
+    """
+    ORDER BY для поиска по названию FoodCustom: сначала названия, начинающиеся
+    с запроса (в любом из _case_variants), затем более короткие.
+    """
+    prefix = or_(
+        *(FoodCustom.name.like(f"{_like_escape(v)}%", escape="\\") for v in _case_variants(query_str))
+    )
+    return case((prefix, 0), else_=1), func.length(FoodCustom.name)
 
 
 class Repo:
@@ -15,13 +91,22 @@ class Repo:
     Инкапсулирует типовые операции:
     - get_or_create пользователя
     - get_or_create дневной статистики
+    - атомарное приращение дневных счётчиков (вода / калории) и недельного роллапа
     - upsert и поиск кастомных продуктов
+    - персистентный кэш ответов внешних API
     """
 
     def __init__(self, session: AsyncSession):
         # AsyncSession, передаётся извне (через session_factory)
         self.s = session
 
+    @property
+    def _dialect(self) -> str:
+        """
+        Имя диалекта БД сессии (для dialect-specific upsert).
+        """
+        return self.s.get_bind().dialect.name
+
     async def get_or_create_user(self, tg_id: int) -> User:
         """
         Возвращает пользователя по tg_id или создаёт нового.
@@ -58,6 +143,292 @@ class Repo:
         await self.s.refresh(stat)
         return stat
 
+    async def add_day_totals(
+        self,
+        user_id: int,
+        day: date,
+        *,
+        water_ml: int = 0,
+        calories_in: float = 0.0,
+        calories_out: float = 0.0,
+    ) -> DayStat:
+        """
+        Атомарно прибавляет дельты к дневной статистике и возвращает новые итоги.
+
+        Один запрос INSERT ... ON CONFLICT(user_id, day) DO UPDATE SET x = x + delta:
+        строка за день создаётся при первом логе, а параллельные апдейты
+        одного пользователя не теряют приращения (нет read-modify-write в Python).
+        Теми же дельтами обновляется недельный роллап.
+
+        commit не выполняется - его делает вызывающий код вместе с записью лога.
+        """
+        delta = {
+            "user_id": user_id,
+            "day": day,
+            "water_ml": int(water_ml),
+            "calories_in": float(calories_in),
+            "calories_out": float(calories_out),
+        }
+        stmt = _totals_upsert(
+            self._dialect, DayStat, [DayStat.user_id, DayStat.day], [delta]
+        ).returning(DayStat)
+
+        # populate_existing - если DayStat уже в identity map сессии, обновляем его значениями из RETURNING
+        res = await self.s.scalars(stmt, execution_options={"populate_existing": True})
+        stat = res.one()
+
+        await self._add_rollups([delta])
+        return stat
+
+    async def add_day_totals_many(self, deltas: list[dict]) -> None:
+        """
+        Пакетный вариант add_day_totals: один многострочный INSERT ... ON CONFLICT
+        для дельт вида {"user_id", "day", "water_ml", "calories_in", "calories_out"}
+        (плюс один upsert недельного роллапа).
+
+        Ключи (user_id, day) в пакете должны быть уникальны (дельты заранее агрегированы).
+        commit не выполняется.
+        """
+        if not deltas:
+            return
+
+        await self.s.execute(_totals_upsert(self._dialect, DayStat, [DayStat.user_id, DayStat.day], deltas))
+        await self._add_rollups(deltas)
+
+    async def _add_rollups(self, deltas: list[dict]) -> None:
+        """
+        Прибавляет дневные дельты к WeekStat (дельты агрегируются по неделям).
+        """
+        buckets: dict[tuple[int, date], dict] = {}
+        for d in deltas:
+            key = (d["user_id"], WeekStat.bucket(d["day"]))
+            row = buckets.setdefault(
+                key,
+                {"user_id": key[0], "week_start": key[1], "water_ml": 0, "calories_in": 0.0, "calories_out": 0.0},
+            )
+            row["water_ml"] += int(d["water_ml"])
+            row["calories_in"] += float(d["calories_in"])
+            row["calories_out"] += float(d["calories_out"])
+
+        await self.s.execute(
+            _totals_upsert(self._dialect, WeekStat, [WeekStat.user_id, WeekStat.week_start], list(buckets.values()))
+        )
+
+    async def week_stats_range(self, user_id: int, start: date, end: date) -> list[WeekStat]:
+        """
+        Недельные роллапы пользователя, чьи недели начинаются в [start, end].
+        """
+        res = await self.s.execute(
+            select(WeekStat)
+            .where(
+                WeekStat.user_id == user_id,
+                WeekStat.week_start >= start,
+                WeekStat.week_start <= end,
+            )
+            .order_by(WeekStat.week_start)
+        )
+        return list(res.scalars().all())
+
+    async def day_stats_range(self, user_id: int, start: date, end: date) -> list[DayStat]:
+        """
+        Возвращает дневную статистику пользователя за [start, end] (дни без записей пропускаются).
+        """
+        res = await self.s.execute(
+            select(DayStat)
+            .where(
+                DayStat.user_id == user_id,
+                DayStat.day >= start,
+                DayStat.day <= end,
+            )
+            .order_by(DayStat.day)
+        )
+        return list(res.scalars().all())
+
+    async def day_totals_range(self, user_id: int, start: date, end: date) -> list[tuple[date, int, float, float]]:
+        """
+        Дневные итоги за [start, end] одним запросом, без ORM-объектов:
+        [(day, water_ml, calories_in, calories_out), ...] (для длинных графиков).
+        """
+        res = await self.s.execute(
+            select(DayStat.day, DayStat.water_ml, DayStat.calories_in, DayStat.calories_out)
+            .where(
+                DayStat.user_id == user_id,
+                DayStat.day >= start,
+                DayStat.day <= end,
+            )
+            .order_by(DayStat.day)
+        )
+        return [tuple(row) for row in res.all()]
+
+    async def food_logs_range(self, user_id: int, start: date, end: date) -> list[FoodLog]:
+        """
+        Лог еды пользователя за [start, end] в хронологическом порядке.
+        """
+        res = await self.s.execute(
+            select(FoodLog)
+            .where(
+                FoodLog.user_id == user_id,
+                FoodLog.day >= start,
+                FoodLog.day <= end,
+            )
+            .order_by(FoodLog.day, FoodLog.id)
+        )
+        return list(res.scalars().all())
+
+    async def workout_logs_range(self, user_id: int, start: date, end: date) -> list[WorkoutLog]:
+        """
+        Лог тренировок пользователя за [start, end] в хронологическом порядке.
+        """
+        res = await self.s.execute(
+            select(WorkoutLog)
+            .where(
+                WorkoutLog.user_id == user_id,
+                WorkoutLog.day >= start,
+                WorkoutLog.day <= end,
+            )
+            .order_by(WorkoutLog.day, WorkoutLog.id)
+        )
+        return list(res.scalars().all())
+
+    async def archived_logs(self, user_id: int, kind: str, start: date, end: date) -> list[dict]:
+        """
+        Архивные строки лога (kind = "food" / "workout") пользователя за [start, end]
+        в хронологическом порядке - dict с колонками исходной таблицы (без user_id).
+        """
+        res = await self.s.execute(
+            select(LogArchive.payload)
+            .where(
+                LogArchive.user_id == user_id,
+                LogArchive.kind == kind,
+                LogArchive.day_from <= end,
+                LogArchive.day_to >= start,
+            )
+            .order_by(LogArchive.day_from, LogArchive.id)
+        )
+        rows = [
+            row
+            for payload in res.scalars().all()
+            for row in decode_rows(payload)
+            if start <= row["day"] <= end
+        ]
+        rows.sort(key=lambda r: (r["day"], r["id"]))
+        return rows
+
+    async def recent_food_logs(self, user_id: int, limit: int = 20) -> list[FoodLog]:
+        """
+        Последние записи еды пользователя (новые первыми).
+        """
+        res = await self.s.execute(
+            select(FoodLog)
+            .where(FoodLog.user_id == user_id)
+            .order_by(FoodLog.created_at.desc())
+            .limit(limit)
+        )
+        return list(res.scalars().all())
+
+    async def touch_favorites(self, food_rows: list[dict]) -> None:
+        """
+        Инкрементально обновляет личный индекс продуктов (FoodFavorite) по новым строкам FoodLog
+        (словари с user_id, name, grams, kcal и необязательным created_at): один многострочный upsert.
+
+        use_count прибавляется; последние граммы / калорийность / время берутся у более поздней
+        записи, так что импорт старой истории не перетирает свежие значения. commit не выполняется.
+        """
+        agg: dict[tuple[int, str], dict] = {}
+        for r in food_rows:
+            grams = float(r["grams"])
+            if grams <= 0:
+                continue
+            used_at = r.get("created_at") or datetime.utcnow()
+            key = (r["user_id"], r["name"])
+            row = agg.get(key)
+            if row is None:
+                row = agg[key] = {"user_id": r["user_id"], "name": r["name"], "use_count": 0, "last_used_at": used_at}
+            row["use_count"] += 1
+            if used_at >= row["last_used_at"]:
+                row.update(
+                    kcal_per_100g=float(r["kcal"]) / grams * 100.0,
+                    last_grams=grams,
+                    last_used_at=used_at,
+                )
+        if not agg:
+            return
+
+        insert = _UPSERT_INSERTS[self._dialect]
+        stmt = insert(FoodFavorite).values(list(agg.values()))
+        newer = stmt.excluded.last_used_at >= FoodFavorite.last_used_at
+        await self.s.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[FoodFavorite.user_id, FoodFavorite.name],
+                set_={
+                    "use_count": FoodFavorite.use_count + stmt.excluded.use_count,
+                    "kcal_per_100g": case((newer, stmt.excluded.kcal_per_100g), else_=FoodFavorite.kcal_per_100g),
+                    "last_grams": case((newer, stmt.excluded.last_grams), else_=FoodFavorite.last_grams),
+                    "last_used_at": case((newer, stmt.excluded.last_used_at), else_=FoodFavorite.last_used_at),
+                },
+            )
+        )
+
+    async def favorite_foods(self, user_id: int, limit: int = 6) -> list[FoodFavorite]:
+        """
+        Недавние и частые продукты пользователя для клавиатуры «ещё раз»:
+        половина - последние по времени, остальное - самые частые из оставшихся.
+        """
+        recent = await self.s.execute(
+            select(FoodFavorite)
+            .where(FoodFavorite.user_id == user_id)
+            .order_by(FoodFavorite.last_used_at.desc())
+            .limit(limit)
+        )
+        frequent = await self.s.execute(
+            select(FoodFavorite)
+            .where(FoodFavorite.user_id == user_id)
+            .order_by(FoodFavorite.use_count.desc())
+            .limit(limit)
+        )
+        recent_list = list(recent.scalars().all())
+        result = recent_list[:(limit + 1) // 2]
+        for fav in [*frequent.scalars().all(), *recent_list]:
+            if len(result) >= limit:
+                break
+            if fav not in result:
+                result.append(fav)
+        return result
+
+    async def find_favorites(self, user_id: int, query_str: str, limit: int = 5) -> list[FoodFavorite]:
+        """
+        Продукты из личного индекса, название которых содержит все слова запроса
+        (нормализованные, см. fts.normalize). Личный индекс невелик: читаются до
+        FAVORITES_SCAN самых частых продуктов пользователя по индексу (user_id, use_count),
+        фильтр и ранжирование (группа fts.rank_key, затем частота) - в Python:
+        ILIKE в SQLite не сворачивает регистр кириллицы.
+        """
+        words = fts.normalize(query_str).split()
+        if not words:
+            return []
+        res = await self.s.execute(
+            select(FoodFavorite)
+            .where(FoodFavorite.user_id == user_id)
+            .order_by(FoodFavorite.use_count.desc())
+            .limit(FAVORITES_SCAN)
+        )
+        found = [
+            fav for fav in res.scalars().all()
+            if all(w in fts.normalize(fav.name) for w in words)
+        ]
+        # Группа совпадения (префикс / подстрока / все слова), внутри - частые первыми
+        found.sort(key=lambda fav: (fts.rank_key(fav.name, query_str)[0], -fav.use_count))
+        return found[:limit]
+
+    async def get_favorite(self, user_id: int, favorite_id: int) -> FoodFavorite | None:
+        """
+        Продукт личного индекса по id (только свой - проверяется user_id).
+        """
+        res = await self.s.execute(
+            select(FoodFavorite).where(FoodFavorite.id == favorite_id, FoodFavorite.user_id == user_id)
+        )
+        return res.scalar_one_or_none()
+
     async def upsert_custom_food(self, name: str, kcal_per_100g: float) -> FoodCustom:
         """
         Создаёт кастомный продукт или обновляет kcal_per_100g, если продукт уже есть.
@@ -80,13 +451,113 @@ class Repo:
         await self.s.refresh(item)
         return item
 
-    async def find_custom_food(self, query_str: str, limit: int = 5) -> list[FoodCustom]:
+    async def get_provider_cache(self, provider: str, query: str) -> ProviderCacheEntry | None:
         """
-        Ищет кастомные продукты по подстроке в названии.
+        Запись кэша внешнего API по (provider, нормализованный запрос), в том числе устаревшая -
+        срок годности проверяет вызывающий код.
         """
         res = await self.s.execute(
-            select(FoodCustom)
-            .where(FoodCustom.name.ilike(f"%{query_str}%"))
-            .limit(limit)
+            select(ProviderCacheEntry).where(
+                ProviderCacheEntry.provider == provider,
+                ProviderCacheEntry.query == query,
+            )
+        )
+        return res.scalar_one_or_none()
+
+    async def get_provider_cache_many(self, provider: str, queries: list[str]) -> dict[str, ProviderCacheEntry]:
+        """
+        Записи кэша внешнего API для нескольких запросов одним SELECT: {запрос: запись}.
+        Отсутствующих ключей в словаре нет; срок годности проверяет вызывающий код.
+        """
+        if not queries:
+            return {}
+        res = await self.s.execute(
+            select(ProviderCacheEntry).where(
+                ProviderCacheEntry.provider == provider,
+                ProviderCacheEntry.query.in_(queries),
+            )
+        )
+        return {e.query: e for e in res.scalars().all()}
+
+    async def put_provider_cache(self, provider: str, query: str, payload: str, expires_at: datetime) -> None:
+        """
+        Создаёт или перезаписывает запись кэша внешнего API (один upsert). commit не выполняется.
+        """
+        insert = _UPSERT_INSERTS[self._dialect]
+        stmt = insert(ProviderCacheEntry).values(
+            provider=provider, query=query, payload=payload, expires_at=expires_at
         )
+        await self.s.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[ProviderCacheEntry.provider, ProviderCacheEntry.query],
+                set_={"payload": stmt.excluded.payload, "expires_at": stmt.excluded.expires_at},
+            )
+        )
+
+    async def purge_provider_cache(self, now: datetime) -> int:
+        """
+        Удаляет устаревшие записи кэша внешних API. Возвращает количество удалённых. commit не выполняется.
+        """
+        res = await self.s.execute(delete(ProviderCacheEntry).where(ProviderCacheEntry.expires_at <= now))
+        return res.rowcount or 0
+
+    async def find_custom_food(self, query_str: str, limit: int = 5) -> list[FoodCustom]:
+        """
+        Ищет кастомные продукты по названию.
+
+        Если доступен FTS5-индекс (см. bot.db.fts):
+        1) слова запроса как подстроки через trigram-индекс; в SQL до LIMIT - сначала
+           названия, начинающиеся с запроса, затем короткие; окончательно - fts.rank_key;
+        2) если нашлось меньше limit - добор нечёткими совпадениями (опечатки) по bm25.
+        Иначе (нет FTS5, запрос короче 3 символов) - ILIKE по подстроке с тем же порядком.
+        """
+        exact = fts.substring_match_query(query_str) if fts.is_enabled() else None
+        if exact is None:
+            # SQLite ILIKE не сворачивает регистр кириллицы - ищем и варианты регистра запроса
+            variants = _case_variants(query_str)
+            res = await self.s.execute(
+                select(FoodCustom)
+                .where(or_(*(FoodCustom.name.ilike(f"%{_like_escape(v)}%", escape="\\") for v in variants)))
+                .order_by(*_prefix_first(query_str))
+                .limit(limit * 4)
+            )
+            items = list(res.scalars().all())
+            items.sort(key=lambda it: fts.rank_key(it.name, query_str))
+            return items[:limit]
+
+        # Подстрочные совпадения: без сортировки по bm25 (она дорогая на частых словах),
+        # но префиксные совпадения - до LIMIT, иначе «Курица» теряется среди «Суп с курицей»
+        items = await self._fts_candidates(exact, limit * 4, prefix_of=query_str)
+        items.sort(key=lambda it: fts.rank_key(it.name, query_str))
+        items = items[:limit]
+        if len(items) >= limit:
+            return items
+
+        # Нечёткий добор: OR по триграммам, лучшие по bm25, отсекаем слабо похожие
+        seen = {it.id for it in items}
+        fuzzy = [
+            it for it in await self._fts_candidates(fts.fuzzy_match_query(query_str), limit * 10)
+            if it.id not in seen and fts.similarity(it.name, query_str) >= fts.MIN_SIMILARITY
+        ]
+        fuzzy.sort(key=lambda it: fts.rank_key(it.name, query_str))
+        return items + fuzzy[:limit - len(items)]
+
+    async def _fts_candidates(self, match: str, n: int, *, prefix_of: str | None = None) -> list[FoodCustom]:
+        """
+        До n продуктов из food_custom_fts по выражению MATCH: в порядке bm25 или,
+        если задан prefix_of, - сначала начинающиеся с prefix_of, затем короче.
+        """
+        ids = (
+            select(literal_column("rowid").label("id"))
+            .select_from(text("food_custom_fts"))
+            .where(text("food_custom_fts MATCH :match"))
+        )
+        if prefix_of is None:
+            ids = ids.order_by(text("rank")).limit(n)
+        ids = ids.subquery()
+
+        stmt = select(FoodCustom).join(ids, ids.c.id == FoodCustom.id)
+        if prefix_of is not None:
+            stmt = stmt.order_by(*_prefix_first(prefix_of)).limit(n)
+        res = await self.s.execute(stmt, {"match": match})
         return list(res.scalars().all())
@@ -0,0 +1,368 @@
+"""
+Хранение и архивация старых логов.
+
+Строки FoodLog / WorkoutLog за целые месяцы старше горизонта (RetentionPolicy.horizon_days)
+переносятся в таблицу log_archives - по одной сжатой пачке на пользователя,
+вид лога и календарный месяц. DayStat и роллапы не меняются: итоги по дням,
+графики и прогресс остаются полными. Архив читается через Repo.archived_logs.
+
+После архивации в тихие часы:
+- SQLite: PRAGMA incremental_vacuum (возвращает освободившиеся страницы ОС)
+  и PRAGMA optimize (ANALYZE там, где статистика устарела);
+- PostgreSQL: ANALYZE (вакуум делает autovacuum).
+
+Запуск вручную:
+    python -m bot.db.retention archive [--days 365]
+    python -m bot.db.retention maintain
+    python -m bot.db.retention enable-incremental-vacuum
+    python -m bot.db.retention show <tg_id> food|workout <YYYY-MM-DD> <YYYY-MM-DD>
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import zlib
+from datetime import date, datetime, timedelta
+
+from pydantic import BaseModel, ConfigDict
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from .models import FoodLog, LogArchive, User, WorkoutLog
+
+logger = logging.getLogger("bot")
+
+# Вид лога (LogArchive.kind) -> модель
+ARCHIVED_MODELS = {
+    "food": FoodLog,
+    "workout": WorkoutLog,
+}
+
+# Сколько id удалять одним DELETE ... WHERE id IN (...) (лимит параметров SQLite)
+_DELETE_CHUNK = 500
+
+# Таблицы, которым после архивации нужна свежая статистика планировщика
+_ANALYZE_TABLES = ("food_logs", "workout_logs", "log_archives")
+
+
+class RetentionPolicy(BaseModel):
+    """
+    Политика хранения логов.
+
+    horizon_days - логи старше стольких дней уходят в архив;
+    quiet_start_hour / quiet_end_hour - окно тихих часов (локальное время, конец не включается,
+                                        окно может переходить через полночь, например 23-5);
+    vacuum_pages - сколько свободных страниц SQLite возвращать за один проход.
+    """
+    model_config = ConfigDict(frozen=True)
+
+    horizon_days: int = 365
+    chunk_users: int = 200
+    quiet_start_hour: int = 3
+    quiet_end_hour: int = 6
+    vacuum_pages: int = 2000
+    check_interval_s: float = 600.0
+
+    def in_quiet_hours(self, now: datetime) -> bool:
+        """
+        True, если now попадает в окно тихих часов.
+        """
+        start, end, hour = self.quiet_start_hour, self.quiet_end_hour, now.hour
+        if start <= end:
+            return start <= hour < end
+        return hour >= start or hour < end
+
+
+def encode_rows(rows: list[dict]) -> bytes:
+    """
+    Пачка строк лога -> zlib(JSON). date / datetime сериализуются в ISO-формате.
+    """
+    raw = json.dumps(rows, ensure_ascii=False, separators=(",", ":"), default=lambda v: v.isoformat())
+    return zlib.compress(raw.encode("utf-8"), 6)
+
+
+def decode_rows(payload: bytes) -> list[dict]:
+    """
+    Обратное преобразование encode_rows: day -> date, created_at -> datetime.
+    """
+    rows = json.loads(zlib.decompress(payload).decode("utf-8"))
+    for row in rows:
+        row["day"] = date.fromisoformat(row["day"])
+        if row.get("created_at"):
+            row["created_at"] = datetime.fromisoformat(row["created_at"])
+    return rows
+
+
+def _row_dict(item) -> dict:
+    """
+    Строка лога -> dict всех колонок, кроме user_id (он хранится в LogArchive).
+    """
+    return {
+        col.key: getattr(item, col.key)
+        for col in item.__table__.columns
+        if col.key != "user_id"
+    }
+
+
+async def archive_old_logs(
+    session_factory: async_sessionmaker,
+    before: date,
+    chunk_users: int = 200,
+) -> dict[str, int]:
+    """
+    Переносит логи за целые месяцы до before (before округляется вниз до первого числа)
+    в log_archives, пачками по chunk_users пользователей (одна транзакция на пачку:
+    архив пишется и исходные строки удаляются атомарно).
+
+    На (пользователь, вид, месяц) - одна пачка: если она уже есть (например, после
+    импорта старой истории), новые строки дописываются в неё, а не в отдельную пачку.
+    Удаляются ровно те строки, что попали в архив (по id).
+
+    Возвращает количество перенесённых строк по видам логов.
+    """
+    before = before.replace(day=1)
+    moved = {kind: 0 for kind in ARCHIVED_MODELS}
+    last_id = 0
+
+    while True:
+        async with session_factory() as session:
+            res = await session.execute(
+                select(User.id).where(User.id > last_id).order_by(User.id).limit(chunk_users)
+            )
+            user_ids = list(res.scalars().all())
+            if not user_ids:
+                return moved
+
+            for kind, model in ARCHIVED_MODELS.items():
+                res = await session.execute(
+                    select(model)
+                    .where(model.user_id.in_(user_ids), model.day < before)
+                    .order_by(model.user_id, model.day, model.id)
+                )
+                items = list(res.scalars().all())
+                if not items:
+                    continue
+
+                # (user_id, месяц) -> строки пачки
+                groups: dict[tuple[int, date], list[dict]] = {}
+                for it in items:
+                    groups.setdefault((it.user_id, it.day.replace(day=1)), []).append(_row_dict(it))
+
+                await _merge_into_archive(session, kind, groups)
+
+                ids = [it.id for it in items]
+                for i in range(0, len(ids), _DELETE_CHUNK):
+                    await session.execute(delete(model).where(model.id.in_(ids[i:i + _DELETE_CHUNK])))
+                moved[kind] += len(items)
+
+            await session.commit()
+
+        last_id = user_ids[-1]
+
+
+async def _merge_into_archive(session, kind: str, groups: dict[tuple[int, date], list[dict]]) -> None:
+    """
+    Пишет пачки groups ((user_id, месяц) -> строки) в log_archives: месяц, для которого
+    пачка уже есть, перезаписывается одной пачкой со старыми и новыми строками
+    (лишние пачки того же месяца, если они остались от прежних версий, удаляются).
+    """
+    user_ids = sorted({user_id for user_id, _ in groups})
+    months = [month for _, month in groups]
+    res = await session.execute(
+        select(LogArchive).where(
+            LogArchive.user_id.in_(user_ids),
+            LogArchive.kind == kind,
+            LogArchive.day_from >= min(months),
+            LogArchive.day_from < _next_month(max(months)),
+        )
+    )
+    existing: dict[tuple[int, date], list[LogArchive]] = {}
+    for pack in res.scalars().all():
+        key = (pack.user_id, pack.day_from.replace(day=1))
+        if key in groups:
+            existing.setdefault(key, []).append(pack)
+
+    new_packs = []
+    for key, rows in groups.items():
+        packs = existing.get(key, [])
+        if packs:
+            rows = [row for pack in packs for row in decode_rows(pack.payload)] + rows
+            rows.sort(key=lambda r: (r["day"], r["id"]))
+            pack, *extra = packs
+            pack.day_from, pack.day_to = rows[0]["day"], rows[-1]["day"]
+            pack.row_count = len(rows)
+            pack.payload = encode_rows(rows)
+            for dup in extra:
+                await session.delete(dup)
+        else:
+            new_packs.append(
+                {
+                    "user_id": key[0],
+                    "kind": kind,
+                    "day_from": rows[0]["day"],
+                    "day_to": rows[-1]["day"],
+                    "row_count": len(rows),
+                    "payload": encode_rows(rows),
+                }
+            )
+    if new_packs:
+        await session.execute(insert(LogArchive), new_packs)
+
+
+def _next_month(month: date) -> date:
+    return (month + timedelta(days=32)).replace(day=1)
+
+
+async def enable_incremental_vacuum(engine) -> None:
+    """
+    SQLite: переводит существующую базу в auto_vacuum=INCREMENTAL.
+    Требует полного VACUUM (перезапись файла), поэтому выполняется только вручную.
+    """
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+        await conn.exec_driver_sql("VACUUM")
+
+
+async def _incremental_vacuum(conn, max_pages: int) -> int:
+    """
+    Возвращает ОС до max_pages свободных страниц SQLite. Возвращает количество освобождённых.
+
+    Драйвер выполняет только первый шаг PRAGMA incremental_vacuum (у неё нет строк результата,
+    которые можно было бы дочитать), поэтому повторяем, пока страницы освобождаются.
+    """
+    freed = 0
+    free = (await conn.exec_driver_sql("PRAGMA freelist_count")).scalar()
+    while free and freed < max_pages:
+        await conn.exec_driver_sql(f"PRAGMA incremental_vacuum({int(max_pages - freed)})")
+        left = (await conn.exec_driver_sql("PRAGMA freelist_count")).scalar()
+        if left >= free:
+            break
+        freed += free - left
+        free = left
+    return freed
+
+
+async def maintain_db(engine, vacuum_pages: int = 2000) -> None:
+    """
+    Обслуживание после архивации: возврат свободного места и обновление статистики.
+    """
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+
+        if conn.dialect.name == "postgresql":
+            for table in _ANALYZE_TABLES:
+                await conn.exec_driver_sql(f"ANALYZE {table}")
+            return
+
+        if conn.dialect.name != "sqlite":
+            return
+
+        mode = (await conn.exec_driver_sql("PRAGMA auto_vacuum")).scalar()
+        if mode == 2:  # INCREMENTAL
+            await _incremental_vacuum(conn, vacuum_pages)
+        else:
+            logger.warning(
+                "SQLite auto_vacuum != INCREMENTAL, место после архивации не возвращается; "
+                "выполните python -m bot.db.retention enable-incremental-vacuum"
+            )
+
+        # ANALYZE только для таблиц, где статистика заметно устарела
+        await conn.exec_driver_sql("PRAGMA optimize")
+
+
+async def run_retention(session_factory: async_sessionmaker, engine, policy: RetentionPolicy) -> dict[str, int]:
+    """
+    Один проход: архивация логов старше горизонта, очистка устаревшего кэша
+    внешних API + обслуживание БД.
+    """
+    before = date.today() - timedelta(days=policy.horizon_days)
+    moved = await archive_old_logs(session_factory, before, policy.chunk_users)
+
+    # Заодно чистим устаревшие записи кэша внешних API
+    from .repo import Repo
+
+    async with session_factory() as session:
+        purged = await Repo(session).purge_provider_cache(datetime.utcnow())
+        await session.commit()
+    logger.info("retention: purged %d provider cache entries", purged)
+
+    await maintain_db(engine, policy.vacuum_pages)
+    logger.info("retention: archived %s (before %s)", moved, before)
+    return moved
+
+
+async def run_retention_periodically(
+    session_factory: async_sessionmaker,
+    engine,
+    policy: RetentionPolicy,
+) -> None:
+    """
+    Фоновая задача: раз в check_interval_s проверяет, наступили ли тихие часы,
+    и выполняет run_retention не чаще одного раза в сутки.
+    """
+    last_run: date | None = None
+    while True:
+        await asyncio.sleep(policy.check_interval_s)
+
+        now = datetime.now()
+        if last_run == now.date() or not policy.in_quiet_hours(now):
+            continue
+
+        try:
+            await run_retention(session_factory, engine, policy)
+        except Exception:
+            logger.exception("retention run failed")
+        last_run = now.date()
+
+
+async def _main(args) -> None:
+    from bot.config import settings
+    from bot.db.repo import Repo
+    from bot.db.session import init_db, make_engine, make_session_factory
+
+    engine = make_engine(settings.db_path)
+    await init_db(engine)
+    session_factory = make_session_factory(engine)
+    try:
+        if args.command == "archive":
+            policy = RetentionPolicy(horizon_days=args.days, vacuum_pages=settings.retention_vacuum_pages)
+            print(await run_retention(session_factory, engine, policy))
+        elif args.command == "maintain":
+            await maintain_db(engine, settings.retention_vacuum_pages)
+        elif args.command == "enable-incremental-vacuum":
+            await enable_incremental_vacuum(engine)
+        elif args.command == "show":
+            async with session_factory() as session:
+                repo = Repo(session)
+                user = await repo.get_or_create_user(args.tg_id)
+                rows = await repo.archived_logs(
+                    user.id, args.kind, date.fromisoformat(args.start), date.fromisoformat(args.end)
+                )
+            for row in rows:
+                print(json.dumps(row, ensure_ascii=False, default=str))
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Архивация старых логов и обслуживание БД")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_archive = sub.add_parser("archive", help="перенести старые логи в архив и обслужить БД")
+    p_archive.add_argument("--days", type=int, default=365, help="горизонт хранения в днях")
+
+    sub.add_parser("maintain", help="incremental VACUUM + ANALYZE")
+    sub.add_parser("enable-incremental-vacuum", help="SQLite: включить auto_vacuum=INCREMENTAL (полный VACUUM)")
+
+    p_show = sub.add_parser("show", help="показать архивные логи пользователя")
+    p_show.add_argument("tg_id", type=int)
+    p_show.add_argument("kind", choices=sorted(ARCHIVED_MODELS))
+    p_show.add_argument("start")
+    p_show.add_argument("end")
+
+    asyncio.run(_main(parser.parse_args()))
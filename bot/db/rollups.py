@@ -0,0 +1,96 @@
+"""
+Пересчёт недельного роллапа (WeekStat) с нуля.
+
+В обычной работе роллапы обновляются инкрементально (Repo.add_day_totals).
+Пересчёт нужен после ручных правок, импорта или изменения логики агрегации.
+
+Источник - DayStat: он уже агрегирует FoodLog / WorkoutLog по дням, а вода
+из быстрых кнопок существует только в нём (событий для неё нет), и DayStat
+не трогает архивация старых логов.
+
+Запуск:
+    python -m bot.db.rollups rebuild [--chunk 500]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from .models import DayStat, User, WeekStat
+
+logger = logging.getLogger("bot")
+
+
+async def rebuild_rollups(session_factory: async_sessionmaker, chunk_users: int = 500) -> int:
+    """
+    Пересчитывает WeekStat пачками по chunk_users пользователей
+    (одна транзакция на пачку). Возвращает количество обработанных пользователей.
+    """
+    done = 0
+    last_id = 0
+
+    while True:
+        async with session_factory() as session:
+            res = await session.execute(
+                select(User.id).where(User.id > last_id).order_by(User.id).limit(chunk_users)
+            )
+            user_ids = list(res.scalars().all())
+            if not user_ids:
+                return done
+
+            weeks: dict[tuple[int, object], dict] = {}
+
+            # Потоково читаем дневную статистику пачки и агрегируем по неделям
+            stream = await session.stream(
+                select(DayStat.user_id, DayStat.day, DayStat.water_ml, DayStat.calories_in, DayStat.calories_out)
+                .where(DayStat.user_id >= user_ids[0], DayStat.user_id <= user_ids[-1])
+            )
+            async for user_id, day, water_ml, cal_in, cal_out in stream:
+                key = (user_id, WeekStat.bucket(day))
+                row = weeks.setdefault(
+                    key,
+                    {"user_id": user_id, "week_start": key[1], "water_ml": 0, "calories_in": 0.0, "calories_out": 0.0},
+                )
+                row["water_ml"] += int(water_ml or 0)
+                row["calories_in"] += float(cal_in or 0.0)
+                row["calories_out"] += float(cal_out or 0.0)
+
+            await session.execute(
+                delete(WeekStat).where(WeekStat.user_id >= user_ids[0], WeekStat.user_id <= user_ids[-1])
+            )
+            if weeks:
+                await session.execute(insert(WeekStat), list(weeks.values()))
+
+            await session.commit()
+
+        done += len(user_ids)
+        last_id = user_ids[-1]
+        logger.info("rollups rebuilt for %d users", done)
+
+
+async def _main(chunk: int) -> None:
+    from bot.config import settings
+    from bot.db.session import init_db, make_engine, make_session_factory
+
+    engine = make_engine(settings.db_path)
+    await init_db(engine)
+    try:
+        total = await rebuild_rollups(make_session_factory(engine), chunk)
+    finally:
+        await engine.dispose()
+    print(f"rollups rebuilt: {total} users")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Пересчёт WeekStat")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--chunk", type=int, default=500, help="пользователей на транзакцию")
+    args = parser.parse_args()
+
+    asyncio.run(_main(args.chunk))
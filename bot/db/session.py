@@ -1,42 +1,255 @@
+from pydantic import BaseModel, ConfigDict
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import (
     AsyncSession,
     async_sessionmaker,
     create_async_engine,
 )
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.dml import UpdateBase
 
+from . import fts, models  # noqa: F401  (models регистрирует таблицы в Base.metadata)
 from .base import Base
 
 
-def make_engine(db_path: str):
+class SqliteProfile(BaseModel):
     """
-    Создаёт асинхронный SQLAlchemy engine для SQLite.
+    Профиль подключения к SQLite: PRAGMA, которые выставляются на каждом соединении,
+    и размер пула читателей.
 
-    db_path - путь к файлу базы данных.
+    journal_mode=WAL - читатели не блокируются писателем;
+    synchronous=NORMAL - в WAL безопасно и сильно дешевле FULL по fsync;
+    busy_timeout_ms - сколько ждать блокировку вместо мгновенного "database is locked".
     """
+    model_config = ConfigDict(frozen=True)
+
+    journal_mode: str = "WAL"
+    synchronous: str = "NORMAL"
+    cache_size_kib: int = 16384
+    mmap_size_mb: int = 128
+    temp_store: str = "MEMORY"
+    busy_timeout_ms: int = 5000
+    # Для новых баз: свободные страницы возвращаются через PRAGMA incremental_vacuum
+    # (существующую базу переводит python -m bot.db.retention enable-incremental-vacuum)
+    auto_vacuum: str = "INCREMENTAL"
+
+    # Количество соединений-читателей (писатель всегда один)
+    read_pool_size: int = 4
+
+
+def _apply_pragmas(engine, profile: SqliteProfile, *, query_only: bool = False) -> None:
+    """
+    Вешает на engine обработчик, выставляющий PRAGMA при открытии каждого соединения.
+    """
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        # Действует только до создания первой таблицы, на существующей базе - no-op
+        cursor.execute(f"PRAGMA auto_vacuum={profile.auto_vacuum}")
+        cursor.execute(f"PRAGMA journal_mode={profile.journal_mode}")
+        cursor.execute(f"PRAGMA synchronous={profile.synchronous}")
+        # Отрицательное значение cache_size - размер в KiB, а не в страницах
+        cursor.execute(f"PRAGMA cache_size=-{int(profile.cache_size_kib)}")
+        cursor.execute(f"PRAGMA mmap_size={int(profile.mmap_size_mb) * 1024 * 1024}")
+        cursor.execute(f"PRAGMA temp_store={profile.temp_store}")
+        cursor.execute(f"PRAGMA busy_timeout={int(profile.busy_timeout_ms)}")
+        if query_only:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+
+class PoolProfile(BaseModel):
+    """
+    Пул соединений для серверной СУБД (PostgreSQL через asyncpg).
+
+    pre_ping - проверять соединение перед выдачей из пула (переживаем рестарт БД / обрыв);
+    statement_cache_size - кэш prepared statements на соединение
+    (0 - выключить, нужно за PgBouncer в режиме transaction pooling).
+    """
+    model_config = ConfigDict(frozen=True)
+
+    pool_size: int = 10
+    max_overflow: int = 10
+    pre_ping: bool = True
+    timeout_s: float = 30.0
+    recycle_s: int = 1800
+    statement_cache_size: int = 100
+
+
+def database_url(db: str) -> str:
+    """
+    Полный URL базы данных: строки вида "driver://..." возвращаются как есть,
+    просто путь к файлу превращается в URL SQLite (aiosqlite).
+    """
+    if "://" in db:
+        return db
+    return f"sqlite+aiosqlite:///{db}"
+
+
+def is_sqlite(db: str) -> bool:
+    """
+    True, если путь / URL указывает на SQLite.
+    """
+    return make_url(database_url(db)).get_backend_name() == "sqlite"
+
+
+def _make_server_engine(url: str, pool: PoolProfile):
+    """
+    Engine для серверной СУБД с настраиваемым пулом.
+    """
+    sa_url = make_url(url)
+    connect_args = {}
+    if sa_url.get_driver_name() == "asyncpg":
+        # Кэш asyncpg (на стороне сервера) и кэш SQLAlchemy поверх него - одного размера
+        connect_args["statement_cache_size"] = pool.statement_cache_size
+        sa_url = sa_url.update_query_dict(
+            {"prepared_statement_cache_size": str(pool.statement_cache_size)}
+        )
+
     return create_async_engine(
-        f"sqlite+aiosqlite:///{db_path}",
-        echo=False,  # SQL-логи выключены
+        sa_url,
+        echo=False,
+        pool_size=pool.pool_size,
+        max_overflow=pool.max_overflow,
+        pool_pre_ping=pool.pre_ping,
+        pool_timeout=pool.timeout_s,
+        pool_recycle=pool.recycle_s,
+        connect_args=connect_args,
+    )
+
+
+def make_engine(db: str, profile: SqliteProfile | None = None, pool: PoolProfile | None = None):
+    """
+    Создаёт асинхронный SQLAlchemy engine.
+
+    db - путь к файлу SQLite или полный URL (sqlite+aiosqlite://..., postgresql+asyncpg://...).
+    profile - только для SQLite: если задан, engine становится единственным писателем:
+              пул из одного соединения (записи сериализуются внутри процесса)
+              и PRAGMA из профиля на каждом соединении.
+    pool - только для серверных СУБД: размеры пула, pre-ping, кэш statements
+           (по умолчанию PoolProfile()).
+    """
+    url = database_url(db)
+    if not is_sqlite(url):
+        return _make_server_engine(url, pool or PoolProfile())
+
+    if profile is None:
+        return create_async_engine(
+            url,
+            echo=False,  # SQL-логи выключены
+        )
+
+    engine = create_async_engine(
+        url,
+        echo=False,
+        pool_size=1,
+        max_overflow=0,
+        # Ожидание писателя в очереди пула ограничиваем тем же busy_timeout
+        pool_timeout=profile.busy_timeout_ms / 1000.0,
     )
+    _apply_pragmas(engine, profile)
+    return engine
+
+
+def make_read_engine(db: str, profile: SqliteProfile):
+    """
+    Создаёт engine для читателей SQLite: пул из profile.read_pool_size соединений
+    в режиме query_only. В WAL читатели работают параллельно с писателем.
+    """
+    engine = create_async_engine(
+        database_url(db),
+        echo=False,
+        pool_size=profile.read_pool_size,
+        max_overflow=0,
+    )
+    _apply_pragmas(engine, profile, query_only=True)
+    return engine
+
+
+class RoutingSession(Session):
+    """
+    Sync-сессия, которая отправляет SELECT в пул читателей, а flush и DML - писателю.
+
+    Как только в транзакции была запись, сессия «прилипает» к писателю до конца
+    транзакции: так последующие SELECT видят ещё не закоммиченные изменения.
+    Engines передаются через info={"writer": ..., "reader": ...}.
+    """
+
+    _writer_pinned = False
 
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self._writer_pinned or self._flushing or isinstance(clause, UpdateBase):
+            self._writer_pinned = True
+            return self.info["writer"]
+        return self.info["reader"]
 
-def make_session_factory(engine):
+
+@event.listens_for(RoutingSession, "after_transaction_end")
+def _unpin_writer(session, transaction) -> None:
+    """
+    По завершении корневой транзакции снова разрешаем чтение через читателей.
+    """
+    if transaction.parent is None:
+        session._writer_pinned = False
+
+
+def make_session_factory(engine, read_engine=None):
     """
     Создаёт фабрику асинхронных сессий.
 
     expire_on_commit=False - объекты остаются доступными
     после commit (удобно для бота).
+
+    read_engine - если передан, чтения идут через него (см. RoutingSession),
+    а engine используется как писатель.
     """
+    if read_engine is None:
+        return async_sessionmaker(
+            engine,
+            expire_on_commit=False,
+            class_=AsyncSession,
+        )
+
     return async_sessionmaker(
-        engine,
         expire_on_commit=False,
         class_=AsyncSession,
+        sync_session_class=RoutingSession,
+        info={"writer": engine.sync_engine, "reader": read_engine.sync_engine},
     )
 
 
+# Индексы старых версий схемы, которые перекрыты составными индексами
+OBSOLETE_INDEXES = (
+    "ix_day_stats_user_id",
+    "ix_day_stats_day",
+    "ix_food_logs_user_id",
+    "ix_workout_logs_user_id",
+)
+
+
+def _sync_indexes(sync_conn) -> None:
+    """
+    Досоздаёт индексы, объявленные в моделях, в уже существующих таблицах
+    (create_all создаёт индексы только вместе с новой таблицей)
+    и удаляет устаревшие.
+    """
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
+
+    for name in OBSOLETE_INDEXES:
+        sync_conn.exec_driver_sql(f"DROP INDEX IF EXISTS {name}")
+
+
 async def init_db(engine) -> None:
     """
-    Инициализирует базу данных: создаёт все таблицы,
-    описанные в Base.metadata.
+    Инициализирует базу данных: создаёт все таблицы и индексы,
+    описанные в Base.metadata, и индекс поиска продуктов
+    (FTS5 в SQLite, pg_trgm в PostgreSQL - если доступны).
     """
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_sync_indexes)
+        await fts.ensure_food_fts(conn)
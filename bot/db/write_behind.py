@@ -0,0 +1,315 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import NamedTuple
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from .models import DayStat, FoodLog, WorkoutLog
+from .repo import Repo
+
+logger = logging.getLogger("bot")
+
+
+class DayTotals(NamedTuple):
+    """
+    Итоги за день: вода и калории (сумма DayStat и ещё не записанных событий).
+    """
+    water_ml: int
+    calories_in: float
+    calories_out: float
+
+    @classmethod
+    def from_stat(cls, st: DayStat | None) -> "DayTotals":
+        """
+        Итоги из строки DayStat (None - нулевые итоги).
+        """
+        if st is None:
+            return cls(0, 0.0, 0.0)
+        return cls(int(st.water_ml), float(st.calories_in), float(st.calories_out))
+
+    def plus(self, other: "DayTotals") -> "DayTotals":
+        """
+        Поэлементная сумма итогов.
+        """
+        return DayTotals(
+            self.water_ml + other.water_ml,
+            self.calories_in + other.calories_in,
+            self.calories_out + other.calories_out,
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class WaterEvent:
+    """Добавление воды (мл)."""
+    user_id: int
+    day: date
+    ml: int
+
+
+@dataclass(frozen=True, slots=True)
+class FoodEvent:
+    """Приём пищи: строка FoodLog + дельта calories_in."""
+    user_id: int
+    day: date
+    name: str
+    grams: float
+    kcal: float
+    created_at: datetime = field(default_factory=datetime.utcnow)
+
+
+@dataclass(frozen=True, slots=True)
+class MealEvent:
+    """
+    Приём пищи из нескольких продуктов: строки FoodLog + одна дельта calories_in.
+    Одно событие - все строки попадают в БД одной транзакцией.
+    items - ((название, граммы, ккал), ...).
+    """
+    user_id: int
+    day: date
+    items: tuple[tuple[str, float, float], ...]
+    created_at: datetime = field(default_factory=datetime.utcnow)
+
+
+@dataclass(frozen=True, slots=True)
+class WorkoutEvent:
+    """Тренировка: строка WorkoutLog + дельты calories_out и воды."""
+    user_id: int
+    day: date
+    workout_type: str
+    minutes: int
+    intensity: str
+    kcal_burned: float
+    extra_water_ml: int
+    created_at: datetime = field(default_factory=datetime.utcnow)
+
+
+LogEvent = WaterEvent | FoodEvent | MealEvent | WorkoutEvent
+
+
+def event_totals(event: LogEvent) -> DayTotals:
+    """
+    Дельта дневных итогов, которую вносит событие.
+    """
+    if isinstance(event, WaterEvent):
+        return DayTotals(int(event.ml), 0.0, 0.0)
+    if isinstance(event, FoodEvent):
+        return DayTotals(0, float(event.kcal), 0.0)
+    if isinstance(event, MealEvent):
+        return DayTotals(0, sum(float(kcal) for _, _, kcal in event.items), 0.0)
+    return DayTotals(int(event.extra_water_ml), 0.0, float(event.kcal_burned))
+
+
+class WriteBehindQueue:
+    """
+    Write-behind очередь логов: хэндлеры кладут события без ожидания БД,
+    фоновая задача сбрасывает их раз в flush_interval_ms или при накоплении
+    max_batch событий - одной транзакцией:
+    - bulk INSERT строк FoodLog / WorkoutLog;
+    - upsert личного индекса продуктов (FoodFavorite) по тем же строкам FoodLog;
+    - один многострочный upsert агрегированных дельт DayStat.
+
+    Ещё не записанные дельты учитываются в pending_totals(), поэтому пользователь
+    сразу видит актуальные итоги. close() сбрасывает остаток при штатной остановке;
+    при аварийном завершении процесса теряются события не старше одного интервала.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker,
+        *,
+        flush_interval_ms: int = 200,
+        max_batch: int = 200,
+    ):
+        self.session_factory = session_factory
+        self.flush_interval_s = flush_interval_ms / 1000.0
+        self.max_batch = max_batch
+
+        self._events: list[LogEvent] = []
+
+        # (user_id, day) -> сумма дельт событий, ещё не закоммиченных в БД
+        self._pending: dict[tuple[int, date], DayTotals] = {}
+
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+        self._closed = False
+
+    def submit(self, event: LogEvent) -> None:
+        """
+        Ставит событие в очередь (без ожидания). При заполнении пакета будит фоновую задачу.
+        """
+        if self._closed:
+            raise RuntimeError("WriteBehindQueue is closed")
+
+        self._events.append(event)
+
+        key = (event.user_id, event.day)
+        self._pending[key] = self._pending.get(key, DayTotals(0, 0.0, 0.0)).plus(event_totals(event))
+
+        if len(self._events) >= self.max_batch:
+            self._wakeup.set()
+
+    def pending_totals(self, user_id: int, day: date) -> DayTotals:
+        """
+        Сумма дельт за день, которые ещё не записаны в DayStat.
+        """
+        return self._pending.get((user_id, day), DayTotals(0, 0.0, 0.0))
+
+    def start(self) -> None:
+        """
+        Запускает фоновую задачу сброса.
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        """
+        Останавливает фоновую задачу и синхронно сбрасывает оставшиеся события.
+
+        Задача не отменяется, а выходит из цикла сама: отмена посреди flush()
+        оставила бы пакет в неизвестном состоянии.
+        """
+        self._closed = True
+        if self._task is not None:
+            self._wakeup.set()
+            await self._task
+            self._task = None
+
+        await self.flush_all()
+
+    async def _run(self) -> None:
+        """
+        Цикл фоновой задачи: ждём интервал или заполнения пакета, затем сбрасываем.
+        Выходит после close() (остаток сбрасывает сам close()).
+        """
+        while not self._closed:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval_s)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            try:
+                await self.flush()
+            except Exception:
+                # События вернулись в очередь (см. flush), повторим на следующем тике
+                logger.exception("write-behind flush failed, will retry")
+
+    async def flush(self) -> int:
+        """
+        Записывает один пакет (до max_batch событий) одной транзакцией.
+        Возвращает количество записанных событий.
+        """
+        async with self._flush_lock:
+            batch = self._events[:self.max_batch]
+            if not batch:
+                return 0
+            del self._events[:len(batch)]
+
+            # Агрегируем дельты DayStat по (user_id, day)
+            deltas: dict[tuple[int, date], DayTotals] = {}
+            food_rows: list[dict] = []
+            workout_rows: list[dict] = []
+            for ev in batch:
+                key = (ev.user_id, ev.day)
+                deltas[key] = deltas.get(key, DayTotals(0, 0.0, 0.0)).plus(event_totals(ev))
+
+                if isinstance(ev, FoodEvent):
+                    food_rows.append(
+                        {
+                            "user_id": ev.user_id,
+                            "day": ev.day,
+                            "name": ev.name,
+                            "grams": float(ev.grams),
+                            "kcal": float(ev.kcal),
+                            "created_at": ev.created_at,
+                        }
+                    )
+                elif isinstance(ev, MealEvent):
+                    food_rows.extend(
+                        {
+                            "user_id": ev.user_id,
+                            "day": ev.day,
+                            "name": name,
+                            "grams": float(grams),
+                            "kcal": float(kcal),
+                            "created_at": ev.created_at,
+                        }
+                        for name, grams, kcal in ev.items
+                    )
+                elif isinstance(ev, WorkoutEvent):
+                    workout_rows.append(
+                        {
+                            "user_id": ev.user_id,
+                            "day": ev.day,
+                            "workout_type": ev.workout_type,
+                            "minutes": int(ev.minutes),
+                            "intensity": ev.intensity,
+                            "kcal_burned": float(ev.kcal_burned),
+                            "extra_water_ml": int(ev.extra_water_ml),
+                            "created_at": ev.created_at,
+                        }
+                    )
+
+            try:
+                async with self.session_factory() as session:
+                    repo = Repo(session)
+                    if food_rows:
+                        await session.execute(insert(FoodLog), food_rows)
+                        await repo.touch_favorites(food_rows)
+                    if workout_rows:
+                        await session.execute(insert(WorkoutLog), workout_rows)
+
+                    await repo.add_day_totals_many(
+                        [
+                            {
+                                "user_id": user_id,
+                                "day": day,
+                                "water_ml": t.water_ml,
+                                "calories_in": t.calories_in,
+                                "calories_out": t.calories_out,
+                            }
+                            for (user_id, day), t in deltas.items()
+                        ]
+                    )
+                    await session.commit()
+            except BaseException:
+                # Возвращаем пакет в начало очереди (в том числе при отмене) - дельты остаются в _pending
+                self._events[:0] = batch
+                raise
+
+            # Записанное в БД больше не «висит» в pending
+            for key, t in deltas.items():
+                left = self._pending[key]
+                left = DayTotals(
+                    left.water_ml - t.water_ml,
+                    left.calories_in - t.calories_in,
+                    left.calories_out - t.calories_out,
+                )
+                if left.water_ml == 0 and abs(left.calories_in) < 1e-9 and abs(left.calories_out) < 1e-9:
+                    del self._pending[key]
+                else:
+                    self._pending[key] = left
+
+            return len(batch)
+
+    async def flush_all(self) -> int:
+        """
+        Записывает всю очередь (пакетами по max_batch), включая события,
+        добавленные во время сброса. Возвращает количество записанных событий.
+        """
+        total = 0
+        while written := await self.flush():
+            total += written
+        return total
+
+    def stats(self) -> dict:
+        """
+        Метрики очереди: сколько событий ждут записи.
+        """
+        return {"queued": len(self._events), "pending_days": len(self._pending)}
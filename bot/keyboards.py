@@ -76,7 +76,14 @@ def kb_intensity() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
-def kb_food_pick(items: list[dict]) -> InlineKeyboardMarkup:
+def _short(title: str, limit: int = 35) -> str:
+    """
+    Ограничение длины текста кнопки.
+    """
+    return title[:limit] + "…" if len(title) > limit else title
+
+
+def kb_food_pick(items: list[dict], search_more: bool = False) -> InlineKeyboardMarkup:
     """
     Клавиатура выбора продукта из списка.
 
@@ -87,6 +94,7 @@ def kb_food_pick(items: list[dict]) -> InlineKeyboardMarkup:
 
     callback_data:
       - food_pick:<index>
+      - food_pick:search (search_more - список из личных продуктов, искать по всем источникам)
       - food_pick:manual
     """
     builder = InlineKeyboardBuilder()
@@ -98,15 +106,14 @@ def kb_food_pick(items: list[dict]) -> InlineKeyboardMarkup:
         source = item.get("source", "")
         title = (item.get("name") or "Без названия").strip()
 
-        # Ограничение длины текста кнопки
-        if len(title) > 35:
-            title = title[:35] + "…"
-
         builder.button(
-            text=f"{title} — {kcal_txt} ккал/100г ({source})",
+            text=f"{_short(title)} — {kcal_txt} ккал/100г ({source})",
             callback_data=f"food_pick:{i}",
         )
 
+    if search_more:
+        builder.button(text="🔎 Искать ещё", callback_data="food_pick:search")
+
     # Ручной ввод калорийности
     builder.button(
         text="Ввести вручную (ккал/100г)",
@@ -117,6 +124,43 @@ def kb_food_pick(items: list[dict]) -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+def kb_food_again(favorites: list[dict]) -> InlineKeyboardMarkup:
+    """
+    Недавние / частые продукты пользователя: запись «ещё раз» в одно нажатие.
+
+    favorites: [{"id": int, "name": str, "last_grams": float}, ...]
+
+    callback_data: food_again:<id>
+    """
+    builder = InlineKeyboardBuilder()
+
+    for fav in favorites:
+        builder.button(
+            text=f"{_short(fav['name'], 28)} · {fav['last_grams']:g} г",
+            callback_data=f"food_again:{fav['id']}",
+        )
+
+    builder.adjust(1)
+    return builder.as_markup()
+
+
+def kb_grams_quick(grams: float) -> InlineKeyboardMarkup:
+    """
+    Быстрый ввод граммов - как в прошлый раз.
+
+    callback_data: food_grams:<граммы>
+    """
+    builder = InlineKeyboardBuilder()
+
+    builder.button(text=f"Как в прошлый раз: {grams:g} г", callback_data=f"food_grams:{grams:g}")
+
+    return builder.as_markup()
+
+
+# Длинные периоды графиков: дней -> подпись
+RANGE_PLOTS = {30: "30 дней", 90: "90 дней", 365: "год"}
+
+
 def kb_plot() -> InlineKeyboardMarkup:
     """
     Клавиатура выбора периода для графиков.
@@ -125,6 +169,8 @@ def kb_plot() -> InlineKeyboardMarkup:
 
     builder.button(text="Графики за 7 дней", callback_data="plot:week")
     builder.button(text="Графики за сегодня", callback_data="plot:day")
-    builder.adjust(1)
+    for days, title in RANGE_PLOTS.items():
+        builder.button(text=f"Графики за {title}", callback_data=f"plot:range:{days}")
+    builder.adjust(1, 1, 3)
 
     return builder.as_markup()
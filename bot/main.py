@@ -4,10 +4,33 @@ import logging
 from aiogram import Bot, Dispatcher
 from aiogram.fsm.storage.memory import MemoryStorage
 
+from bot import metrics
 from bot.config import settings
-from bot.db.session import make_engine, make_session_factory, init_db
+from bot.context_mw import UserContextMiddleware
+from bot.db.profile_cache import ProfileCache
+from bot.db.retention import RetentionPolicy, run_retention_periodically
+from bot.db.write_behind import WriteBehindQueue
+from bot.db.session import (
+    PoolProfile,
+    SqliteProfile,
+    init_db,
+    is_sqlite,
+    make_engine,
+    make_read_engine,
+    make_session_factory,
+)
 from bot.logging_mw import LoggingMiddleware
+from bot.services.chart_cache import ChartCache
+from bot.services.charts import ChartRenderer
+from bot.services.http import HttpClientConfig, make_http_session
+from bot.services.food_catalog import FoodCatalog
+from bot.services import resilience
+from bot.services.provider_cache import ProviderCache
+from bot.services.resilience import BreakerConfig
+from bot.services.translate import Translator
+from bot.services.weather import WeatherService
 
+from bot.routers.export import router as export_router
 from bot.routers.food import router as food_router
 from bot.routers.menu_router import router as menu_router
 from bot.routers.plots import router as plots_router
@@ -32,9 +55,35 @@ async def main():
     logger.info("Инициализация...")
 
     # Инициализация БД и фабрики сессий (кладём в dp для доступа из роутеров)
-    engine = make_engine(settings.db_path)
+    sqlite = is_sqlite(settings.db_path)
+    profile = SqliteProfile(
+        journal_mode=settings.db_journal_mode,
+        synchronous=settings.db_synchronous,
+        cache_size_kib=settings.db_cache_size_kib,
+        mmap_size_mb=settings.db_mmap_size_mb,
+        temp_store=settings.db_temp_store,
+        busy_timeout_ms=settings.db_busy_timeout_ms,
+        read_pool_size=settings.db_read_pool_size,
+    )
+    pool = PoolProfile(
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pre_ping=settings.db_pool_pre_ping,
+        timeout_s=settings.db_pool_timeout_s,
+        recycle_s=settings.db_pool_recycle_s,
+        statement_cache_size=settings.db_statement_cache_size,
+    )
+    engine = make_engine(settings.db_path, profile if sqlite else None, pool)
     await init_db(engine)
-    session_factory = make_session_factory(engine)
+
+    # SQLite: один писатель + пул читателей (если включён).
+    # PostgreSQL сам обслуживает параллельные чтения через общий пул.
+    read_engine = (
+        make_read_engine(settings.db_path, profile)
+        if sqlite and profile.read_pool_size > 0
+        else None
+    )
+    session_factory = make_session_factory(engine, read_engine)
 
     # Инициализация Telegram-бота и диспетчера
     bot = Bot(token=settings.bot_token)
@@ -45,9 +94,119 @@ async def main():
     # Middleware логирования апдейтов
     dp.update.middleware(LoggingMiddleware())
 
+    # Кэш снимков профиля (меню, цели, вес читаются без запроса к БД)
+    profiles = ProfileCache(settings.profile_cache_size, settings.profile_cache_ttl_s)
+    metrics.register_source("profile_cache", profiles.stats)
+
+    # Опциональная write-behind очередь логов (пакетная запись в фоне)
+    writer = None
+    if settings.write_behind_enabled:
+        writer = WriteBehindQueue(
+            session_factory,
+            flush_interval_ms=settings.write_behind_flush_ms,
+            max_batch=settings.write_behind_max_batch,
+        )
+        writer.start()
+        metrics.register_source("write_behind", writer.stats)
+
+    # Кэш отправленных графиков: повторный показ по Telegram file_id, запись логов инвалидирует
+    chart_cache = ChartCache(settings.chart_cache_size, settings.chart_cache_ttl_s)
+    metrics.register_source("chart_cache", chart_cache.stats)
+    dp["chart_cache"] = chart_cache
+
+    # Одна сессия БД на апдейт: хэндлеры получают UserContext через data["ctx"]
+    dp.update.outer_middleware(UserContextMiddleware(session_factory, profiles, writer, chart_cache))
+
     # Dependency injection: доступ к session_factory из хэндлеров через data["session_factory"]
     dp["session_factory"] = session_factory
 
+    # Один HTTP-клиент на приложение (keep-alive пул + кэш DNS) - хэндлеры получают его как http
+    http = make_http_session(
+        HttpClientConfig(
+            limit=settings.http_limit,
+            limit_per_host=settings.http_limit_per_host,
+            keepalive_s=settings.http_keepalive_s,
+            dns_ttl_s=settings.http_dns_ttl_s,
+            timeout_total_s=settings.http_timeout_total_s,
+            timeout_connect_s=settings.http_timeout_connect_s,
+            timeout_read_s=settings.http_timeout_read_s,
+        )
+    )
+    dp["http"] = http
+
+    # Circuit breaker + адаптивный таймаут для каждого внешнего API
+    resilience.configure(
+        BreakerConfig(
+            window=settings.breaker_window,
+            min_calls=settings.breaker_min_calls,
+            failure_rate=settings.breaker_failure_rate,
+            open_s=settings.breaker_open_s,
+            timeout_min_s=settings.provider_timeout_min_s,
+            timeout_max_s=settings.http_timeout_total_s,
+            timeout_p95_factor=settings.provider_timeout_p95_factor,
+        )
+    )
+    for provider in ("calorieninjas", "openfoodfacts", "openweather"):
+        metrics.register_source(f"provider_{provider}", resilience.guard(provider).stats)
+
+    # Кэш ответов API поиска еды (память + БД), хэндлеры получают его как food_cache
+    food_cache = ProviderCache(
+        session_factory,
+        maxsize=settings.food_cache_size,
+        ttl_s=settings.food_cache_ttl_s,
+        negative_ttl_s=settings.food_cache_negative_ttl_s,
+    )
+    metrics.register_source("food_cache", food_cache.stats)
+    dp["food_cache"] = food_cache
+
+    # Офлайн-справочник продуктов: файл открывается лениво, при первом поиске
+    food_catalog = FoodCatalog(settings.food_catalog_path) if settings.food_catalog_path else None
+    if food_catalog is not None:
+        metrics.register_source("food_catalog", food_catalog.stats)
+    dp["food_catalog"] = food_catalog
+
+    # Перевод запросов: свой пул потоков с таймаутом + кэш (память + БД)
+    translator = Translator(
+        session_factory,
+        workers=settings.translate_workers,
+        timeout_s=settings.translate_timeout_s,
+        maxsize=settings.translate_cache_size,
+        ttl_s=settings.translate_cache_ttl_s,
+    )
+    metrics.register_source("translate", translator.stats)
+    dp["translator"] = translator
+
+    # Погода из кэша по городам + фоновое обновление городов активных пользователей
+    weather = WeatherService(
+        settings.openweather_api_key,
+        http,
+        ttl_s=settings.weather_ttl_s,
+        stale_s=settings.weather_stale_s,
+        negative_ttl_s=settings.weather_negative_ttl_s,
+        wait_s=settings.weather_wait_s,
+        refresh_interval_s=settings.weather_refresh_interval_s,
+    )
+    metrics.register_source("weather", weather.stats)
+    dp["weather"] = weather
+    weather_task = (
+        asyncio.create_task(weather.run_refresher())
+        if settings.openweather_api_key
+        else None
+    )
+
+    # Графики: рендер matplotlib в пуле процессов, прогретом до старта polling
+    charts = None
+    if settings.chart_workers > 0:
+        charts = ChartRenderer(
+            settings.chart_workers,
+            max_pending=settings.chart_max_pending,
+            timeout_s=settings.chart_timeout_s,
+            engine=settings.chart_engine,
+        )
+        await charts.start()
+        metrics.register_source("charts", charts.stats)
+    dp["charts"] = charts
+
     # Подключение роутеров
     dp.include_router(start_router)
     dp.include_router(profile_router)
@@ -57,10 +216,53 @@ async def main():
     dp.include_router(progress_router)
     dp.include_router(plots_router)
     dp.include_router(rec_router)
+    dp.include_router(export_router)
     dp.include_router(menu_router)
 
+    # Периодический вывод метрик (кэши и т.п.) в лог
+    metrics_task = (
+        asyncio.create_task(metrics.log_metrics_periodically(settings.metrics_log_interval_s))
+        if settings.metrics_log_interval_s > 0
+        else None
+    )
+
+    # Архивация старых логов + VACUUM/ANALYZE в тихие часы
+    retention_task = None
+    if settings.retention_enabled:
+        policy = RetentionPolicy(
+            horizon_days=settings.retention_days,
+            quiet_start_hour=settings.retention_quiet_start_hour,
+            quiet_end_hour=settings.retention_quiet_end_hour,
+            vacuum_pages=settings.retention_vacuum_pages,
+        )
+        retention_task = asyncio.create_task(run_retention_periodically(session_factory, engine, policy))
+
     logging.getLogger("bot").info("Бот запущен!")
-    await dp.start_polling(bot)
+    try:
+        await dp.start_polling(bot)
+    finally:
+        if metrics_task is not None:
+            metrics_task.cancel()
+        if retention_task is not None:
+            retention_task.cancel()
+        if weather_task is not None:
+            weather_task.cancel()
+
+        await http.close()
+        translator.close()
+        if charts is not None:
+            charts.close()
+        if food_catalog is not None:
+            food_catalog.close()
+
+        # Дописываем в БД всё, что ещё в очереди
+        if writer is not None:
+            await writer.close()
+
+        # Корректно закрываем соединения с БД
+        if read_engine is not None:
+            await read_engine.dispose()
+        await engine.dispose()
 
 
 if __name__ == "__main__":
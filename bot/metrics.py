@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Callable
+
+logger = logging.getLogger("bot.metrics")
+
+# Источники метрик: имя -> функция, возвращающая dict со счётчиками
+_sources: dict[str, Callable[[], dict]] = {}
+
+
+def register_source(name: str, fn: Callable[[], dict]) -> None:
+    """
+    Регистрирует источник метрик (например, stats() кэша).
+    Повторная регистрация с тем же именем заменяет источник.
+    """
+    _sources[name] = fn
+
+
+def snapshot() -> dict[str, dict]:
+    """
+    Снимок всех зарегистрированных метрик.
+    """
+    return {name: fn() for name, fn in _sources.items()}
+
+
+async def log_metrics_periodically(interval_s: float) -> None:
+    """
+    Фоновая задача: раз в interval_s секунд пишет снимок метрик в лог.
+    """
+    while True:
+        await asyncio.sleep(interval_s)
+        for name, values in snapshot().items():
+            logger.info(
+                "metrics %s %s",
+                name,
+                " ".join(f"{k}={v}" for k, v in values.items()),
+            )
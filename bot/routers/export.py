@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import logging
+import os
+import tempfile
+from datetime import date
+
+from aiogram import Router
+from aiogram.filters import Command, CommandObject
+from aiogram.types import FSInputFile, Message
+
+from bot.context_mw import UserContext
+from bot.db.history_io import write_export
+from bot.menu import hide_menu
+from bot.utils.ui import show_menu_for_user
+
+router = Router()
+
+logger = logging.getLogger("bot")
+
+
+@router.message(Command("export"))
+async def export_history(message: Message, command: CommandObject, ctx: UserContext) -> None:
+    """
+    Команда /export [csv|jsonl] - выгружает всю историю пользователя
+    (дневная статистика, еда, тренировки) и отправляет файлом.
+
+    Строки читаются из БД курсором и сразу пишутся во временный файл,
+    поэтому история целиком в памяти не держится.
+    """
+    fmt = (command.args or "jsonl").strip().lower()
+    if fmt not in ("csv", "jsonl"):
+        await message.answer("Формат: /export csv или /export jsonl")
+        return
+
+    await message.answer("Готовлю выгрузку…", reply_markup=hide_menu())
+
+    profile = await ctx.profile()
+
+    # Логи из write-behind очереди должны попасть в выгрузку - сбрасываем её целиком
+    if ctx.writer is not None:
+        try:
+            await ctx.writer.flush_all()
+        except Exception:
+            # События остались в очереди (фоновая задача повторит запись) - выгружаем то, что уже в БД
+            logger.exception("write-behind flush before export failed")
+            await message.answer("⚠️ Последние записи ещё не сохранены и могут не попасть в выгрузку.")
+
+    fd, path = tempfile.mkstemp(suffix=f".{fmt}")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as out:
+            count = await write_export(ctx.session, profile.id, out, fmt)
+
+        # Дальше отправка файла - отпускаем соединение БД
+        await ctx.release()
+
+        await message.answer_document(
+            FSInputFile(path, filename=f"history_{date.today().isoformat()}.{fmt}"),
+            caption=f"Твоя история: {count} записей",
+        )
+    finally:
+        os.unlink(path)
+
+    await show_menu_for_user(message, ctx)
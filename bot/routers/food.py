@@ -1,27 +1,29 @@
 from __future__ import annotations
 
-from datetime import date
-
 from aiogram import F, Router
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import CallbackQuery, Message
-
-from sqlalchemy.ext.asyncio import async_sessionmaker
+from aiohttp import ClientSession
 
 from bot.config import settings
-from bot.db.models import FoodLog
-from bot.db.repo import Repo
-from bot.keyboards import kb_food_pick
+from bot.context_mw import UserContext
+from bot.db import fts
+from bot.keyboards import kb_food_again, kb_food_pick, kb_grams_quick, kb_yesno
 from bot.menu import hide_menu
-from bot.services.food_calorieninjas import search_calorieninjas
-from bot.services.food_openfoodfacts import search_openfoodfacts
-from bot.services.translate import maybe_translate_ru_to_en
+from bot.services.food_catalog import FoodCatalog
+from bot.services.food_search import search_food
+from bot.services.meal import is_meal, parse_meal, resolve_meal
+from bot.services.provider_cache import ProviderCache
+from bot.services.translate import Translator
 from bot.utils.ui import show_menu_for_user
 
 router = Router()
 
+# Сколько недавних / частых продуктов показывать кнопками «ещё раз»
+FAVORITES_LIMIT = 6
+
 
 class FoodFSM(StatesGroup):
     """
@@ -30,11 +32,14 @@ class FoodFSM(StatesGroup):
     - pick: выбор продукта из списка
     - manual_kcal100: ручной ввод ккал/100г
     - grams: ввод граммов и сохранение в БД
+    - meal / meal_confirm: несколько продуктов одним сообщением и подтверждение записи
     """
     query = State()
     pick = State()
     grams = State()
     manual_kcal100 = State()
+    meal = State()
+    meal_confirm = State()
 
 
 def _parse_float(text: str) -> float | None:
@@ -47,8 +52,24 @@ def _parse_float(text: str) -> float | None:
         return None
 
 
+async def offer_favorites(message: Message, ctx: UserContext) -> None:
+    """
+    Недавние и частые продукты пользователя кнопками «ещё раз» (если они есть).
+    """
+    profile = await ctx.profile()
+    favorites = await ctx.repo.favorite_foods(profile.id, limit=FAVORITES_LIMIT)
+    if not favorites:
+        return
+    await message.answer(
+        "Или запиши ещё раз в одно нажатие:",
+        reply_markup=kb_food_again(
+            [{"id": f.id, "name": f.name, "last_grams": f.last_grams} for f in favorites]
+        ),
+    )
+
+
 @router.message(Command("log_food"))
-async def log_food(message: Message, state: FSMContext) -> None:
+async def log_food(message: Message, state: FSMContext, ctx: UserContext) -> None:
     """
     Команда /log_food - запускает сценарий логирования еды.
     """
@@ -58,82 +79,147 @@ async def log_food(message: Message, state: FSMContext) -> None:
         "— По одному продукту за раз (например: банан, овсянка, chicken breast).\n"
         "— Можно на русском или на английском.\n"
         "— Я покажу несколько вариантов - выбери самый подходящий.\n\n"
-        "Важно: на английском обычно точнее (русский запрос я могу автоматически перевести и искать уже по переводу).",
+        "Важно: на английском обычно точнее (русский запрос я могу автоматически перевести и искать уже по переводу).\n\n"
+        "Несколько продуктов сразу - через запятую с граммами (150 г курицы, 200 г риса) или командой /log_meal.",
         reply_markup=hide_menu(),
     )
     await state.set_state(FoodFSM.query)
+    await offer_favorites(message, ctx)
+
+
+@router.callback_query(F.data.startswith("food_again:"))
+async def food_again(callback: CallbackQuery, state: FSMContext, ctx: UserContext) -> None:
+    """
+    Запись продукта из личного индекса «как в прошлый раз»: последние граммы и калорийность.
+    """
+    try:
+        favorite_id = int(callback.data.split(":", 1)[1])
+    except ValueError:
+        favorite_id = None
+
+    profile = await ctx.profile()
+    fav = await ctx.repo.get_favorite(profile.id, favorite_id) if favorite_id is not None else None
+    if fav is None:
+        await callback.message.answer("Не нашёл этот продукт. Напиши его название:")
+        await callback.answer()
+        return
+
+    # Значения - до add_food: commit сбрасывает загруженные атрибуты
+    name, grams = fav.name, float(fav.last_grams)
+    kcal = float(fav.kcal_per_100g) * grams / 100.0
+    await ctx.add_food(name, grams, kcal)
+
+    await callback.message.answer(f"Записано ✅ {name}: {grams:g} г → {kcal:.1f} ккал.")
+    await state.clear()
+    await callback.answer()
+    await show_menu_for_user(callback.message, ctx)
+
+
+@router.message(Command("log_meal"))
+async def log_meal(message: Message, state: FSMContext) -> None:
+    """
+    Команда /log_meal - запись нескольких продуктов одним сообщением.
+    """
+    await message.answer(
+        "Напиши всё, что ты съел, одним сообщением 🍽️\n\n"
+        "Продукты - через запятую или с новой строки, с граммами или штуками:\n"
+        "150 г куриной грудки, 200 г риса, 2 яйца\n"
+        "chicken breast 150g and rice 200g\n\n"
+        "Я посчитаю калории и попрошу подтвердить запись.",
+        reply_markup=hide_menu(),
+    )
+    await state.set_state(FoodFSM.meal)
 
 
 @router.message(FoodFSM.query)
 async def food_query(
     message: Message,
     state: FSMContext,
-    session_factory: async_sessionmaker,
+    ctx: UserContext,
+    http: ClientSession | None = None,
+    food_cache: ProviderCache | None = None,
+    translator: Translator | None = None,
+    food_catalog: FoodCatalog | None = None,
 ) -> None:
     """
-    Шаг 1: принимаем строку запроса и собираем кандидатов из:
-    1) локальной БД (FoodCustom)
-    2) CalorieNinjas (при необходимости - через автоперевод)
-    3) OpenFoodFacts (при необходимости - через автоперевод)
-
-    Далее показываем inline-клавиатуру выбора (top-5) либо просим ввести ккал вручную.
+    Шаг 1: принимаем строку запроса. Если продукт уже есть в личном индексе пользователя
+    (FoodFavorite) - сразу предлагаем его (с кнопкой «Искать ещё»), без внешних API.
+    Иначе - полный поиск (_search_and_pick).
     """
     query = (message.text or "").strip()
     if not query:
         await message.answer("Пусто. Напиши продукт, например: банан")
         return
 
+    # Несколько продуктов с количествами в одном сообщении - пакетная запись
+    if is_meal(query):
+        await food_meal(message, state, ctx, http, food_cache, translator, food_catalog)
+        return
+
     await state.update_data(query=query)
 
-    # 1) Локальная БД (кастомные продукты)
-    async with session_factory() as session:
-        repo = Repo(session)
-        custom = await repo.find_custom_food(query, limit=5)
-
-    items: list[dict] = [
-        {"name": c.name, "kcal_per_100g": c.kcal_per_100g, "source": "myDB"} for c in custom
-    ]
-
-    # 2) CalorieNinjas (по исходному запросу)
-    cn = await search_calorieninjas(query, settings.calorieninjas_api_key, limit=5)
-    for it in cn:
-        items.append({"name": it["name"], "kcal_per_100g": it["kcal_per_100g"], "source": "CN"})
-
-    # Если по-русски CN ничего не нашёл - пробуем перевести запрос на английский
-    if len(cn) == 0:
-        tr = await maybe_translate_ru_to_en(query, settings.translate_enabled)
-        if tr:
-            cn2 = await search_calorieninjas(tr, settings.calorieninjas_api_key, limit=5)
-            for it in cn2:
-                items.append({"name": it["name"], "kcal_per_100g": it["kcal_per_100g"], "source": "CN-en"})
-
-        # 3) OpenFoodFacts (по исходному запросу)
-        off = await search_openfoodfacts(query, limit=5)
-        for it in off:
-            items.append({"name": it["name"], "kcal_per_100g": it["kcal_per_100g"], "source": "OFF"})
-
-        # Если OFF ничего не нашёл - пробуем перевод
-        if len(off) == 0:
-            tr = await maybe_translate_ru_to_en(query, settings.translate_enabled)
-            if tr:
-                off2 = await search_openfoodfacts(tr, limit=5)
-                for it in off2:
-                    items.append({"name": it["name"], "kcal_per_100g": it["kcal_per_100g"], "source": "OFF-en"})
-
-    # Дедупликация по имени (без учёта регистра) + ограничение топ-5
-    cleaned: list[dict] = []
-    seen: set[str] = set()
-    for it in items:
-        name = (it.get("name") or "").strip()
-        if not name:
-            continue
-        key = name.lower()
-        if key in seen:
-            continue
-        seen.add(key)
-        cleaned.append(it)
+    profile = await ctx.profile()
+    favorites = await ctx.repo.find_favorites(profile.id, query, limit=5)
+    if favorites:
+        items = [
+            {
+                "name": f.name,
+                "kcal_per_100g": round(f.kcal_per_100g, 1),
+                "source": "recent",
+                "last_grams": f.last_grams,
+            }
+            for f in favorites
+        ]
+        await state.update_data(items=items)
+        await state.set_state(FoodFSM.pick)
+        await message.answer(
+            "Ты уже записывал это - выбери или поищи ещё:",
+            reply_markup=kb_food_pick(items, search_more=True),
+        )
+        return
+
+    await _search_and_pick(message, state, ctx, query, http, food_cache, translator, food_catalog)
 
-    cleaned = cleaned[:5]
+
+async def _search_and_pick(
+    message: Message,
+    state: FSMContext,
+    ctx: UserContext,
+    query: str,
+    http: ClientSession | None,
+    food_cache: ProviderCache | None,
+    translator: Translator | None,
+    food_catalog: FoodCatalog | None,
+) -> None:
+    """
+    Собираем кандидатов (параллельно, см. search_food) из:
+    1) локальной БД (FoodCustom)
+    2) офлайн-справочника
+    3) CalorieNinjas (и по автопереводу запроса)
+    4) OpenFoodFacts (и по автопереводу запроса)
+
+    Далее показываем inline-клавиатуру выбора (top-5) либо просим ввести ккал вручную.
+    """
+
+    async def local() -> list[dict]:
+        custom = await ctx.repo.find_custom_food(query, limit=5)
+        # Дальше только сеть - не держим соединение БД во время внешних запросов
+        await ctx.release()
+        return [{"name": c.name, "kcal_per_100g": c.kcal_per_100g} for c in custom]
+
+    # Все источники параллельно, с общим бюджетом времени; дедупликация и ранжирование - внутри
+    cleaned = await search_food(
+        query,
+        local=local,
+        catalog=food_catalog,
+        calorieninjas_api_key=settings.calorieninjas_api_key,
+        translate_enabled=settings.translate_enabled,
+        translator=translator,
+        session=http,
+        cache=food_cache,
+        budget_s=settings.food_search_budget_s,
+        limit=5,
+    )
     await state.update_data(items=cleaned)
 
     # Если вариантов нет - просим ввести ккал/100г вручную и сохраним в FoodCustom
@@ -155,13 +241,30 @@ async def food_query(
 
 
 @router.callback_query(FoodFSM.pick, F.data.startswith("food_pick:"))
-async def food_pick(callback: CallbackQuery, state: FSMContext) -> None:
+async def food_pick(
+    callback: CallbackQuery,
+    state: FSMContext,
+    ctx: UserContext,
+    http: ClientSession | None = None,
+    food_cache: ProviderCache | None = None,
+    translator: Translator | None = None,
+    food_catalog: FoodCatalog | None = None,
+) -> None:
     """
-    Шаг 2: пользователь выбрал продукт из inline-кнопок либо выбрал ручной ввод.
+    Шаг 2: пользователь выбрал продукт из inline-кнопок, ручной ввод
+    либо полный поиск (если список был из личных продуктов).
     """
     idx = callback.data.split(":", 1)[1]
     data = await state.get_data()
 
+    # Личные продукты не подошли - ищем по всем источникам
+    if idx == "search":
+        await callback.answer()
+        await _search_and_pick(
+            callback.message, state, ctx, data.get("query", ""), http, food_cache, translator, food_catalog
+        )
+        return
+
     # Ручной ввод ккал/100г
     if idx == "manual":
         await state.set_state(FoodFSM.manual_kcal100)
@@ -191,7 +294,11 @@ async def food_pick(callback: CallbackQuery, state: FSMContext) -> None:
 
     kcal = picked.get("kcal_per_100g")
     kcal_txt = "?" if kcal is None else f"{float(kcal):g}"
-    await callback.message.answer(f"{picked['name']} — {kcal_txt} ккал/100г.\nСколько грамм ты съел?")
+    last_grams = picked.get("last_grams")
+    await callback.message.answer(
+        f"{picked['name']} — {kcal_txt} ккал/100г.\nСколько грамм ты съел?",
+        reply_markup=kb_grams_quick(last_grams) if last_grams else None,
+    )
     await callback.answer()
 
 
@@ -199,7 +306,7 @@ async def food_pick(callback: CallbackQuery, state: FSMContext) -> None:
 async def food_manual_kcal100(
     message: Message,
     state: FSMContext,
-    session_factory: async_sessionmaker,
+    ctx: UserContext,
 ) -> None:
     """
     Шаг 2 (альтернатива): ручной ввод ккал/100г.
@@ -213,10 +320,8 @@ async def food_manual_kcal100(
     data = await state.get_data()
     query = data.get("query", "Продукт")
 
-    async with session_factory() as session:
-        repo = Repo(session)
-        await repo.upsert_custom_food(query, float(kcal100))
-        await session.commit()
+    await ctx.repo.upsert_custom_food(query, float(kcal100))
+    await ctx.session.commit()
 
     await state.update_data(picked={"name": query, "kcal_per_100g": float(kcal100), "source": "myDB"})
     await state.set_state(FoodFSM.grams)
@@ -227,7 +332,7 @@ async def food_manual_kcal100(
 async def food_grams(
     message: Message,
     state: FSMContext,
-    session_factory: async_sessionmaker,
+    ctx: UserContext,
 ) -> None:
     """
     Шаг 3: ввод граммов и запись:
@@ -239,44 +344,144 @@ async def food_grams(
         await message.answer("Введи граммы (1..5000), например 150.")
         return
 
+    await _log_picked(message, state, ctx, grams)
+
+
+@router.callback_query(FoodFSM.grams, F.data.startswith("food_grams:"))
+async def food_grams_quick(
+    callback: CallbackQuery,
+    state: FSMContext,
+    ctx: UserContext,
+) -> None:
+    """
+    Шаг 3 (альтернатива): граммы «как в прошлый раз» кнопкой.
+    """
+    grams = _parse_float(callback.data.split(":", 1)[1])
+    await callback.answer()
+    if grams is None or grams <= 0 or grams > 5000:
+        await callback.message.answer("Введи граммы (1..5000), например 150.")
+        return
+
+    await _log_picked(callback.message, state, ctx, grams)
+
+
+async def _log_picked(message: Message, state: FSMContext, ctx: UserContext, grams: float) -> None:
+    """
+    Запись выбранного продукта (picked из состояния FSM) с указанными граммами.
+    """
     data = await state.get_data()
     picked = data.get("picked")
     if not picked:
         await message.answer("Что-то пошло не так. Нажми Еда ещё раз.")
         await state.clear()
-        await show_menu_for_user(message, session_factory)
+        await show_menu_for_user(message, ctx)
         return
 
     kcal100 = picked.get("kcal_per_100g")
     if kcal100 is None:
         await message.answer("У этого варианта нет калорийности. Выбери другой или введи вручную.")
         await state.clear()
-        await show_menu_for_user(message, session_factory)
+        await show_menu_for_user(message, ctx)
         return
 
     kcal = float(kcal100) * float(grams) / 100.0
 
-    async with session_factory() as session:
-        repo = Repo(session)
-        user = await repo.get_or_create_user(message.from_user.id)
-
-        # Агрегация по текущему дню (локальная дата)
-        st = await repo.get_or_create_day(user.id, date.today())
-        st.calories_in += float(kcal)
-
-        # Событие (лог приёма пищи)
-        session.add(
-            FoodLog(
-                user_id=user.id,
-                day=date.today(),
-                name=picked["name"],
-                grams=float(grams),
-                kcal=float(kcal),
-            )
+    # Событие FoodLog + calories_in за сегодня
+    await ctx.add_food(picked["name"], float(grams), float(kcal))
+
+    await message.answer(f"Записано ✅ {picked['name']}: {grams:g} г → {kcal:.1f} ккал.")
+    await state.clear()
+    await show_menu_for_user(message, ctx)
+
+
+@router.message(FoodFSM.meal)
+async def food_meal(
+    message: Message,
+    state: FSMContext,
+    ctx: UserContext,
+    http: ClientSession | None = None,
+    food_cache: ProviderCache | None = None,
+    translator: Translator | None = None,
+    food_catalog: FoodCatalog | None = None,
+) -> None:
+    """
+    Пакетная запись: разбираем сообщение на продукты с граммами, подбираем калорийность
+    (свои продукты, офлайн-справочник, затем один запрос к CalorieNinjas на все оставшиеся)
+    и показываем итог с кнопками подтверждения.
+    """
+    items = parse_meal(message.text or "")
+    if not items:
+        await message.answer("Не понял список. Пример: 150 г курицы, 200 г риса, 2 яйца")
+        return
+
+    async def local(name: str) -> dict | None:
+        custom = await ctx.repo.find_custom_food(name, limit=5)
+        # Дальше может быть сеть - не держим соединение БД
+        await ctx.release()
+        # Только уверенное совпадение (префикс / подстрока / все слова), без нечётких
+        best = min(custom, key=lambda c: fts.rank_key(c.name, name), default=None)
+        if best is None or fts.rank_key(best.name, name)[0] > 2:
+            return None
+        return {"name": best.name, "kcal_per_100g": best.kcal_per_100g}
+
+    await message.answer("Считаю…", reply_markup=hide_menu())
+    resolved = await resolve_meal(
+        items,
+        local=local,
+        catalog=food_catalog,
+        calorieninjas_api_key=settings.calorieninjas_api_key,
+        translate_enabled=settings.translate_enabled,
+        translator=translator,
+        session=http,
+        cache=food_cache,
+    )
+
+    found = [r for r in resolved if r is not None]
+    if not found:
+        await state.set_state(FoodFSM.query)
+        await message.answer(
+            "Не нашёл ни одного продукта из списка 😕\n"
+            "Попробуй записать их по одному - напиши первый продукт:"
         )
+        return
 
-        await session.commit()
+    lines = []
+    for item, r in zip(items, resolved):
+        if r is None:
+            lines.append(f"• {item.name} — не нашёл, пропущу")
+            continue
+        grams = f"≈{r['grams']:g}" if r["approx"] else f"{r['grams']:g}"
+        lines.append(f"• {r['name']} — {grams} г → {r['kcal']:g} ккал ({r['source']})")
+    total = sum(r["kcal"] for r in found)
+
+    await state.update_data(meal=found)
+    await state.set_state(FoodFSM.meal_confirm)
+    await message.answer(
+        "\n".join(lines) + f"\n\nИтого: {total:.1f} ккал. Записать?",
+        reply_markup=kb_yesno("meal"),
+    )
+
+
+@router.callback_query(FoodFSM.meal_confirm, F.data.startswith("meal:"))
+async def food_meal_confirm(
+    callback: CallbackQuery,
+    state: FSMContext,
+    ctx: UserContext,
+) -> None:
+    """
+    Подтверждение пакетной записи: все FoodLog и дельта DayStat - одной транзакцией.
+    """
+    ans = callback.data.split(":", 1)[1]
+    data = await state.get_data()
+    meal = data.get("meal") or []
+
+    if ans == "yes" and meal:
+        await ctx.add_meal([(r["name"], r["grams"], r["kcal"]) for r in meal])
+        total = sum(r["kcal"] for r in meal)
+        await callback.message.answer(f"Записано ✅ {len(meal)} продукт(ов) → {total:.1f} ккал.")
+    else:
+        await callback.message.answer("Ок, ничего не записал.")
 
-    await message.answer(f"Записано ✅ {picked['name']}: {grams:g} г → {kcal:.1f} ккал.")
     await state.clear()
-    await show_menu_for_user(message, session_factory)
\ No newline at end of file
+    await callback.answer()
+    await show_menu_for_user(callback.message, ctx)
@@ -4,15 +4,15 @@ from aiogram import F, Router
 from aiogram.fsm.context import FSMContext
 from aiogram.types import Message
 
-from sqlalchemy.ext.asyncio import async_sessionmaker
-
+from bot.context_mw import UserContext
 from bot.keyboards import kb_plot, kb_water_quick
 from bot.menu import hide_menu
-from bot.routers.food import FoodFSM
+from bot.routers.food import FoodFSM, offer_favorites
 from bot.routers.profile import start_profile_flow
 from bot.routers.progress import check_progress
 from bot.routers.recommendations import recommend
 from bot.routers.workout import WorkoutFSM
+from bot.services.weather import WeatherService
 from bot.utils.ui import show_menu_for_user
 
 router = Router()
@@ -37,11 +37,11 @@ async def m_profile(message: Message, state: FSMContext) -> None:
 
 
 @router.message(F.text == "Прогресс")
-async def m_progress(message: Message, session_factory: async_sessionmaker) -> None:
+async def m_progress(message: Message, ctx: UserContext, weather: WeatherService | None = None) -> None:
     """
     Показать текущий прогресс пользователя.
     """
-    await check_progress(message, session_factory)
+    await check_progress(message, ctx, weather)
 
 
 @router.message(F.text == "Вода")
@@ -54,7 +54,7 @@ async def m_water(message: Message) -> None:
 
 
 @router.message(F.text == "Еда")
-async def m_food(message: Message, state: FSMContext) -> None:
+async def m_food(message: Message, state: FSMContext, ctx: UserContext) -> None:
     """
     Запуск сценария логирования еды (FSM).
     """
@@ -68,6 +68,7 @@ async def m_food(message: Message, state: FSMContext) -> None:
         reply_markup=hide_menu(),
     )
     await state.set_state(FoodFSM.query)
+    await offer_favorites(message, ctx)
 
 
 @router.message(F.text == "Тренировка")
@@ -89,15 +90,15 @@ async def m_plots(message: Message) -> None:
 
 
 @router.message(F.text == "Рекомендации")
-async def m_rec(message: Message, session_factory: async_sessionmaker) -> None:
+async def m_rec(message: Message, ctx: UserContext, weather: WeatherService | None = None) -> None:
     """
     Показать рекомендации (питание/вода/нагрузка) на основе данных пользователя.
     """
-    await recommend(message, session_factory)
+    await recommend(message, ctx, weather)
 
 
 @router.message(F.text == "Помощь")
-async def m_help(message: Message, session_factory: async_sessionmaker) -> None:
+async def m_help(message: Message, ctx: UserContext) -> None:
     """
     Справка по боту + возврат в меню.
     """
@@ -112,10 +113,12 @@ async def m_help(message: Message, session_factory: async_sessionmaker) -> None:
         "Команды:\n"
         "/set_profile — профиль\n"
         "/log_food — еда\n"
+        "/log_meal — несколько продуктов одним сообщением\n"
         "/log_water — вода\n"
         "/log_workout — тренировка\n"
         "/check_progress — прогресс\n"
-        "/plot — графики\n\n"
+        "/plot — графики\n"
+        "/export — выгрузить историю (csv / jsonl)\n\n"
         "Открывай меню 👇"
     )
-    await show_menu_for_user(message, session_factory)
+    await show_menu_for_user(message, ctx)
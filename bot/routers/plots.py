@@ -1,22 +1,30 @@
 from __future__ import annotations
 
+import asyncio
 from datetime import date, timedelta
 
 from aiogram import F, Router
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import Command
 from aiogram.types import BufferedInputFile, CallbackQuery, Message
 
-from sqlalchemy import select
-from sqlalchemy.ext.asyncio import async_sessionmaker
-
 from bot.config import settings
-from bot.db.models import DayStat
-from bot.db.repo import Repo
-from bot.keyboards import kb_plot
+from bot.context_mw import UserContext
+from bot.db.profile_cache import UserProfile
+from bot.keyboards import RANGE_PLOTS, kb_plot
 from bot.menu import hide_menu
 from bot.services.nutrition import apply_goal, bmr_mifflin, tdee_from_bmr, water_goal_ml
-from bot.services.plots import plot_day, plot_week
-from bot.services.weather import get_temperature_c
+from bot.services.chart_cache import ChartCache, chart_digest
+from bot.services.charts import ChartError, ChartRenderer, render_chart
+from bot.services.series import (
+    MAX_POINTS,
+    dense_days,
+    range_payload,
+    week_start,
+    week_window,
+    weekly_range_payload,
+)
+from bot.services.weather import WeatherService
 from bot.utils.ui import show_menu_for_user
 
 router = Router()
@@ -31,125 +39,238 @@ async def plot_menu(message: Message) -> None:
     await message.answer("Выбери:", reply_markup=kb_plot())
 
 
+async def _send_chart(
+    message: Message,
+    ctx: UserContext,
+    charts: ChartRenderer | None,
+    chart_cache: ChartCache | None,
+    kind: str,
+    payload: dict,
+    period: tuple[date, date],
+    caption: str,
+) -> None:
+    """
+    Отправляет график. Если график с такими же данными уже отправлялся - повторно
+    по Telegram file_id, без рендера и загрузки. Иначе рендер через пул процессов
+    (без него - в потоке, тоже вне event loop) и запоминание file_id ответа.
+    """
+    profile = await ctx.profile()
+    # Рендер и загрузка могут занять время - соединение БД не держим
+    await ctx.release()
+
+    digest = chart_digest(kind, payload)
+    file_id = chart_cache.get(profile.id, kind, digest, period) if chart_cache is not None else None
+    if file_id is not None:
+        try:
+            await message.answer_photo(file_id, caption=caption)
+            return
+        except TelegramBadRequest:
+            # file_id больше не принимается - рисуем заново
+            chart_cache.drop(kind, digest)
+
+    try:
+        if charts is None:
+            img = await asyncio.to_thread(render_chart, kind, payload, settings.chart_engine)
+        else:
+            img = await charts.render(kind, payload)
+    except ChartError:
+        await message.answer("Графики сейчас перегружены 😕 Попробуй через минуту.")
+        return
+
+    sent = await message.answer_photo(BufferedInputFile(img, filename=f"{kind}.png"), caption=caption)
+    if chart_cache is not None and sent.photo:
+        chart_cache.put(profile.id, kind, digest, period, sent.photo[-1].file_id)
+
+
 @router.callback_query(F.data == "plot:week")
-async def plot_week_cb(callback: CallbackQuery, session_factory: async_sessionmaker) -> None:
+async def plot_week_cb(
+    callback: CallbackQuery,
+    ctx: UserContext,
+    charts: ChartRenderer | None = None,
+    chart_cache: ChartCache | None = None,
+) -> None:
     """
     Callback: построить графики за последние 7 дней и отправить картинку.
     """
-    img = await _build_week_plot(session_factory, tg_id=callback.from_user.id)
-
-    await callback.message.answer_photo(
-        BufferedInputFile(img, filename="week.png"),
-        caption="Графики за 7 дней",
-    )
-    await show_menu_for_user(callback.message, session_factory, tg_id=callback.from_user.id)
+    payload = await _week_payload(ctx)
+    period = (payload["dates"][0], payload["dates"][-1])
+    await _send_chart(callback.message, ctx, charts, chart_cache, "week", payload, period, "Графики за 7 дней")
+    await show_menu_for_user(callback.message, ctx)
     await callback.answer()
 
 
 @router.callback_query(F.data == "plot:day")
-async def plot_day_cb(callback: CallbackQuery, session_factory: async_sessionmaker) -> None:
+async def plot_day_cb(
+    callback: CallbackQuery,
+    ctx: UserContext,
+    weather: WeatherService | None = None,
+    charts: ChartRenderer | None = None,
+    chart_cache: ChartCache | None = None,
+) -> None:
     """
     Callback: построить прогресс за сегодня (вода + калории) и отправить картинку.
     """
-    progress = await _get_today_progress_dict(session_factory, tg_id=callback.from_user.id)
+    progress = await _get_today_progress_dict(ctx, weather)
     if progress is None:
         await callback.message.answer("Сначала создай профиль: Создать профиль")
-        await show_menu_for_user(callback.message, session_factory, tg_id=callback.from_user.id)
+        await show_menu_for_user(callback.message, ctx)
         await callback.answer()
         return
 
-    img = plot_day(progress)
-    await callback.message.answer_photo(
-        BufferedInputFile(img, filename="day.png"),
-        caption="Прогресс за сегодня",
+    today = date.today()
+    await _send_chart(callback.message, ctx, charts, chart_cache, "day", progress, (today, today), "Прогресс за сегодня")
+    await show_menu_for_user(callback.message, ctx)
+    await callback.answer()
+
+
+@router.callback_query(F.data.startswith("plot:range:"))
+async def plot_range_cb(
+    callback: CallbackQuery,
+    ctx: UserContext,
+    charts: ChartRenderer | None = None,
+    chart_cache: ChartCache | None = None,
+) -> None:
+    """
+    Callback: графики за 30 / 90 / 365 дней с трендами (среднее за 7 дней, накопленный баланс).
+    """
+    try:
+        days = int(callback.data.rsplit(":", 1)[1])
+    except ValueError:
+        days = 0
+    if days not in RANGE_PLOTS:
+        await callback.answer("Неизвестный период")
+        return
+
+    payload = await _range_payload(ctx, days)
+    period = (date.today() - timedelta(days=days - 1), date.today())
+    await _send_chart(
+        callback.message, ctx, charts, chart_cache, f"range_{days}", payload, period, f"Графики за {RANGE_PLOTS[days]}"
     )
-    await show_menu_for_user(callback.message, session_factory, tg_id=callback.from_user.id)
+    await show_menu_for_user(callback.message, ctx)
     await callback.answer()
 
 
-async def _build_week_plot(session_factory: async_sessionmaker, tg_id: int) -> bytes:
+def _with_pending(
+    ctx: UserContext, user_id: int, rows: list[tuple[date, int, float, float]], key: date
+) -> list[tuple[date, int, float, float]]:
     """
-    Собирает данные за последние 7 дней из DayStat и строит общий недельный график.
-    Возвращает PNG в bytes.
+    Прибавляет к строке key (сегодня или текущая неделя; строки по возрастанию ключа)
+    сегодняшние логи, которые ещё ждут записи в очереди.
     """
-    async with session_factory() as session:
-        repo = Repo(session)
-        user = await repo.get_or_create_user(tg_id)
+    if ctx.writer is None:
+        return rows
+    p = ctx.writer.pending_totals(user_id, date.today())
+    if p.water_ml or p.calories_in or p.calories_out:
+        if rows and rows[-1][0] == key:
+            _, water, cal_in, cal_out = rows[-1]
+            rows[-1] = (key, water + p.water_ml, cal_in + p.calories_in, cal_out + p.calories_out)
+        else:
+            rows.append((key, p.water_ml, p.calories_in, p.calories_out))
+    return rows
 
-        # Даты от (сегодня-6) до сегодня (включительно), в хронологическом порядке
-        days = [date.today() - timedelta(days=i) for i in range(6, -1, -1)]
 
-        # Забираем статистику за диапазон
-        res = await session.execute(
-            select(DayStat).where(
-                DayStat.user_id == user.id,
-                DayStat.day >= days[0],
-                DayStat.day <= days[-1],
-            )
-        )
-        stats = {st.day: st for st in res.scalars().all()}
+async def _day_rows(ctx: UserContext, start: date, end: date) -> list[tuple[date, int, float, float]]:
+    """
+    Дневные итоги за [start, end] одним запросом; к сегодняшнему дню прибавляются
+    логи, которые ещё ждут записи в очереди.
+    """
+    profile = await ctx.profile()
+    rows = await ctx.repo.day_totals_range(profile.id, start, end)
 
-        # Данные по каждому дню (если записи нет - ставим 0)
-        water: list[int] = []
-        cal_in: list[float] = []
-        cal_out: list[float] = []
+    today = date.today()
+    if start <= today <= end:
+        rows = _with_pending(ctx, profile.id, rows, today)
+    return rows
 
-        for d in days:
-            st = stats.get(d)
-            water.append(int(st.water_ml) if st else 0)
-            cal_in.append(float(st.calories_in) if st else 0.0)
-            cal_out.append(float(st.calories_out) if st else 0.0)
 
-    return plot_week(days, water, cal_in, cal_out)
+async def _week_rows(ctx: UserContext, start: date) -> list[tuple[date, int, float, float]]:
+    """
+    Недельные итоги (роллап WeekStat) с недели start по текущую; к текущей неделе
+    прибавляются логи, которые ещё ждут записи в очереди.
+    """
+    profile = await ctx.profile()
+    today = date.today()
+    rows = [
+        (w.week_start, int(w.water_ml), float(w.calories_in), float(w.calories_out))
+        for w in await ctx.repo.week_stats_range(profile.id, start, today)
+    ]
+    return _with_pending(ctx, profile.id, rows, week_start(today))
 
 
-async def _get_today_progress_dict(
-    session_factory: async_sessionmaker,
-    tg_id: int,
-) -> dict | None:
+async def _week_payload(ctx: UserContext) -> dict:
+    """
+    Собирает данные за последние 7 дней для недельного графика
+    (простые типы - передаются в процесс рендера; дни без записей - нули).
+    """
+    end = date.today()
+    start = end - timedelta(days=6)
+    _, water, cal_in, cal_out = dense_days(await _day_rows(ctx, start, end), start, end)
+
+    return {
+        "dates": [start + timedelta(days=i) for i in range(7)],
+        "water": [int(v) for v in water],
+        "cal_in": cal_in.tolist(),
+        "cal_out": cal_out.tolist(),
+    }
+
+
+async def _range_payload(ctx: UserContext, days: int) -> dict:
+    """
+    Данные графика за days дней: до MAX_POINTS дней - по дням из DayStat
+    (series.range_payload), дольше - по недельному роллапу WeekStat
+    (series.weekly_range_payload), без чтения сотен дневных строк.
+    Баланс калорий считается относительно цели, если профиль заполнен.
+    """
+    profile = await ctx.profile()
+    end = date.today()
+    goal = _calorie_goal(profile) if profile.is_complete else None
+    if days <= MAX_POINTS:
+        rows = await _day_rows(ctx, end - timedelta(days=days - 1), end)
+        return range_payload(rows, end, days, goal)
+
+    first, _ = week_window(end, days)
+    return weekly_range_payload(await _week_rows(ctx, first), end, days, goal)
+
+
+def _calorie_goal(profile: UserProfile) -> int:
+    """
+    Цель по калориям: ручная (если задана) иначе считаем через BMR -> TDEE -> goal.
+    """
+    if profile.calorie_goal_manual is not None:
+        return int(profile.calorie_goal_manual)
+
+    act = int(profile.activity_min_per_day)
+    level = "low" if act < 30 else ("medium" if act < 60 else "high")
+
+    bmr = bmr_mifflin(profile.sex, float(profile.weight_kg), float(profile.height_cm), int(profile.age))
+    tdee = tdee_from_bmr(bmr, level)
+    return int(apply_goal(tdee, profile.goal))
+
+
+async def _get_today_progress_dict(ctx: UserContext, weather: WeatherService | None = None) -> dict | None:
     """
     Собирает «прогресс за сегодня» для plot_day().
 
     Возвращает None, если профиль пользователя заполнен не полностью
     (нельзя корректно посчитать цели воды/калорий).
     """
-    async with session_factory() as session:
-        repo = Repo(session)
-        user = await repo.get_or_create_user(tg_id)
-
-        # Проверка, что профиль заполнен (без этого цели не считаем)
-        if not (
-            user.sex
-            and user.weight_kg
-            and user.height_cm
-            and user.age
-            and user.activity_min_per_day is not None
-            and user.city
-            and user.goal
-        ):
-            return None
-
-        # Берём/создаём дневную статистику за сегодня
-        st = await repo.get_or_create_day(user.id, date.today())
-
-        # Цель по воде зависит от веса, активности и температуры (если есть ключ OpenWeather)
-        temp = (
-            await get_temperature_c(user.city, settings.openweather_api_key)
-            if settings.openweather_api_key
-            else None
-        )
-        w_goal = water_goal_ml(float(user.weight_kg), int(user.activity_min_per_day), temp)
-
-        # Цель по калориям: ручная (если задана) иначе считаем через BMR -> TDEE -> goal
-        if user.calorie_goal_manual is not None:
-            cal_goal = int(user.calorie_goal_manual)
-        else:
-            act = int(user.activity_min_per_day)
-            level = "low" if act < 30 else ("medium" if act < 60 else "high")
+    profile = await ctx.profile()
+
+    # Проверка, что профиль заполнен (без этого цели не считаем)
+    if not profile.is_complete:
+        return None
+
+    # Итоги за сегодня (DayStat + ещё не записанные логи)
+    st = await ctx.today_totals()
+
+    # Дальше возможен запрос погоды (промах кэша) - отпускаем соединение БД
+    await ctx.release()
+
+    # Цель по воде зависит от веса, активности и температуры (если есть ключ OpenWeather)
+    temp = await weather.temperature(profile.city) if weather is not None else None
+    w_goal = water_goal_ml(float(profile.weight_kg), int(profile.activity_min_per_day), temp)
 
-            bmr = bmr_mifflin(user.sex, float(user.weight_kg), float(user.height_cm), int(user.age))
-            tdee = tdee_from_bmr(bmr, level)
-            cal_goal = int(apply_goal(tdee, user.goal))
+    cal_goal = _calorie_goal(profile)
 
     return {
         "water_ml": int(st.water_ml),
@@ -6,9 +6,7 @@ from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.state import StatesGroup, State
 from aiogram.fsm.context import FSMContext
 
-from sqlalchemy.ext.asyncio import async_sessionmaker
-
-from bot.db.repo import Repo
+from bot.context_mw import UserContext
 from bot.keyboards import kb_goal, kb_sex, kb_yesno
 from bot.menu import hide_menu
 from bot.services.nutrition import apply_goal, bmr_mifflin, tdee_from_bmr
@@ -183,7 +181,7 @@ async def pick_goal(callback: CallbackQuery, state: FSMContext) -> None:
 async def pick_manual(
     callback: CallbackQuery,
     state: FSMContext,
-    session_factory: async_sessionmaker,
+    ctx: UserContext,
 ) -> None:
     """
     Шаг 8: спросили, задаёт ли пользователь калории вручную.
@@ -194,12 +192,7 @@ async def pick_manual(
         await callback.message.answer("Введи цель по калориям (ккал/день), например 2300:")
     else:
         await state.update_data(calorie_goal_manual=None)
-        await _save_profile_and_finish(
-            callback.message,
-            state,
-            session_factory,
-            tg_id=callback.from_user.id,
-        )
+        await _save_profile_and_finish(callback.message, state, ctx)
 
     await callback.answer()
 
@@ -208,7 +201,7 @@ async def pick_manual(
 async def manual_cal_value(
     message: Message,
     state: FSMContext,
-    session_factory: async_sessionmaker,
+    ctx: UserContext,
 ) -> None:
     """
     Шаг 8 (альтернатива): ввод ручной цели по калориям.
@@ -219,59 +212,55 @@ async def manual_cal_value(
         return
 
     await state.update_data(calorie_goal_manual=val)
-    await _save_profile_and_finish(message, state, session_factory, tg_id=message.from_user.id)
+    await _save_profile_and_finish(message, state, ctx)
 
 
 async def _save_profile_and_finish(
     message: Message,
     state: FSMContext,
-    session_factory: async_sessionmaker,
-    *,
-    tg_id: int | None = None,
+    ctx: UserContext,
 ) -> None:
     """
     Сохраняет профиль в БД, выводит итоговое сообщение и возвращает пользователя в меню.
     """
     data = await state.get_data()
 
-    # tg_id либо передали явно, либо берём из message.from_user.id
-    actual_tg_id = tg_id if tg_id is not None else message.from_user.id
-
-    async with session_factory() as session:
-        repo = Repo(session)
-        user = await repo.get_or_create_user(actual_tg_id)
-
-        # Заполняем поля профиля
-        user.sex = data["sex"]
-        user.weight_kg = float(data["weight"])
-        user.height_cm = float(data["height"])
-        user.age = int(data["age"])
-        user.activity_min_per_day = int(data["activity"])
-        user.city = data["city"]
-        user.goal = data["goal"]
-        user.calorie_goal_manual = data.get("calorie_goal_manual")
-        user.profile_completed = True
-
-        await session.commit()
-
-        # Выводим пользователю итог (ручная цель или расчётная)
-        if user.calorie_goal_manual is None:
-            act = user.activity_min_per_day or 0
-            level = "low" if act < 30 else ("medium" if act < 60 else "high")
-
-            bmr = bmr_mifflin(user.sex, user.weight_kg, user.height_cm, user.age)
-            tdee = tdee_from_bmr(bmr, level)
-            cal_goal = apply_goal(tdee, user.goal)
-
-            await message.answer(
-                "Профиль сохранён ✅\n"
-                f"Рассчитанная цель по калориям: ~{cal_goal} ккал/день."
-            )
-        else:
-            await message.answer(
-                "Профиль сохранён ✅\n"
-                f"Ваша цель по калориям (ручная): {user.calorie_goal_manual} ккал/день."
-            )
+    user = await ctx.user()
+
+    # Заполняем поля профиля
+    user.sex = data["sex"]
+    user.weight_kg = float(data["weight"])
+    user.height_cm = float(data["height"])
+    user.age = int(data["age"])
+    user.activity_min_per_day = int(data["activity"])
+    user.city = data["city"]
+    user.goal = data["goal"]
+    user.calorie_goal_manual = data.get("calorie_goal_manual")
+    user.profile_completed = True
+
+    await ctx.session.commit()
+
+    # Write-through: обновляем снимок профиля в кэше
+    ctx.refresh_profile()
+
+    # Выводим пользователю итог (ручная цель или расчётная)
+    if user.calorie_goal_manual is None:
+        act = user.activity_min_per_day or 0
+        level = "low" if act < 30 else ("medium" if act < 60 else "high")
+
+        bmr = bmr_mifflin(user.sex, user.weight_kg, user.height_cm, user.age)
+        tdee = tdee_from_bmr(bmr, level)
+        cal_goal = apply_goal(tdee, user.goal)
+
+        await message.answer(
+            "Профиль сохранён ✅\n"
+            f"Рассчитанная цель по калориям: ~{cal_goal} ккал/день."
+        )
+    else:
+        await message.answer(
+            "Профиль сохранён ✅\n"
+            f"Ваша цель по калориям (ручная): {user.calorie_goal_manual} ккал/день."
+        )
 
     await state.clear()
-    await show_menu_for_user(message, session_factory, tg_id=actual_tg_id)
+    await show_menu_for_user(message, ctx)
@@ -7,10 +7,7 @@ from aiogram import Router
 from aiogram.filters import Command
 from aiogram.types import Message
 
-from sqlalchemy.ext.asyncio import async_sessionmaker
-
-from bot.config import settings
-from bot.db.repo import Repo
+from bot.context_mw import UserContext
 from bot.menu import hide_menu
 from bot.services.nutrition import (
     apply_goal,
@@ -18,14 +15,14 @@ from bot.services.nutrition import (
     tdee_from_bmr,
     water_goal_ml,
 )
-from bot.services.weather import get_temperature_c
+from bot.services.weather import WeatherService
 from bot.utils.ui import show_menu_for_user
 
 router = Router()
 
 
 @router.message(Command("recommend"))
-async def recommend(message: Message, session_factory: async_sessionmaker) -> None:
+async def recommend(message: Message, ctx: UserContext, weather: WeatherService | None = None) -> None:
     """
     Команда /recommend - выдаёт рекомендации на сегодня:
     - вода (выпито / цель / осталось)
@@ -35,71 +32,60 @@ async def recommend(message: Message, session_factory: async_sessionmaker) -> No
     """
     await message.answer("Смотрю, как у тебя дела сегодня 👀", reply_markup=hide_menu())
 
-    async with session_factory() as session:
-        repo = Repo(session)
-        user = await repo.get_or_create_user(message.from_user.id)
-
-        # Без заполненного профиля цели не посчитать
-        if not (
-            user.sex
-            and user.weight_kg
-            and user.height_cm
-            and user.age
-            and user.activity_min_per_day is not None
-            and user.city
-            and user.goal
-        ):
-            await message.answer("Сначала заполни профиль - так рекомендации будут точнее 🙌")
-            await show_menu_for_user(message, session_factory)
-            return
-
-        # Дневная статистика за сегодня
-        st = await repo.get_or_create_day(user.id, date.today())
-
-        # Температура (влияет на цель воды), если задан ключ OpenWeather
-        temp = (
-            await get_temperature_c(user.city, settings.openweather_api_key)
-            if settings.openweather_api_key
-            else None
-        )
+    profile = await ctx.profile()
+
+    # Без заполненного профиля цели не посчитать
+    if not profile.is_complete:
+        await message.answer("Сначала заполни профиль - так рекомендации будут точнее 🙌")
+        await show_menu_for_user(message, ctx)
+        return
+
+    # Итоги за сегодня (DayStat + ещё не записанные логи)
+    st = await ctx.today_totals()
+
+    # Текущие значения
+    water_drunk = int(st.water_ml)
+    cal_in = float(st.calories_in)
+    cal_out = float(st.calories_out)
+
+    # Дальше возможен запрос погоды (промах кэша) - отпускаем соединение БД
+    await ctx.release()
 
-        # Вода
-        water_goal = water_goal_ml(
-            float(user.weight_kg),
-            int(user.activity_min_per_day),
-            temp,
+    # Температура (влияет на цель воды), если задан ключ OpenWeather
+    temp = await weather.temperature(profile.city) if weather is not None else None
+
+    # Вода
+    water_goal = water_goal_ml(
+        float(profile.weight_kg),
+        int(profile.activity_min_per_day),
+        temp,
+    )
+    water_left = max(0, int(water_goal) - water_drunk)
+
+    # Цель по калориям: ручная (если задана) иначе рассчитываем
+    if profile.calorie_goal_manual is not None:
+        cal_goal = int(profile.calorie_goal_manual)
+    else:
+        act = int(profile.activity_min_per_day)
+        level = "low" if act < 30 else ("medium" if act < 60 else "high")
+
+        bmr = bmr_mifflin(
+            profile.sex,
+            float(profile.weight_kg),
+            float(profile.height_cm),
+            int(profile.age),
         )
-        water_drunk = int(st.water_ml)
-        water_left = max(0, int(water_goal) - water_drunk)
+        tdee = tdee_from_bmr(bmr, level)
+        cal_goal = int(apply_goal(tdee, profile.goal))
 
-        # Цель по калориям: ручная (если задана) иначе рассчитываем
-        if user.calorie_goal_manual is not None:
-            cal_goal = int(user.calorie_goal_manual)
-        else:
-            act = int(user.activity_min_per_day)
-            level = "low" if act < 30 else ("medium" if act < 60 else "high")
-
-            bmr = bmr_mifflin(
-                user.sex,
-                float(user.weight_kg),
-                float(user.height_cm),
-                int(user.age),
-            )
-            tdee = tdee_from_bmr(bmr, level)
-            cal_goal = int(apply_goal(tdee, user.goal))
-
-        # Текущие значения
-        cal_in = float(st.calories_in)
-        cal_out = float(st.calories_out)
-
-        # Остаток по еде:
-        # 1) по "чистому" лимиту
-        cal_left_plain = cal_goal - int(cal_in)
-        # 2) с учётом активности
-        cal_left_with_activity = cal_goal + int(cal_out) - int(cal_in)
-
-        # Флаг активности
-        trained_today = cal_out >= 30.0  # небольшой порог, чтобы шум не считался тренировкой
+    # Остаток по еде:
+    # 1) по "чистому" лимиту
+    cal_left_plain = cal_goal - int(cal_in)
+    # 2) с учётом активности
+    cal_left_with_activity = cal_goal + int(cal_out) - int(cal_in)
+
+    # Флаг активности
+    trained_today = cal_out >= 30.0  # небольшой порог, чтобы шум не считался тренировкой
 
     # Рандомные идеи еды
     meal_big = [
@@ -173,4 +159,4 @@ async def recommend(message: Message, session_factory: async_sessionmaker) -> No
         lines.append(f"🥙 Идея (лёгкий вариант): {idea}.")
 
     await message.answer("Вот что у тебя на сегодня:\n\n" + "\n".join(lines))
-    await show_menu_for_user(message, session_factory)
+    await show_menu_for_user(message, ctx)
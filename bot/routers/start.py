@@ -3,14 +3,14 @@ from __future__ import annotations
 from aiogram import Router
 from aiogram.filters import Command, CommandStart
 from aiogram.types import Message
-from sqlalchemy.ext.asyncio import async_sessionmaker
 
+from bot.context_mw import UserContext
 from bot.utils.ui import show_menu_for_user
 
 router = Router()
 
 @router.message(CommandStart())
-async def start(message: Message, session_factory: async_sessionmaker) -> None:
+async def start(message: Message, ctx: UserContext) -> None:
     """
     Команда /start - приветствие и показ стартового меню.
     """
@@ -25,11 +25,11 @@ async def start(message: Message, session_factory: async_sessionmaker) -> None:
         "👤 настроить профиль, чтобы цели считались точно\n\n"
         "Жми кнопку ниже - начнём 👇"
     )
-    await show_menu_for_user(message, session_factory)
+    await show_menu_for_user(message, ctx)
 
 
 @router.message(Command("help"))
-async def help_cmd(message: Message, session_factory: async_sessionmaker):
+async def help_cmd(message: Message, ctx: UserContext):
     """
     Команда /help - отображение помощи по боту.
     """
@@ -44,10 +44,12 @@ async def help_cmd(message: Message, session_factory: async_sessionmaker):
         "Команды:\n"
         "/set_profile — профиль\n"
         "/log_food — еда\n"
+        "/log_meal — несколько продуктов одним сообщением\n"
         "/log_water — вода\n"
         "/log_workout — тренировка\n"
         "/check_progress — прогресс\n"
-        "/plot — графики\n\n"
+        "/plot — графики\n"
+        "/export — выгрузить историю (csv / jsonl)\n\n"
         "Открывай меню 👇"
     )
-    await show_menu_for_user(message, session_factory)
\ No newline at end of file
+    await show_menu_for_user(message, ctx)
\ No newline at end of file
@@ -1,16 +1,12 @@
 from __future__ import annotations
 
-from datetime import date
-
 from aiogram import Router, F
 from aiogram.filters import Command
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.state import StatesGroup, State
 from aiogram.fsm.context import FSMContext
 
-from sqlalchemy.ext.asyncio import async_sessionmaker
-
-from bot.db.repo import Repo
+from bot.context_mw import UserContext
 from bot.keyboards import kb_water_quick
 from bot.menu import hide_menu
 from bot.utils.ui import show_menu_for_user
@@ -48,7 +44,7 @@ async def log_water(message: Message) -> None:
 async def water_add(
     callback: CallbackQuery,
     state: FSMContext,
-    session_factory: async_sessionmaker,
+    ctx: UserContext,
 ) -> None:
     """
     Обработка inline-кнопок воды:
@@ -66,7 +62,7 @@ async def water_add(
 
     # Быстрый вариант (100/200/300/500)
     ml = int(val)
-    await _add_water(callback.message, ml, session_factory, tg_id=callback.from_user.id)
+    await _add_water(callback.message, ml, ctx)
     await callback.answer()
 
 
@@ -74,7 +70,7 @@ async def water_add(
 async def water_custom(
     message: Message,
     state: FSMContext,
-    session_factory: async_sessionmaker,
+    ctx: UserContext,
 ) -> None:
     """
     Ручной ввод миллилитров воды.
@@ -84,34 +80,15 @@ async def water_custom(
         await message.answer("Введи мл (1..5000), например 250.")
         return
 
-    await _add_water(message, ml, session_factory, tg_id=message.from_user.id)
+    await _add_water(message, ml, ctx)
     await state.clear()
 
 
-async def _add_water(
-    message: Message,
-    ml: int,
-    session_factory: async_sessionmaker,
-    *,
-    tg_id: int | None = None,
-) -> None:
+async def _add_water(message: Message, ml: int, ctx: UserContext) -> None:
     """
     Добавляет воду в DayStat.water_ml за текущий день и возвращает пользователя в меню.
     """
-    # tg_id либо передали явно (например, из CallbackQuery), либо берём из Message
-    actual_tg_id = tg_id if tg_id is not None else message.from_user.id
-
-    async with session_factory() as session:
-        repo = Repo(session)
-
-        # Создаём пользователя при первом обращении
-        user = await repo.get_or_create_user(actual_tg_id)
-
-        # Достаём/создаём дневную статистику и увеличиваем воду
-        st = await repo.get_or_create_day(user.id, date.today())
-        st.water_ml += int(ml)
-
-        await session.commit()
+    await ctx.add_water(int(ml))
 
     await message.answer(f"Записано ✅ +{ml} мл.")
-    await show_menu_for_user(message, session_factory, tg_id=actual_tg_id)
+    await show_menu_for_user(message, ctx)
@@ -1,17 +1,12 @@
 from __future__ import annotations
 
-from datetime import date
-
 from aiogram import Router, F
 from aiogram.filters import Command
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.state import StatesGroup, State
 from aiogram.fsm.context import FSMContext
 
-from sqlalchemy.ext.asyncio import async_sessionmaker
-
-from bot.db.models import WorkoutLog
-from bot.db.repo import Repo
+from bot.context_mw import UserContext
 from bot.keyboards import kb_intensity
 from bot.menu import hide_menu
 from bot.services.nutrition import workout_extra_water, workout_kcal
@@ -89,7 +84,7 @@ async def workout_minutes(message: Message, state: FSMContext) -> None:
 async def workout_intensity(
     callback: CallbackQuery,
     state: FSMContext,
-    session_factory: async_sessionmaker,
+    ctx: UserContext,
 ) -> None:
     """
     Шаг 3: выбор интенсивности, расчёт калорий и сохранение тренировки.
@@ -100,40 +95,22 @@ async def workout_intensity(
     workout_type_text = data["type"]
     mins = int(data["minutes"])
 
-    async with session_factory() as session:
-        repo = Repo(session)
-        user = await repo.get_or_create_user(callback.from_user.id)
-
-        # Без веса нельзя корректно посчитать калории
-        if not user.weight_kg:
-            await callback.message.answer("Сначала настрой профиль: Создать профиль / Профиль")
-            await state.clear()
-            await show_menu_for_user(callback.message, session_factory, tg_id=callback.from_user.id)
-            await callback.answer()
-            return
-
-        # Расчёты
-        kcal = workout_kcal(workout_type_text, mins, intensity, float(user.weight_kg))
-        extra_water = workout_extra_water(mins)
-
-        # Обновление агрегатов за сегодня
-        st = await repo.get_or_create_day(user.id, date.today())
-        st.calories_out += float(kcal)
-        st.water_ml += int(extra_water)
-
-        # Лог тренировки
-        session.add(
-            WorkoutLog(
-                user_id=user.id,
-                day=date.today(),
-                workout_type=workout_type_text,
-                minutes=mins,
-                intensity=intensity,
-                kcal_burned=float(kcal),
-                extra_water_ml=int(extra_water),
-            )
-        )
-        await session.commit()
+    profile = await ctx.profile()
+
+    # Без веса нельзя корректно посчитать калории
+    if not profile.weight_kg:
+        await callback.message.answer("Сначала настрой профиль: Создать профиль / Профиль")
+        await state.clear()
+        await show_menu_for_user(callback.message, ctx)
+        await callback.answer()
+        return
+
+    # Расчёты
+    kcal = workout_kcal(workout_type_text, mins, intensity, float(profile.weight_kg))
+    extra_water = workout_extra_water(mins)
+
+    # Лог тренировки + агрегаты за сегодня
+    await ctx.add_workout(workout_type_text, mins, intensity, float(kcal), int(extra_water))
 
     intensity_txt = (
         "лёгкая"
@@ -151,5 +128,5 @@ async def workout_intensity(
     )
 
     await state.clear()
-    await show_menu_for_user(callback.message, session_factory, tg_id=callback.from_user.id)
+    await show_menu_for_user(callback.message, ctx)
     await callback.answer()
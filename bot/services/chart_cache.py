@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from datetime import date
+
+from bot.utils.cache import TTLCache
+
+
+def chart_digest(kind: str, payload: dict) -> str:
+    """
+    Хэш входных данных графика: одинаковые ряды - одинаковая картинка.
+    """
+    raw = json.dumps([kind, payload], sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class ChartCache:
+    """
+    Кэш отправленных графиков: (вид, хэш входных рядов) -> Telegram file_id.
+
+    Картинка уже лежит на серверах Telegram - при совпадении данных она отправляется
+    повторно по file_id, без рендера и загрузки байтов. Ключ адресуется содержимым,
+    поэтому одна запись годится всем пользователям с одинаковыми рядами.
+
+    Для инвалидации хранится, какой график пользователь видел последним и за какой
+    период: запись лога за день из этого периода (invalidate) удаляет запись заранее,
+    не дожидаясь вытеснения (по хэшу она бы и так больше не совпала).
+
+    Не потокобезопасен - рассчитан на использование из одного event loop.
+    """
+
+    def __init__(self, maxsize: int = 10_000, ttl_s: float = 7 * 24 * 3600):
+        # (kind, digest) -> file_id
+        self._files: TTLCache[tuple[str, str], str] = TTLCache(maxsize, ttl_s)
+        # (user_id, kind) -> (digest, первый день, последний день)
+        self._seen: TTLCache[tuple[int, str], tuple[str, date, date]] = TTLCache(maxsize, ttl_s)
+        self._kinds: set[str] = set()
+
+        self.invalidations = 0
+
+    def get(self, user_id: int, kind: str, digest: str, period: tuple[date, date]) -> str | None:
+        """
+        file_id графика с такими данными или None. При попадании запоминает,
+        что пользователь видит этот график за период period (для invalidate).
+        """
+        file_id = self._files.get((kind, digest))
+        if file_id is not None:
+            self._seen.set((user_id, kind), (digest, period[0], period[1]))
+        return file_id
+
+    def put(self, user_id: int, kind: str, digest: str, period: tuple[date, date], file_id: str) -> None:
+        """
+        Запоминает file_id отправленного графика и период его данных (для invalidate).
+        """
+        self._kinds.add(kind)
+        self._files.set((kind, digest), file_id)
+        self._seen.set((user_id, kind), (digest, period[0], period[1]))
+
+    def drop(self, kind: str, digest: str) -> None:
+        """
+        Удаляет запись (например, Telegram больше не принимает этот file_id).
+        """
+        self._files.pop((kind, digest))
+
+    def invalidate(self, user_id: int, day: date) -> None:
+        """
+        Запись лога пользователя за день day: графики, чей период включает этот день, устарели.
+        """
+        for kind in self._kinds:
+            seen = self._seen.get((user_id, kind))
+            if seen is None:
+                continue
+            digest, first, last = seen
+            if first <= day <= last:
+                self._files.pop((kind, digest))
+                self._seen.pop((user_id, kind))
+                self.invalidations += 1
+
+    def stats(self) -> dict:
+        """
+        Метрики: размер, попадания / промахи по file_id, инвалидации.
+        """
+        return {
+            "size": len(self._files),
+            "hits": self._files.hits,
+            "misses": self._files.misses,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,88 @@
+"""
+Кодирование графиков для отправки в Telegram: размер и формат - по виду графика.
+
+Telegram всё равно уменьшает фото до 1280 px по длинной стороне, поэтому
+рендерить крупнее бессмысленно - лишние байты при загрузке и на клиенте.
+Графики состоят из нескольких плоских цветов, поэтому PNG с палитрой
+(квантование Pillow) в разы меньше полноцветного почти без потери чёткости.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from io import BytesIO
+
+from PIL import Image
+from pydantic import BaseModel, ConfigDict
+
+
+class EncodeProfile(BaseModel):
+    """
+    Параметры кодирования графика одного вида.
+
+    max_side_px - длинная сторона картинки (для matplotlib из неё считается dpi);
+    colors - размер палитры PNG (None - полноцветный PNG).
+    """
+    model_config = ConfigDict(frozen=True)
+
+    max_side_px: int = 1280
+    colors: int | None = 64
+
+
+# Вид графика -> профиль; range_30 / range_90 / range_365 - по префиксу "range"
+PROFILES: dict[str, EncodeProfile] = {
+    # Две панели линий и подписи дат - нужен полный размер Telegram
+    "week": EncodeProfile(max_side_px=1280, colors=32),
+    # Два столбца - хватает и меньшего размера
+    "day": EncodeProfile(max_side_px=960, colors=32),
+    # Три панели, полупрозрачные линии - палитра побольше
+    "range": EncodeProfile(max_side_px=1280, colors=64),
+}
+
+DEFAULT_PROFILE = EncodeProfile()
+
+# Время последнего кодирования (квантование + PNG, без растеризации) в этом потоке - для метрик
+_local = threading.local()
+
+
+def profile_for(kind: str) -> EncodeProfile:
+    """
+    Профиль кодирования для вида графика.
+    """
+    return PROFILES.get(kind.split("_", 1)[0], DEFAULT_PROFILE)
+
+
+def last_encode_s() -> float:
+    """
+    Сколько заняло последнее кодирование в текущем потоке (секунды).
+    """
+    return getattr(_local, "encode_s", 0.0)
+
+
+def encode_image(img: Image.Image, profile: EncodeProfile) -> bytes:
+    """
+    PNG из готовой картинки: уменьшение до max_side_px и палитра из profile.colors цветов.
+    """
+    t0 = time.perf_counter()
+    if max(img.size) > profile.max_side_px:
+        scale = profile.max_side_px / max(img.size)
+        img = img.resize((round(img.width * scale), round(img.height * scale)), Image.Resampling.LANCZOS)
+    if profile.colors is not None:
+        # FASTOCTREE и без optimize - в разы быстрее MEDIANCUT / optimize, а файл больше лишь на ~10%
+        img = img.convert("RGB").quantize(colors=profile.colors, method=Image.Quantize.FASTOCTREE)
+
+    buf = BytesIO()
+    img.save(buf, format="PNG")
+    _local.encode_s = time.perf_counter() - t0
+    return buf.getvalue()
+
+
+def encode_figure(fig, profile: EncodeProfile) -> bytes:
+    """
+    PNG из фигуры matplotlib: dpi подбирается так, чтобы длинная сторона была
+    max_side_px; растр берётся из canvas без промежуточного PNG.
+    """
+    fig.set_dpi(profile.max_side_px / max(fig.get_size_inches()))
+    fig.canvas.draw()
+    img = Image.frombuffer("RGBA", fig.canvas.get_width_height(), fig.canvas.buffer_rgba(), "raw", "RGBA", 0, 1)
+    return encode_image(img, profile)
@@ -0,0 +1,263 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+logger = logging.getLogger("bot")
+
+
+class ChartError(Exception):
+    """
+    График не построен (очередь переполнена, таймаут, сбой рендера).
+    """
+
+
+class ChartBusy(ChartError):
+    """
+    Очередь рендера заполнена - запрос отклонён сразу, без ожидания.
+    """
+
+
+class ChartTimeout(ChartError):
+    """
+    Рендер не уложился в таймаут.
+    """
+
+
+# --- Код воркеров (выполняется в дочерних процессах) ---
+
+# Виды графиков, которые умеет лёгкий рендер (bot.services.plots_fast)
+FAST_KINDS = frozenset({"week", "day"})
+
+
+def _init_worker(engine: str) -> None:
+    """
+    Инициализация процесса пула: импорт рендера заранее, чтобы первый запрос
+    пользователя не платил за импорт. matplotlib (backend Agg) - только если он
+    основной движок, иначе он загрузится при первом сложном графике.
+    """
+    from bot.services import plots_fast
+
+    plots_fast.warmup()
+    if engine == "matplotlib":
+        from bot.services import plots
+
+        plots._pyplot()
+
+
+def _warmup() -> int:
+    """
+    Пустая задача: заставляет пул поднять процесс (и выполнить _init_worker).
+    """
+    return os.getpid()
+
+
+def render_chart(kind: str, payload: dict, engine: str = "fast") -> bytes:
+    """
+    Рендер графика по виду и данным (только простые типы - они передаются через pickle).
+
+    engine="fast" - простые виды (FAST_KINDS) рисует Pillow без matplotlib;
+    engine="matplotlib" или сложный вид - matplotlib (импортируется лениво).
+    """
+    if engine == "fast" and kind in FAST_KINDS:
+        from bot.services import plots_fast as plots
+    else:
+        from bot.services import plots
+
+    if kind == "week":
+        return plots.plot_week(payload["dates"], payload["water"], payload["cal_in"], payload["cal_out"])
+    if kind == "day":
+        return plots.plot_day(payload)
+    if kind.startswith("range_"):
+        # Длинный период - сложный график, только matplotlib
+        from bot.services import plots
+
+        return plots.plot_range(payload)
+    raise ValueError(f"unknown chart kind {kind!r}")
+
+
+def _render_job(kind: str, payload: dict, engine: str) -> tuple[bytes, float, float]:
+    """
+    Задача пула: (PNG, время рендера целиком, время кодирования PNG) - секунды, для метрик.
+    """
+    from bot.services import chart_encode
+
+    t0 = time.perf_counter()
+    png = render_chart(kind, payload, engine)
+    return png, time.perf_counter() - t0, chart_encode.last_encode_s()
+
+
+# --- Сторона event loop ---
+
+class ChartRenderer:
+    """
+    Рендер графиков (matplotlib) в пуле процессов, вне event loop бота.
+
+    - процессы пула стартуют заранее (start()) и уже импортировали рендер
+      (engine: "fast" - Pillow для простых графиков, "matplotlib" - всё через matplotlib с Agg);
+    - на вход - вид графика и данные из простых типов, на выходе - PNG в bytes
+      (формат и размер - по профилю вида, bot.services.chart_encode);
+    - очередь ограничена max_pending (выполняемые + ожидающие задачи): при переполнении
+      render() сразу бросает ChartBusy, а не копит запросы;
+    - у каждой задачи таймаут timeout_s (ChartTimeout); ещё не начатая задача при этом
+      снимается из очереди пула, а уже начатую процесс дорисует (прервать её нельзя) -
+      до этого она продолжает занимать место в max_pending;
+    - упавший пул (BrokenProcessPool, например OOM-kill воркера) пересоздаётся.
+
+    Процессы создаются через spawn: fork процесса с потоками (пулы перевода, драйвер БД)
+    небезопасен.
+    """
+
+    def __init__(
+        self,
+        workers: int = 2,
+        *,
+        max_pending: int = 16,
+        timeout_s: float = 10.0,
+        engine: str = "fast",
+    ):
+        self.workers = workers
+        self.engine = engine
+        self.max_pending = max_pending
+        self.timeout_s = timeout_s
+
+        self._pool = self._make_pool()
+        self._pending = 0
+
+        self.rendered = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.errors = 0
+        # Время рендера последних задач (секунды) - для p50 / p95
+        self._latencies: deque[float] = deque(maxlen=200)
+        # Вид графика (range_* - одной группой) -> [число, байт, с рендера, с кодирования, байт последнего]
+        self._by_kind: dict[str, list[float]] = {}
+
+    def _make_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.engine,),
+        )
+
+    async def start(self) -> None:
+        """
+        Поднимает все процессы пула заранее (прогрев).
+        """
+        loop = asyncio.get_running_loop()
+        t0 = time.perf_counter()
+        await asyncio.gather(*(loop.run_in_executor(self._pool, _warmup) for _ in range(self.workers)))
+        logger.info("chart renderer: %d workers ready in %.2fs", self.workers, time.perf_counter() - t0)
+
+    async def render(self, kind: str, payload: dict) -> bytes:
+        """
+        PNG графика kind ("week" / "day" / "range_<дней>") по данным payload.
+        Бросает ChartBusy / ChartTimeout / ChartError.
+        """
+        if self._pending >= self.max_pending:
+            self.rejected += 1
+            raise ChartBusy(f"chart queue is full ({self.max_pending})")
+
+        loop = asyncio.get_running_loop()
+        pool = self._pool
+        self._pending += 1
+        t0 = time.perf_counter()
+        try:
+            fut = pool.submit(_render_job, kind, payload, self.engine)
+        except BaseException:
+            self._pending -= 1
+            raise
+        # Место в очереди освобождается, когда задача действительно завершилась:
+        # после таймаута уже начатый рендер продолжает занимать воркер
+        fut.add_done_callback(lambda _: self._job_done(loop))
+
+        try:
+            png, render_s, encode_s = await asyncio.wait_for(asyncio.wrap_future(fut), self.timeout_s)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            fut.cancel()
+            raise ChartTimeout(f"chart {kind!r} timed out after {self.timeout_s:g}s") from None
+        except BrokenProcessPool as e:
+            self.errors += 1
+            # Остальные задачи упавшего пула получат ту же ошибку - пересоздаём один раз
+            if pool is self._pool:
+                logger.error("chart renderer pool is broken, restarting")
+                self._restart()
+            raise ChartError("chart renderer restarted") from e
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except Exception as e:
+            self.errors += 1
+            logger.exception("chart %r render failed", kind)
+            raise ChartError(str(e)) from e
+
+        self.rendered += 1
+        self._latencies.append(time.perf_counter() - t0)
+        self._record(kind, len(png), render_s, encode_s)
+        return png
+
+    def _job_done(self, loop: asyncio.AbstractEventLoop) -> None:
+        """
+        Колбэк завершения задачи пула (вызывается из служебного потока пула).
+        """
+        try:
+            loop.call_soon_threadsafe(self._release)
+        except RuntimeError:
+            # Event loop уже закрыт (остановка бота) - считать больше некому
+            pass
+
+    def _release(self) -> None:
+        self._pending -= 1
+
+    def _record(self, kind: str, size: int, render_s: float, encode_s: float) -> None:
+        acc = self._by_kind.setdefault(kind.split("_", 1)[0], [0, 0, 0.0, 0.0, 0])
+        acc[0] += 1
+        acc[1] += size
+        acc[2] += render_s
+        acc[3] += encode_s
+        acc[4] = size
+
+    def _restart(self) -> None:
+        broken, self._pool = self._pool, self._make_pool()
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def close(self) -> None:
+        """
+        Останавливает пул (ожидающие задачи отменяются).
+        """
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        """
+        Метрики: счётчики, глубина очереди, p50 / p95 времени рендера (мс, с ожиданием в очереди);
+        по видам графиков - средний / последний размер PNG и среднее время рендера / кодирования
+        в процессе пула.
+        """
+        lat = sorted(self._latencies)
+        p50 = lat[len(lat) // 2] if lat else None
+        p95 = lat[min(len(lat) - 1, int(len(lat) * 0.95))] if lat else None
+        result = {
+            "workers": self.workers,
+            "pending": self._pending,
+            "rendered": self.rendered,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+        }
+        for kind, (count, size, render_s, encode_s, last) in self._by_kind.items():
+            result[f"{kind}_count"] = count
+            result[f"{kind}_avg_kib"] = round(size / count / 1024, 1)
+            result[f"{kind}_last_kib"] = round(last / 1024, 1)
+            result[f"{kind}_render_ms"] = round(render_s / count * 1000, 1)
+            result[f"{kind}_encode_ms"] = round(encode_s / count * 1000, 1)
+        return result
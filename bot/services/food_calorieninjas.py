@@ -1,13 +1,30 @@
 from __future__ import annotations
 
 import asyncio
+import logging
+from typing import TYPE_CHECKING, Awaitable
+
 import aiohttp
 
+from bot.services import resilience
+from bot.services.http import ProviderError, use_session
+from bot.services.resilience import CircuitOpen
+
+if TYPE_CHECKING:
+    from bot.services.provider_cache import ProviderCache
+
+logger = logging.getLogger("bot")
+
+# Имя провайдера в кэше ответов и в метриках
+PROVIDER = "calorieninjas"
+
 
 async def search_calorieninjas(
     query: str,
     api_key: str,
     limit: int = 5,
+    session: aiohttp.ClientSession | None = None,
+    cache: ProviderCache | None = None,
 ) -> list[dict]:
     """
     Поиск продукта в CalorieNinjas.
@@ -21,30 +38,58 @@ async def search_calorieninjas(
 
     CalorieNinjas отдаёт калории на serving_size_g,
     здесь они приводятся к ккал на 100 г.
+
+    session - общий HTTP-клиент приложения (без него создаётся временный).
+    cache - кэш ответов (без него - запрос к API на каждый вызов).
+    Запросы к API идут через circuit breaker с адаптивным таймаутом (bot.services.resilience).
     """
     # Без API-ключа просто ничего не ищем
     if not api_key:
         return []
 
+    def fetch() -> Awaitable[list[dict]]:
+        # Breaker + адаптивный таймаут; попадания в кэш их не касаются
+        return resilience.guard(PROVIDER).call(lambda: _fetch_calorieninjas(query, api_key, session))
+
+    try:
+        results = await (fetch() if cache is None else cache.get_or_fetch(PROVIDER, query, fetch))
+    except CircuitOpen:
+        # Провайдер нездоров - пропускаем без запроса в сеть
+        return []
+    except ProviderError as e:
+        # Проблемы с сетью / таймаут - считаем, что данных нет
+        logger.warning("%s", e)
+        return []
+
+    return results[:limit]
+
+
+async def _fetch_calorieninjas(
+    query: str,
+    api_key: str,
+    session: aiohttp.ClientSession | None,
+) -> list[dict]:
+    """
+    Запрос к CalorieNinjas: все найденные продукты. Сбой API - ProviderError.
+    """
     url = "https://api.calorieninjas.com/v1/nutrition"
     headers = {"X-Api-Key": api_key}
     params = {"query": query}
 
-    # Таймауты, чтобы бот не зависал
-    timeout = aiohttp.ClientTimeout(total=6, connect=3, sock_read=3)
-
     try:
-        async with aiohttp.ClientSession(timeout=timeout) as session:
-            async with session.get(url, headers=headers, params=params) as r:
+        # Таймауты - из настроек общего клиента, чтобы бот не зависал
+        async with use_session(session) as http:
+            async with http.get(url, headers=headers, params=params) as r:
                 if r.status != 200:
-                    return []
+                    raise ProviderError(f"calorieninjas: HTTP {r.status}")
                 data = await r.json()
-    except (asyncio.TimeoutError, aiohttp.ClientError):
-        # Проблемы с сетью / таймаут - считаем, что данных нет
-        return []
-    except Exception:
+    except ProviderError:
+        raise
+    except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+        raise ProviderError(f"calorieninjas: {e!r}") from e
+    except Exception as e:
         # Любые неожиданные ошибки не должны ронять хэндлер
-        return []
+        raise ProviderError(f"calorieninjas: {e!r}") from e
 
     items = data.get("items", []) or []
     results: list[dict] = []
@@ -69,4 +114,4 @@ async def search_calorieninjas(
             }
         )
 
-    return results[:limit]
+    return results
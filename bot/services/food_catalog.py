@@ -0,0 +1,459 @@
+"""
+Офлайн-справочник продуктов (название, синонимы RU/EN, ккал/100г) в компактном
+бинарном формате, который читается через mmap без разбора в Python-объекты.
+
+Исходник - CSV (bot/data/food_catalog.csv), колонки:
+    name_ru, name_en, aliases (через «;»), kcal_per_100g
+
+Сборка бинарника (после правки CSV):
+    python -m bot.services.food_catalog build
+    python -m bot.services.food_catalog build --csv my.csv --out my.bin
+
+Проверка поиска:
+    python -m bot.services.food_catalog search "грудка кур"
+
+Формат файла (little-endian, все секции выровнены по 4 байта):
+    заголовок   MAGIC + 6 x u32: версия, n_items, n_keys, n_grams, n_postings, strings_len
+    kcal        f32[n_items]
+    item_off    u32[n_items], item_len u32[n_items] - отображаемое название в strings
+    key_off     u32[n_keys], key_len u32[n_keys], key_item u32[n_keys]
+                - ключи поиска (нормализованные названия и синонимы), отсортированы побайтно:
+                  префиксный поиск - бинарный поиск по ним
+    gram_hash   u32[n_grams] (отсортированы), gram_start u32[n_grams + 1]
+                - trigram-индекс: crc32 триграммы -> postings[gram_start[i]:gram_start[i + 1]]
+    postings    u32[n_postings] - номера ключей
+    strings     UTF-8
+"""
+from __future__ import annotations
+
+import argparse
+import bisect
+import csv
+import logging
+import mmap
+import struct
+import sys
+import time
+import zlib
+from collections import Counter
+from pathlib import Path
+
+from bot.db import fts
+
+logger = logging.getLogger("bot")
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+DEFAULT_CSV = DATA_DIR / "food_catalog.csv"
+DEFAULT_PATH = DATA_DIR / "food_catalog.bin"
+
+MAGIC = b"FOODCAT\0"
+VERSION = 1
+_HEADER = struct.Struct("<8s6I")
+
+# Нечёткие совпадения (опечатки): минимальная доля общих триграмм с запросом
+FUZZY_MIN_SIMILARITY = 0.6
+
+# Ограничения работы одного поиска на больших справочниках (см. FoodCatalog.search)
+CANDIDATES_PER_RESULT = 4
+MIN_COMMON_POSTINGS = 1000
+
+
+class CatalogFormatError(Exception):
+    """
+    Файл справочника повреждён или собран другой версией формата.
+    """
+
+
+def _gram_hash(gram: str) -> int:
+    return zlib.crc32(gram.encode("utf-8"))
+
+
+def _sorted_contains(seq, value: int) -> bool:
+    i = bisect.bisect_left(seq, value)
+    return i < len(seq) and seq[i] == value
+
+
+def _word_grams(text: str) -> list[str]:
+    """
+    Триграммы внутри слов (триграммы на стыке слов только шумят, как и в bot.db.fts).
+    """
+    return [g for g in fts.trigrams(text) if " " not in g]
+
+
+def read_csv(path: str | Path) -> list[tuple[str, list[str], float]]:
+    """
+    Строки CSV-исходника: (отображаемое название, ключи поиска, ккал/100г).
+    """
+    items: list[tuple[str, list[str], float]] = []
+    with open(path, encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            name_ru = (row.get("name_ru") or "").strip()
+            name_en = (row.get("name_en") or "").strip()
+            aliases = [a.strip() for a in (row.get("aliases") or "").split(";")]
+            name = name_ru or name_en
+            if not name:
+                continue
+            keys = list(dict.fromkeys(fts.normalize(k) for k in (name_ru, name_en, *aliases) if k.strip()))
+            items.append((name, keys, float(row["kcal_per_100g"])))
+    return items
+
+
+def build_catalog(items: list[tuple[str, list[str], float]], out: str | Path) -> int:
+    """
+    Компилирует справочник в бинарный файл (см. формат в описании модуля).
+    Возвращает размер файла в байтах.
+    """
+    strings = bytearray()
+    offsets: dict[str, tuple[int, int]] = {}
+
+    def intern(s: str) -> tuple[int, int]:
+        if s not in offsets:
+            b = s.encode("utf-8")
+            offsets[s] = (len(strings), len(b))
+            strings.extend(b)
+        return offsets[s]
+
+    item_refs = [intern(name) for name, _, _ in items]
+
+    # Один ключ может вести к нескольким продуктам («масло») - оставляем все пары
+    keys = sorted(
+        {(k.encode("utf-8"), i) for i, (_, ks, _) in enumerate(items) for k in ks}
+    )
+    key_refs = [intern(k.decode("utf-8")) for k, _ in keys]
+
+    postings_by_hash: dict[int, set[int]] = {}
+    for key_id, (k, _) in enumerate(keys):
+        for g in _word_grams(k.decode("utf-8")):
+            postings_by_hash.setdefault(_gram_hash(g), set()).add(key_id)
+
+    gram_hash = sorted(postings_by_hash)
+    gram_start = [0]
+    postings: list[int] = []
+    for h in gram_hash:
+        postings.extend(sorted(postings_by_hash[h]))
+        gram_start.append(len(postings))
+
+    def u32(values) -> bytes:
+        values = list(values)
+        return struct.pack(f"<{len(values)}I", *values)
+
+    body = b"".join((
+        struct.pack(f"<{len(items)}f", *(kcal for _, _, kcal in items)),
+        u32(off for off, _ in item_refs),
+        u32(ln for _, ln in item_refs),
+        u32(off for off, _ in key_refs),
+        u32(ln for _, ln in key_refs),
+        u32(i for _, i in keys),
+        u32(gram_hash),
+        u32(gram_start),
+        u32(postings),
+        bytes(strings),
+    ))
+    header = _HEADER.pack(MAGIC, VERSION, len(items), len(keys), len(gram_hash), len(postings), len(strings))
+
+    Path(out).write_bytes(header + body)
+    return len(header) + len(body)
+
+
+class _Keys:
+    """
+    Последовательность ключей поиска (bytes) поверх mmap - для bisect без копирования всех строк.
+    """
+
+    def __init__(self, catalog: FoodCatalog):
+        self._c = catalog
+
+    def __len__(self) -> int:
+        return self._c.n_keys
+
+    def __getitem__(self, i: int) -> bytes:
+        return self._c._key_bytes(i)
+
+
+class FoodCatalog:
+    """
+    Офлайн-справочник продуктов поверх mmap-файла (см. build_catalog).
+
+    Файл открывается лениво при первом поиске; данные не копируются в память
+    процесса - секции читаются через memoryview, страницы подгружает ОС.
+    Если файла нет или он повреждён - поиск просто возвращает [] (справочник опционален).
+
+    search(query) - подстрочный поиск с ранжированием как у поиска в БД (fts.rank_key):
+    1) префикс по отсортированным ключам (бинарный поиск);
+    2) все слова запроса подстроками - пересечение postings trigram-индекса;
+    3) если не добрали limit - нечёткие совпадения (опечатки) по доле общих триграмм.
+    """
+
+    def __init__(self, path: str | Path = DEFAULT_PATH):
+        self.path = Path(path)
+
+        self._file = None
+        self._mmap: mmap.mmap | None = None
+        self._views: list[memoryview] = []
+        self._failed = False
+
+        self.n_items = 0
+        self.n_keys = 0
+
+        self.lookups = 0
+        self.lookup_s_total = 0.0
+        self.load_s = 0.0
+
+    def _ensure_loaded(self) -> bool:
+        if self._mmap is not None:
+            return True
+        if self._failed:
+            return False
+        try:
+            self._load()
+        except (OSError, ValueError, struct.error, CatalogFormatError):
+            self._failed = True
+            logger.warning("food catalog %s unavailable", self.path, exc_info=True)
+            return False
+        return True
+
+    def _load(self) -> None:
+        t0 = time.perf_counter()
+        f = open(self.path, "rb")
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            f.close()
+            raise
+
+        magic, version, n_items, n_keys, n_grams, n_postings, strings_len = _HEADER.unpack_from(mm, 0)
+        if magic != MAGIC or version != VERSION:
+            mm.close()
+            f.close()
+            raise CatalogFormatError(f"{self.path}: unsupported catalog format")
+
+        expected = _HEADER.size + 4 * (3 * n_items + 3 * n_keys + 2 * n_grams + 1 + n_postings) + strings_len
+        if len(mm) < expected:
+            mm.close()
+            f.close()
+            raise CatalogFormatError(f"{self.path}: truncated catalog")
+
+        pos = _HEADER.size
+        buf = memoryview(mm)
+        self._views.append(buf)
+
+        def view(size: int) -> memoryview:
+            nonlocal pos
+            v = buf[pos:pos + size]
+            pos += size
+            self._views.append(v)
+            return v
+
+        def section(fmt: str, count: int):
+            raw = view(4 * count)
+            if sys.byteorder == "little":
+                arr = raw.cast(fmt)
+                self._views.append(arr)
+            else:
+                # Файл little-endian: на big-endian платформе - копия с переворотом байт
+                import array
+
+                arr = array.array(fmt, raw.tobytes())
+                arr.byteswap()
+            return arr
+
+        self._kcal = section("f", n_items)
+        self._item_off = section("I", n_items)
+        self._item_len = section("I", n_items)
+        self._key_off = section("I", n_keys)
+        self._key_len = section("I", n_keys)
+        self._key_item = section("I", n_keys)
+        self._gram_hash = section("I", n_grams)
+        self._gram_start = section("I", n_grams + 1)
+        self._postings = section("I", n_postings)
+        self._strings = view(strings_len)
+
+        self._file, self._mmap = f, mm
+        self.n_items, self.n_keys = n_items, n_keys
+        self._keys = _Keys(self)
+        self.load_s = time.perf_counter() - t0
+
+    def _release(self, mm: mmap.mmap, f) -> None:
+        # Сначала производные представления, потом исходное - иначе mmap не закрыть
+        for view in reversed(self._views):
+            view.release()
+        self._views.clear()
+        mm.close()
+        f.close()
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            self._release(self._mmap, self._file)
+            self._mmap = self._file = None
+
+    def _key_bytes(self, i: int) -> bytes:
+        off = self._key_off[i]
+        return bytes(self._strings[off:off + self._key_len[i]])
+
+    def _key(self, i: int) -> str:
+        return self._key_bytes(i).decode("utf-8")
+
+    def _item_name(self, item: int) -> str:
+        off = self._item_off[item]
+        return bytes(self._strings[off:off + self._item_len[item]]).decode("utf-8")
+
+    def _postings_for(self, gram: str) -> memoryview | None:
+        h = _gram_hash(gram)
+        i = bisect.bisect_left(self._gram_hash, h)
+        if i == len(self._gram_hash) or self._gram_hash[i] != h:
+            return None
+        return self._postings[self._gram_start[i]:self._gram_start[i + 1]]
+
+    def _prefix_keys(self, q: str, cap: int) -> list[int]:
+        qb = q.encode("utf-8")
+        lo = bisect.bisect_left(self._keys, qb)
+        # 0xFF не встречается в UTF-8 - верхняя граница всех ключей с префиксом qb
+        hi = bisect.bisect_left(self._keys, qb + b"\xff", lo)
+        return list(range(lo, min(hi, lo + cap)))
+
+    def _substring_keys(self, q: str, cap: int) -> list[int]:
+        words = [w for w in q.split() if len(w) >= 3]
+        grams = {g for w in words for g in _word_grams(w)}
+        if not grams:
+            return []
+
+        lists = []
+        for g in grams:
+            posting = self._postings_for(g)
+            if posting is None:
+                return []
+            lists.append(posting)
+        lists.sort(key=len)
+
+        ids = set(lists[0])
+        for posting in lists[1:]:
+            if len(ids) * 16 < len(posting):
+                # Кандидатов мало, список длинный - бинарный поиск по отсортированному списку
+                ids = {k for k in ids if _sorted_contains(posting, k)}
+            else:
+                ids.intersection_update(posting)
+            if not ids:
+                return []
+
+        # Триграммы могли совпасть в разных местах / по коллизии хэша - проверяем подстроки
+        found: list[int] = []
+        for k in sorted(ids):
+            key = self._key(k)
+            if all(w in key for w in words):
+                found.append(k)
+                if len(found) >= cap:
+                    break
+        return found
+
+    def _fuzzy_keys(self, q: str, cap: int) -> list[int]:
+        grams = list(dict.fromkeys(_word_grams(q)))[:fts.MAX_QUERY_TRIGRAMS]
+        if not grams:
+            return []
+        postings = [p for p in map(self._postings_for, grams) if p is not None]
+
+        # Слишком частые триграммы почти не различают кандидатов, а считать их дороже всего:
+        # кандидаты - по редким, частые засчитываем только уже найденным
+        common = max(MIN_COMMON_POSTINGS, self.n_keys // 10)
+        counts: Counter[int] = Counter()
+        for posting in postings:
+            if len(posting) <= common:
+                counts.update(posting)
+        for posting in postings:
+            if len(posting) > common and counts:
+                hits = set(posting)
+                for k in counts:
+                    if k in hits:
+                        counts[k] += 1
+
+        need = FUZZY_MIN_SIMILARITY * len(grams)
+        return [k for k, n in counts.most_common(cap) if n >= need]
+
+    def search(self, query: str, limit: int = 5, *, max_tier: int = 3) -> list[dict]:
+        """
+        До limit продуктов: [{"name": str, "kcal_per_100g": float}], лучшие совпадения первыми.
+        max_tier - худшая допустимая группа совпадения из fts.rank_key
+        (2 - только подстроки / все слова запроса, без нечётких).
+
+        На каждом шаге берётся не больше limit * CANDIDATES_PER_RESULT кандидатов:
+        на частых словах ранжируются первые по порядку ключей, а не все совпадения.
+        """
+        q = fts.normalize(query)
+        if not q or not self._ensure_loaded():
+            return []
+
+        t0 = time.perf_counter()
+        cap = limit * CANDIDATES_PER_RESULT
+
+        def found() -> int:
+            return len({self._key_item[k] for k in keys})
+
+        keys = set(self._prefix_keys(q, cap))
+        if found() < limit:
+            keys.update(self._substring_keys(q, cap))
+        if found() < limit:
+            keys.update(self._fuzzy_keys(q, cap))
+
+        # Для каждого продукта - лучший из совпавших ключей
+        best: dict[int, tuple] = {}
+        for k in keys:
+            key = self._key(k)
+            rank = fts.rank_key(key, q)
+            if rank[0] > max_tier or rank[0] == 3 and fts.similarity(key, q) < FUZZY_MIN_SIMILARITY:
+                continue
+            item = self._key_item[k]
+            if item not in best or rank < best[item]:
+                best[item] = rank
+
+        top = sorted(best, key=lambda item: (best[item], item))[:limit]
+        result = [
+            {"name": self._item_name(item), "kcal_per_100g": round(float(self._kcal[item]), 1)}
+            for item in top
+        ]
+
+        self.lookups += 1
+        self.lookup_s_total += time.perf_counter() - t0
+        return result
+
+    def stats(self) -> dict:
+        """
+        Метрики: размер справочника, время загрузки, число поисков и средняя латентность (мкс).
+        """
+        return {
+            "items": self.n_items,
+            "keys": self.n_keys,
+            "load_ms": round(self.load_s * 1000, 3),
+            "lookups": self.lookups,
+            "mean_lookup_us": round(self.lookup_s_total / self.lookups * 1e6, 1) if self.lookups else 0.0,
+        }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Офлайн-справочник продуктов")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_build = sub.add_parser("build", help="собрать бинарный справочник из CSV")
+    p_build.add_argument("--csv", default=str(DEFAULT_CSV))
+    p_build.add_argument("--out", default=str(DEFAULT_PATH))
+
+    p_search = sub.add_parser("search", help="поиск по справочнику")
+    p_search.add_argument("query")
+    p_search.add_argument("--path", default=str(DEFAULT_PATH))
+    p_search.add_argument("--limit", type=int, default=5)
+
+    args = parser.parse_args()
+
+    if args.cmd == "build":
+        items = read_csv(args.csv)
+        size = build_catalog(items, args.out)
+        print(f"{args.out}: {len(items)} продуктов, {size} байт")
+        return
+
+    catalog = FoodCatalog(args.path)
+    for it in catalog.search(args.query, args.limit):
+        print(f"{it['name']:<40} {it['kcal_per_100g']:>7} ккал/100г")
+    print(catalog.stats())
+    catalog.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,33 @@
 from __future__ import annotations
 
 import asyncio
+import logging
+from typing import TYPE_CHECKING, Awaitable
+
 import aiohttp
 
+from bot.services import resilience
+from bot.services.http import ProviderError, use_session
+from bot.services.resilience import CircuitOpen
+
+if TYPE_CHECKING:
+    from bot.services.provider_cache import ProviderCache
+
+logger = logging.getLogger("bot")
+
+# Имя провайдера в кэше ответов и в метриках
+PROVIDER = "openfoodfacts"
+
+# Сколько продуктов запрашивать у API (в кэше хранится одна страница на запрос, выдача режется по limit)
+PAGE_SIZE = 10
+
 
-async def search_openfoodfacts(query: str, limit: int = 5) -> list[dict]:
+async def search_openfoodfacts(
+    query: str,
+    limit: int = 5,
+    session: aiohttp.ClientSession | None = None,
+    cache: ProviderCache | None = None,
+) -> list[dict]:
     """
     Поиск продукта в OpenFoodFacts.
 
@@ -15,35 +38,65 @@ async def search_openfoodfacts(query: str, limit: int = 5) -> list[dict]:
       }
 
     Если API не отвечает или данных нет - возвращает пустой список.
+
+    session - общий HTTP-клиент приложения (без него создаётся временный).
+    cache - кэш ответов (без него - запрос к API на каждый вызов).
+    Запросы к API идут через circuit breaker с адаптивным таймаутом (bot.services.resilience).
+    """
+    page_size = max(limit, PAGE_SIZE)
+
+    def fetch() -> Awaitable[list[dict]]:
+        # Breaker + адаптивный таймаут; попадания в кэш их не касаются
+        return resilience.guard(PROVIDER).call(lambda: _fetch_openfoodfacts(query, page_size, session))
+
+    try:
+        results = await (fetch() if cache is None else cache.get_or_fetch(PROVIDER, query, fetch))
+    except CircuitOpen:
+        # Провайдер нездоров - пропускаем без запроса в сеть
+        return []
+    except ProviderError as e:
+        # Проблемы с сетью / таймаут
+        logger.warning("%s", e)
+        return []
+
+    return results[:limit]
+
+
+async def _fetch_openfoodfacts(
+    query: str,
+    page_size: int,
+    session: aiohttp.ClientSession | None,
+) -> list[dict]:
+    """
+    Запрос к OpenFoodFacts: первая страница результатов. Сбой API - ProviderError.
     """
     url = "https://world.openfoodfacts.org/cgi/search.pl"
     params = {
         "action": "process",
         "search_terms": query,
         "json": "true",
-        "page_size": str(limit),
+        "page_size": str(page_size),
     }
 
-    # Таймауты, чтобы бот не зависал
-    timeout = aiohttp.ClientTimeout(total=6, connect=3, sock_read=3)
-
     try:
-        async with aiohttp.ClientSession(timeout=timeout) as session:
-            async with session.get(url, params=params) as r:
+        # Таймауты - из настроек общего клиента, чтобы бот не зависал
+        async with use_session(session) as http:
+            async with http.get(url, params=params) as r:
                 if r.status != 200:
-                    return []
+                    raise ProviderError(f"openfoodfacts: HTTP {r.status}")
                 data = await r.json()
-    except (asyncio.TimeoutError, aiohttp.ClientError):
-        # Проблемы с сетью / таймаут
-        return []
-    except Exception:
+    except ProviderError:
+        raise
+    except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+        raise ProviderError(f"openfoodfacts: {e!r}") from e
+    except Exception as e:
         # Любые неожиданные ошибки не должны ронять хэндлер
-        return []
+        raise ProviderError(f"openfoodfacts: {e!r}") from e
 
     products = data.get("products", []) or []
     results: list[dict] = []
 
-    for p in products[:limit]:
+    for p in products[:page_size]:
         name = p.get("product_name") or p.get("generic_name") or "Без названия"
         nutr = p.get("nutriments", {}) or {}
         kcal100 = nutr.get("energy-kcal_100g")
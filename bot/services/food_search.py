@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable
+
+import aiohttp
+
+from bot.services.food_calorieninjas import search_calorieninjas
+from bot.services.food_catalog import FoodCatalog
+from bot.services.food_openfoodfacts import search_openfoodfacts
+from bot.services.provider_cache import ProviderCache
+from bot.services.translate import Translator, maybe_translate_ru_to_en
+
+logger = logging.getLogger("bot")
+
+# Приоритет источников при ранжировании: меньше - выше в выдаче
+SOURCE_PRIORITY = {
+    "myDB": 0,
+    "catalog": 1,
+    "CN": 2,
+    "CN-en": 3,
+    "OFF": 4,
+    "OFF-en": 5,
+}
+
+
+def rank_candidates(by_source: dict[str, list[dict]], limit: int = 5) -> list[dict]:
+    """
+    Сливает результаты источников в одну выдачу:
+    - порядок: приоритет источника (SOURCE_PRIORITY), внутри - порядок ответа источника;
+    - варианты без калорийности - в конец (их нельзя записать без ручного ввода);
+    - дедупликация по имени без учёта регистра (остаётся вариант из лучшего источника);
+    - не более limit штук.
+
+    Элементы выдачи: {"name": str, "kcal_per_100g": float | None, "source": str}.
+    """
+    ordered = sorted(
+        (
+            (it.get("kcal_per_100g") is None, SOURCE_PRIORITY.get(source, len(SOURCE_PRIORITY)), i, source, it)
+            for source, items in by_source.items()
+            for i, it in enumerate(items)
+        ),
+        key=lambda t: t[:3],
+    )
+
+    result: list[dict] = []
+    seen: set[str] = set()
+    for _, _, _, source, it in ordered:
+        name = (it.get("name") or "").strip()
+        key = name.lower()
+        if not name or key in seen:
+            continue
+        seen.add(key)
+        result.append({"name": name, "kcal_per_100g": it.get("kcal_per_100g"), "source": source})
+        if len(result) >= limit:
+            break
+    return result
+
+
+def _is_settled(by_source: dict[str, list[dict]], pending: set[str], limit: int) -> bool:
+    """
+    True, если ещё не ответившие источники уже не могут изменить топ-limit:
+    у ответивших источников, которые приоритетнее всех ожидаемых, набралось
+    limit разных вариантов с калорийностью.
+    """
+    if not pending:
+        return True
+
+    barrier = min(SOURCE_PRIORITY[s] for s in pending)
+    ahead = {s: items for s, items in by_source.items() if SOURCE_PRIORITY[s] < barrier}
+    top = rank_candidates(ahead, limit)
+    return len(top) >= limit and all(it["kcal_per_100g"] is not None for it in top)
+
+
+async def search_food(
+    query: str,
+    *,
+    local: Callable[[], Awaitable[list[dict]]] | None = None,
+    catalog: FoodCatalog | None = None,
+    calorieninjas_api_key: str = "",
+    translate_enabled: bool = False,
+    translator: Translator | None = None,
+    session: aiohttp.ClientSession | None = None,
+    cache: ProviderCache | None = None,
+    budget_s: float = 3.0,
+    limit: int = 5,
+) -> list[dict]:
+    """
+    Ищет продукт во всех источниках параллельно и возвращает ранжированную выдачу
+    (см. rank_candidates):
+    - local - поиск в локальной БД (FoodCustom), результат вида {"name", "kcal_per_100g"};
+    - catalog - офлайн-справочник (FoodCatalog): опрашивается первым, синхронно (микросекунды);
+      если он сам набрал limit вариантов, внешние API не вызываются вовсе;
+    - CalorieNinjas и OpenFoodFacts по исходному запросу;
+    - они же по английскому переводу запроса (перевод тоже идёт параллельно).
+
+    cache - кэш ответов внешних API (повторные запросы не тратят квоту и время);
+    translator - общий кэширующий переводчик.
+
+    Ждём не дольше budget_s: выходим раньше, как только ответившие источники
+    однозначно определили топ-limit. Не успевшие к этому моменту внешние запросы
+    отменяются; локальный поиск не отменяется (он работает с сессией БД апдейта) -
+    его дожидаемся, но в выдачу он попадает, только если успел.
+    """
+    translation: asyncio.Task | None = None
+
+    async def translated(search: Callable[[str], Awaitable[list[dict]]]) -> list[dict]:
+        # Один перевод на оба провайдера; shield - отмена одного не отменяет перевод для другого
+        tr = await asyncio.shield(translation)
+        return await search(tr) if tr else []
+
+    def cn(q: str) -> Awaitable[list[dict]]:
+        return search_calorieninjas(q, calorieninjas_api_key, limit=limit, session=session, cache=cache)
+
+    def off(q: str) -> Awaitable[list[dict]]:
+        return search_openfoodfacts(q, limit=limit, session=session, cache=cache)
+
+    by_source: dict[str, list[dict]] = {}
+    if catalog is not None:
+        by_source["catalog"] = catalog.search(query, limit)
+    # Справочник закрыл выдачу - внешние API только добирали бы пробелы, которых нет
+    offline = len(by_source.get("catalog", ())) >= limit
+
+    sources: dict[str, Awaitable[list[dict]]] = {}
+    if local is not None:
+        sources["myDB"] = local()
+    if not offline:
+        if calorieninjas_api_key:
+            sources["CN"] = cn(query)
+        sources["OFF"] = off(query)
+
+    if translate_enabled and not offline:
+        translation = asyncio.create_task(maybe_translate_ru_to_en(query, True, translator))
+        if calorieninjas_api_key:
+            sources["CN-en"] = translated(cn)
+        sources["OFF-en"] = translated(off)
+
+    tasks = {asyncio.create_task(coro): name for name, coro in sources.items()}
+    pending = set(tasks)
+    deadline = time.monotonic() + budget_s
+    settled = False
+
+    try:
+        while pending:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+
+            done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                name = tasks[task]
+                try:
+                    by_source[name] = task.result() or []
+                except Exception:
+                    # Источник упал - просто без его вариантов
+                    logger.warning("food source %s failed", name, exc_info=True)
+                    by_source[name] = []
+
+            settled = _is_settled(by_source, {tasks[t] for t in pending}, limit)
+            if settled:
+                break
+    finally:
+        # Опоздавшие внешние источники (и перевод) больше не нужны
+        waiting = [*pending, *([translation] if translation is not None else [])]
+        for task in waiting:
+            if tasks.get(task) != "myDB":
+                task.cancel()
+        if waiting:
+            await asyncio.gather(*waiting, return_exceptions=True)
+
+    if pending and not settled:
+        logger.info("food search %r: budget exceeded, skipped %s", query, sorted(tasks[t] for t in pending))
+
+    return rank_candidates(by_source, limit)
@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+import aiohttp
+from pydantic import BaseModel, ConfigDict
+
+
+class ProviderError(Exception):
+    """
+    Внешний API недоступен (сеть, таймаут, ответ не 200).
+
+    Отличает сбой от честного «ничего не найдено»: пустой результат можно
+    закэшировать как негативный, а сбой - нет.
+    """
+
+
+class HttpClientConfig(BaseModel):
+    """
+    Параметры общего HTTP-клиента для внешних API (погода, поиск еды).
+
+    limit / limit_per_host - лимиты соединений пула (всего и на один хост);
+    keepalive_s - сколько держать простаивающее соединение открытым (без нового TCP+TLS);
+    dns_ttl_s - время жизни кэша DNS-ответов;
+    timeout_* - таймауты запроса по умолчанию (секунды).
+    """
+    model_config = ConfigDict(frozen=True)
+
+    limit: int = 100
+    limit_per_host: int = 10
+    keepalive_s: float = 30.0
+    dns_ttl_s: int = 300
+
+    timeout_total_s: float = 6.0
+    timeout_connect_s: float = 3.0
+    timeout_read_s: float = 3.0
+
+
+def make_http_session(config: HttpClientConfig | None = None) -> aiohttp.ClientSession:
+    """
+    Создаёт ClientSession с пулом keep-alive соединений и кэшем DNS.
+
+    Одна сессия на приложение: создаётся в bot/main.py, передаётся в хэндлеры
+    через dp["http"] и закрывается при остановке бота.
+    """
+    config = config or HttpClientConfig()
+    connector = aiohttp.TCPConnector(
+        limit=config.limit,
+        limit_per_host=config.limit_per_host,
+        keepalive_timeout=config.keepalive_s,
+        ttl_dns_cache=config.dns_ttl_s,
+        use_dns_cache=True,
+    )
+    timeout = aiohttp.ClientTimeout(
+        total=config.timeout_total_s,
+        connect=config.timeout_connect_s,
+        sock_read=config.timeout_read_s,
+    )
+    return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+
+@asynccontextmanager
+async def use_session(session: aiohttp.ClientSession | None) -> AsyncIterator[aiohttp.ClientSession]:
+    """
+    Отдаёт переданную общую сессию как есть (не закрывая её),
+    а если сессии нет (скрипты, старые вызовы) - временную, закрываемую после запроса.
+    """
+    if session is not None:
+        yield session
+        return
+
+    async with make_http_session() as tmp:
+        yield tmp
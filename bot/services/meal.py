@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+import aiohttp
+
+from bot.db import fts
+from bot.services.food_calorieninjas import search_calorieninjas
+from bot.services.food_catalog import FoodCatalog
+from bot.services.provider_cache import ProviderCache
+from bot.services.translate import Translator, default_translator
+
+# Разделители продуктов в одном сообщении: перевод строки, «;», «+», запятая (не десятичная), «и» / «and»
+_SPLIT_RE = re.compile(r"\n|;|\+|,(?!\d)|\s+(?:и|and)\s+", re.IGNORECASE)
+
+# Количество с единицей: в начале («150 г курицы») или в конце («курица 150г») фрагмента
+_UNITS = r"кг|kg|килограмм\w*|г|гр|грамм\w*|g|gr|grams?|мл|ml|л|l|шт\.?|штук\w*|кус(?:ок|ка|ков|оч\w*)|ломтик\w*|pcs?|x"
+_QTY_HEAD_RE = re.compile(rf"^(\d+(?:[.,]\d+)?)\s*({_UNITS})?(?=\s|$)\.?\s*(.+)$", re.IGNORECASE)
+_QTY_TAIL_RE = re.compile(rf"^(.+?)\s+(\d+(?:[.,]\d+)?)\s*({_UNITS})?\.?$", re.IGNORECASE)
+
+# Окончания для stem(): сначала длинные
+_ENDING_RE = re.compile(r"(ами|ями|ого|его|ой|ей|ый|ий|ая|яя|ое|ее|ую|юю|ы|и|а|я|у|ю|е|о)$")
+
+# Для штучных продуктов число без единицы - штуки («2 котлеты», «6 яиц»), до MAX_PIECES
+MAX_PIECES = 20
+
+# У остальных число без единицы до этого значения - вес не указан («сахар 2» - не 2 г
+# и не 2 порции), больше - граммы («курица 150»)
+MAX_BARE_AMBIGUOUS = 5
+
+# Начала слов штучных продуктов (после fts.normalize) - только те, что весят порядка
+# DEFAULT_PIECE_G: мелкие (пельмени, конфеты) по штукам без веса оценились бы в разы выше
+_COUNTABLE = (
+    "яйц", "яиц", "банан", "яблок", "апельсин", "мандарин", "груш", "персик", "котлет",
+    "сосис", "сардел", "блин", "сырник", "бутерброд",
+    "egg", "banana", "apple", "orange",
+)
+
+# Вес одной штуки, если источник сам его не знает (только локальные источники)
+DEFAULT_PIECE_G = 100.0
+
+# Сколько продуктов максимум в одном сообщении
+MAX_ITEMS = 10
+
+
+@dataclass(frozen=True, slots=True)
+class MealItem:
+    """
+    Один продукт из сообщения: название, граммы (если указаны) или штуки.
+    """
+    name: str
+    grams: float | None
+    pieces: float | None
+
+
+def is_countable(name: str) -> bool:
+    """
+    True, если продукт обычно считают штуками (яйца, бананы, котлеты...).
+    """
+    return any(w.startswith(_COUNTABLE) for w in fts.normalize(name).split())
+
+
+def _grams(value: str, unit: str | None, name: str) -> tuple[float | None, float | None]:
+    """
+    (граммы, штуки) по числу и единице; кусок / ломтик - штуки. Число без единицы -
+    штуки только для штучного продукта (до MAX_PIECES); у остальных маленькое число
+    (до MAX_BARE_AMBIGUOUS) - вес не указан, большее - граммы: «рис 15» - 15 г.
+    """
+    n = float(value.replace(",", "."))
+    unit = (unit or "").lower().rstrip(".")
+    if unit.startswith(("кг", "kg", "килограмм")) or unit in ("л", "l"):
+        return n * 1000.0, None
+    if unit.startswith(("шт", "pc", "кус", "ломтик")) or unit == "x":
+        return None, n
+    if not unit and n <= MAX_PIECES and is_countable(name):
+        return None, n
+    if not unit and n <= MAX_BARE_AMBIGUOUS:
+        return None, None
+    # г / мл (плотность ~1) / число без единицы
+    return n, None
+
+
+def parse_meal(text: str) -> list[MealItem]:
+    """
+    Разбирает сообщение с несколькими продуктами:
+    «150г куриной грудки, 200 г риса и 2 яйца» / «chicken breast 150g + rice 200g».
+    """
+    items: list[MealItem] = []
+    for part in _SPLIT_RE.split(text or ""):
+        part = " ".join(part.split()).strip(" .-—")
+        if not part:
+            continue
+
+        grams = pieces = None
+        name = part
+        m = _QTY_HEAD_RE.match(part)
+        if m:
+            name = m.group(3)
+            grams, pieces = _grams(m.group(1), m.group(2), name)
+        else:
+            m = _QTY_TAIL_RE.match(part)
+            if m:
+                name = m.group(1)
+                grams, pieces = _grams(m.group(2), m.group(3), name)
+
+        name = name.strip(" .-—")
+        if name:
+            items.append(MealItem(name, grams, pieces))
+    return items[:MAX_ITEMS]
+
+
+def stem(name: str) -> str:
+    """
+    Грубое отсечение падежных окончаний русских слов («150 г риса» -> «рис»,
+    «куриной грудки» -> «курин грудк»): для подстрочного поиска этого хватает.
+    """
+    words = []
+    for w in fts.normalize(name).split():
+        if len(w) >= 4 and re.search(r"[а-яё]$", w):
+            w = _ENDING_RE.sub("", w) or w
+        words.append(w)
+    return " ".join(words)
+
+
+def is_meal(text: str) -> bool:
+    """
+    True, если сообщение - несколько продуктов сразу (для пакетного логирования вне /log_meal):
+    хотя бы у двух частей явно указано количество (граммы или штуки). Без этого
+    «Курица, грудка» или «гречка с молоком и сахаром» - один продукт, а не список.
+    """
+    items = parse_meal(text)
+    return sum(1 for it in items if it.grams is not None or it.pieces is not None) >= 2
+
+
+def _portion(item: MealItem, kcal100: float, name: str, source: str, serving_g: float | None = None) -> dict:
+    """
+    Строка итогового списка: граммы из сообщения, иначе - порция источника / штуки x DEFAULT_PIECE_G.
+    """
+    approx = False
+    if item.grams is not None:
+        grams = item.grams
+    elif serving_g:
+        grams = serving_g
+    else:
+        grams = (item.pieces or 1) * DEFAULT_PIECE_G
+        approx = True
+    return {
+        "name": name,
+        "grams": round(grams, 1),
+        "kcal_per_100g": round(kcal100, 1),
+        "kcal": round(kcal100 * grams / 100.0, 1),
+        "source": source,
+        "approx": approx,
+    }
+
+
+def _match_cn(wanted: list[str], found: list[dict]) -> list[dict | None]:
+    """
+    Сопоставляет продукты ответа CalorieNinjas запрошенным названиям: по похожести
+    названия; если похожих нет, а количество совпадает - по порядку (API сохраняет порядок).
+    """
+    result: list[dict | None] = [None] * len(wanted)
+    used: set[int] = set()
+    for i, name in enumerate(wanted):
+        best, score = None, 0.0
+        for j, it in enumerate(found):
+            if j in used or it.get("kcal_per_100g") is None:
+                continue
+            s = fts.similarity(it.get("name") or "", name)
+            if s > score:
+                best, score = j, s
+        positional = len(wanted) == len(found) and i not in used
+        if best is None and positional and found[i].get("kcal_per_100g") is not None:
+            best = i
+        if best is not None:
+            used.add(best)
+            result[i] = found[best]
+    return result
+
+
+async def resolve_meal(
+    items: list[MealItem],
+    *,
+    local: Callable[[str], Awaitable[dict | None]] | None = None,
+    catalog: FoodCatalog | None = None,
+    calorieninjas_api_key: str = "",
+    translate_enabled: bool = False,
+    translator: Translator | None = None,
+    session: aiohttp.ClientSession | None = None,
+    cache: ProviderCache | None = None,
+) -> list[dict | None]:
+    """
+    Подбирает калорийность для каждого продукта (порядок - как в items, None - не найден):
+    1) local(name) - свой продукт пользователя (FoodCustom), одно уверенное совпадение;
+    2) офлайн-справочник - только совпадения по подстроке, без нечётких;
+    3) всё, что не нашлось, - одним запросом к CalorieNinjas на естественном языке
+       («150g chicken breast, 200g rice»), через кэш ответов и breaker;
+       русские названия переводятся пачкой (Translator.translate_many).
+
+    Элементы: {"name", "grams", "kcal_per_100g", "kcal", "source", "approx"};
+    approx - вес не указан и взят как штуки x DEFAULT_PIECE_G.
+    """
+    result: list[dict | None] = [None] * len(items)
+
+    for i, item in enumerate(items):
+        # Как написано, затем без падежных окончаний
+        variants = list(dict.fromkeys((item.name, stem(item.name))))
+        for name in variants:
+            found = await local(name) if local is not None else None
+            if found is not None:
+                result[i] = _portion(item, found["kcal_per_100g"], found["name"], "myDB")
+                break
+        if result[i] is not None or catalog is None:
+            continue
+        for name in variants:
+            found_list = catalog.search(name, 1, max_tier=2)
+            if found_list:
+                result[i] = _portion(item, found_list[0]["kcal_per_100g"], found_list[0]["name"], "catalog")
+                break
+
+    missing = [i for i, r in enumerate(result) if r is None]
+    if not missing or not calorieninjas_api_key:
+        return result
+
+    names = [items[i].name for i in missing]
+    if translate_enabled:
+        translated = await (translator or default_translator()).translate_many(names)
+        names = [tr or name for tr, name in zip(translated, names)]
+
+    def phrase(item: MealItem, name: str) -> str:
+        if item.grams is not None:
+            return f"{item.grams:g}g {name}"
+        if item.pieces is not None:
+            return f"{item.pieces:g} {name}"
+        return name
+
+    query = ", ".join(phrase(items[i], name) for i, name in zip(missing, names))
+    found = await search_calorieninjas(
+        query, calorieninjas_api_key, limit=len(missing) * 3, session=session, cache=cache
+    )
+
+    for i, it in zip(missing, _match_cn(names, found)):
+        if it is None:
+            continue
+        serving_g = (it.get("raw") or {}).get("serving_size_g")
+        result[i] = _portion(items[i], float(it["kcal_per_100g"]), items[i].name, "CN", serving_g)
+    return result
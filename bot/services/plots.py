@@ -1,9 +1,21 @@
 from __future__ import annotations
 
-from io import BytesIO
 from datetime import date
 
-import matplotlib.pyplot as plt
+from bot.services.chart_encode import PROFILES, encode_figure
+
+
+def _pyplot():
+    """
+    matplotlib.pyplot с backend Agg. Импорт ленивый: он долгий и нужен только
+    сложным графикам - простые рисует bot.services.plots_fast.
+    """
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    return plt
 
 
 def plot_week(
@@ -19,6 +31,7 @@ def plot_week(
 
     Возвращает PNG в bytes (удобно для отправки в Telegram как BufferedInputFile).
     """
+    plt = _pyplot()
     fig = plt.figure(figsize=(10, 7))
 
     # 1) Вода
@@ -39,14 +52,11 @@ def plot_week(
     ax2.grid(True)
     ax2.legend()
 
-    # Сохраняем фигуру в память (bytes)
-    buf = BytesIO()
+    # Кодируем фигуру в PNG по профилю вида графика (размер под Telegram, палитра)
     plt.tight_layout()
-    fig.savefig(buf, format="png", dpi=160)
+    png = encode_figure(fig, PROFILES["week"])
     plt.close(fig)
-
-    buf.seek(0)
-    return buf.getvalue()
+    return png
 
 
 def plot_day(progress: dict) -> bytes:
@@ -71,6 +81,7 @@ def plot_day(progress: dict) -> bytes:
     cal_done = progress["calories_in"]
     cal_goal = progress["calorie_goal"]
 
+    plt = _pyplot()
     fig = plt.figure(figsize=(8, 4))
     ax = fig.add_subplot(1, 1, 1)
 
@@ -89,11 +100,69 @@ def plot_day(progress: dict) -> bytes:
     ax.grid(True, axis="y")
     ax.legend()
 
-    # Сохраняем фигуру в память (bytes)
-    buf = BytesIO()
+    # Кодируем фигуру в PNG по профилю вида графика (размер под Telegram, палитра)
     plt.tight_layout()
-    fig.savefig(buf, format="png", dpi=160)
+    png = encode_figure(fig, PROFILES["day"])
     plt.close(fig)
+    return png
+
+
+def plot_range(payload: dict) -> bytes:
+    """
+    Графики за длинный период (30 / 90 / 365 дней), данные - series.range_payload
+    (по дням) или series.weekly_range_payload (по неделям):
+    - вода (мл) по дням или средняя за неделю;
+    - калории: потреблено / сожжено + скользящее среднее потреблённых (7 / 28 дней);
+    - накопленный баланс калорий (относительно цели, если она известна).
+
+    Число точек ограничено на стороне сервера (бакеты / LTTB) - время рендера
+    не зависит от длины периода. Возвращает PNG в bytes.
+    """
+    plt = _pyplot()
+    from matplotlib.dates import AutoDateLocator, ConciseDateFormatter
+
+    days = payload["days"]
+    per = "в среднем за неделю" if payload["bucket_days"] > 1 else "по дням"
+    fig = plt.figure(figsize=(10, 9))
 
-    buf.seek(0)
-    return buf.getvalue()
+    # 1) Вода
+    ax1 = fig.add_subplot(3, 1, 1)
+    ax1.plot(payload["dates"], payload["water"])
+    ax1.set_title(f"Вода (мл) — {days} дней, {per}")
+    ax1.set_ylabel("мл")
+    ax1.grid(True)
+
+    # 2) Калории + тренд
+    ax2 = fig.add_subplot(3, 1, 2, sharex=ax1)
+    ax2.plot(payload["dates"], payload["cal_in"], label="Потреблено", alpha=0.6)
+    ax2.plot(payload["dates"], payload["cal_out"], label="Сожжено", alpha=0.6)
+    ax2.plot(
+        payload["avg_dates"],
+        payload["cal_in_avg"],
+        label=f"Потреблено, среднее за {payload['avg_days']} дней",
+        color="tab:purple",
+        linewidth=2,
+    )
+    ax2.set_title(f"Калории — {days} дней, {per}")
+    ax2.set_ylabel("ккал")
+    ax2.grid(True)
+    ax2.legend()
+
+    # 3) Накопленный баланс
+    ax3 = fig.add_subplot(3, 1, 3, sharex=ax1)
+    ax3.plot(payload["balance_dates"], payload["balance"], color="tab:green")
+    ax3.axhline(0, color="gray", linewidth=1)
+    title = "относительно цели" if payload["has_goal"] else "потреблено − сожжено"
+    ax3.set_title(f"Накопленный баланс калорий ({title})")
+    ax3.set_ylabel("ккал")
+    ax3.grid(True)
+
+    locator = AutoDateLocator()
+    ax3.xaxis.set_major_locator(locator)
+    ax3.xaxis.set_major_formatter(ConciseDateFormatter(locator))
+
+    # Кодируем фигуру в PNG по профилю вида графика (размер под Telegram, палитра)
+    plt.tight_layout()
+    png = encode_figure(fig, PROFILES["range"])
+    plt.close(fig)
+    return png
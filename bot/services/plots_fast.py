@@ -0,0 +1,215 @@
+"""
+Лёгкий рендер простых графиков (цель vs факт, короткие ряды) напрямую через Pillow.
+
+Без matplotlib: без фигур / осей / tight_layout и без тяжёлого импорта. Картинка
+рисуется в RGB (сглаженный текст) и кодируется как PNG с палитрой
+(bot.services.chart_encode) - несколько цветов графика плюс оттенки сглаживания.
+
+Сложные графики остаются за matplotlib (bot.services.plots).
+"""
+from __future__ import annotations
+
+import importlib.util
+import math
+import os
+from datetime import date
+from functools import lru_cache
+
+from PIL import Image, ImageDraw, ImageFont
+
+from bot.services.chart_encode import PROFILES, encode_image
+
+# Цвета - как у matplotlib по умолчанию (tab:blue / tab:orange), чтобы графики не отличались
+BLUE = (31, 119, 180)
+ORANGE = (255, 127, 14)
+GRID = (220, 220, 220)
+AXIS = (60, 60, 60)
+TEXT = (20, 20, 20)
+WHITE = (255, 255, 255)
+
+# Шрифт с кириллицей: системный DejaVu, иначе тот, что поставляется с matplotlib (без его импорта)
+_FONT_CANDIDATES = (
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/TTF/DejaVuSans.ttf",
+)
+
+
+def _font_path() -> str | None:
+    for path in _FONT_CANDIDATES:
+        if os.path.exists(path):
+            return path
+    spec = importlib.util.find_spec("matplotlib")
+    if spec is not None and spec.submodule_search_locations:
+        path = os.path.join(spec.submodule_search_locations[0], "mpl-data", "fonts", "ttf", "DejaVuSans.ttf")
+        if os.path.exists(path):
+            return path
+    return None
+
+
+@lru_cache(maxsize=8)
+def _font(size: int) -> ImageFont.FreeTypeFont | ImageFont.ImageFont:
+    path = _font_path()
+    if path is None:
+        return ImageFont.load_default()
+    return ImageFont.truetype(path, size)
+
+
+def warmup() -> None:
+    """
+    Загружает шрифты заранее (вызывается при старте процесса рендера).
+    """
+    for size in (13, 15, 16):
+        _font(size)
+
+
+def nice_ticks(vmax: float, n: int = 5) -> list[float]:
+    """
+    «Круглые» деления оси от 0 до не меньше vmax (шаг 1 / 2 / 2.5 / 5 x 10^k).
+    """
+    if vmax <= 0:
+        return [0.0, 1.0]
+    raw = vmax / n
+    mag = 10 ** math.floor(math.log10(raw))
+    step = next(m * mag for m in (1, 2, 2.5, 5, 10) if m * mag >= raw)
+    count = math.ceil(vmax / step - 1e-9)
+    return [i * step for i in range(count + 1)]
+
+
+def _fmt(v: float) -> str:
+    return f"{v:g}" if abs(v) < 1e5 else f"{v:.0f}"
+
+
+def _text_center(draw: ImageDraw.ImageDraw, xy: tuple[float, float], text: str, font, fill=TEXT) -> None:
+    draw.text(xy, text, font=font, fill=fill, anchor="mm")
+
+
+def _legend(draw: ImageDraw.ImageDraw, right: int, y: int, items: list[tuple[str, tuple]], font) -> None:
+    """
+    Легенда в одну строку над областью графика, прижата к правому краю (не закрывает данные).
+    """
+    x = right
+    for label, color in reversed(items):
+        x -= draw.textlength(label, font=font)
+        draw.text((x, y), label, font=font, fill=TEXT, anchor="lm")
+        draw.rectangle((x - 26, y - 5, x - 6, y + 5), fill=color)
+        x -= 42
+
+
+def _y_axis(draw: ImageDraw.ImageDraw, box: tuple[int, int, int, int], ticks: list[float], font) -> None:
+    """
+    Сетка и подписи оси Y в области box = (left, top, right, bottom).
+    """
+    left, top, right, bottom = box
+    for t in ticks:
+        y = bottom - (bottom - top) * t / ticks[-1]
+        draw.line((left, y, right, y), fill=GRID, width=1)
+        draw.text((left - 6, y), _fmt(t), font=font, fill=TEXT, anchor="rm")
+    draw.rectangle(box, outline=AXIS, width=1)
+
+
+def bar_goal_vs_done(
+    labels: list[str], goal: list[float], done: list[float], title: str, kind: str = "day"
+) -> bytes:
+    """
+    Столбцы «цель» (фон) и поверх «факт» для каждой категории - PNG в bytes
+    (кодирование - по профилю вида графика kind).
+    """
+    w, h = 800, 400
+    img = Image.new("RGB", (w, h), WHITE)
+    draw = ImageDraw.Draw(img)
+    font, title_font = _font(13), _font(16)
+
+    box = (70, 40, w - 20, h - 40)
+    left, top, right, bottom = box
+    ticks = nice_ticks(max([*goal, *done, 0.0]) * 1.05)
+
+    _text_center(draw, (w / 2, 20), title, title_font)
+    _y_axis(draw, box, ticks, font)
+
+    slot = (right - left) / len(labels)
+    bar_w = slot * 0.6
+    scale = (bottom - top) / ticks[-1]
+    for i, label in enumerate(labels):
+        cx = left + slot * (i + 0.5)
+        for value, color in ((goal[i], BLUE), (done[i], ORANGE)):
+            if value > 0:
+                draw.rectangle((cx - bar_w / 2, bottom - value * scale, cx + bar_w / 2, bottom), fill=color)
+        _text_center(draw, (cx, bottom + 16), label, font)
+
+    _legend(draw, right, top - 14, [("Цель", BLUE), ("Факт", ORANGE)], font)
+    return encode_image(img, PROFILES[kind])
+
+
+def _line_panel(
+    draw: ImageDraw.ImageDraw,
+    box: tuple[int, int, int, int],
+    dates: list[date],
+    series: list[tuple[str, list[float], tuple]],
+    title: str,
+    ylabel: str,
+) -> None:
+    """
+    Одна панель линейного графика: series = [(подпись, значения, цвет), ...].
+    """
+    font, title_font = _font(13), _font(15)
+    left, top, right, bottom = box
+    ticks = nice_ticks(max([v for _, values, _ in series for v in values] + [0.0]) * 1.05)
+
+    _text_center(draw, ((left + right) / 2, top - 16), title, title_font)
+    draw.text((left - 70, (top + bottom) / 2), ylabel, font=font, fill=TEXT, anchor="mm")
+    _y_axis(draw, box, ticks, font)
+
+    n = len(dates)
+    step = (right - left - 40) / max(1, n - 1)
+
+    def xy(i: int, v: float) -> tuple[float, float]:
+        return left + 20 + step * i, bottom - (bottom - top) * v / ticks[-1]
+
+    for i, d in enumerate(dates):
+        x, _ = xy(i, 0)
+        draw.line((x, bottom, x, bottom + 4), fill=AXIS)
+        _text_center(draw, (x, bottom + 14), d.strftime("%d.%m"), font)
+
+    for _, values, color in series:
+        points = [xy(i, v) for i, v in enumerate(values)]
+        if len(points) > 1:
+            draw.line(points, fill=color, width=3, joint="curve")
+        for x, y in points:
+            draw.ellipse((x - 3, y - 3, x + 3, y + 3), fill=color)
+
+    if len(series) > 1:
+        _legend(draw, right, top - 14, [(label, color) for label, _, color in series], font)
+
+
+def plot_week(dates: list[date], water: list[int], cal_in: list[float], cal_out: list[float]) -> bytes:
+    """
+    Недельный график (как plots.plot_week): вода и калории (потреблено / сожжено) - PNG в bytes.
+    """
+    w, h = 1000, 700
+    img = Image.new("RGB", (w, h), WHITE)
+    draw = ImageDraw.Draw(img)
+
+    _line_panel(draw, (100, 40, w - 20, h // 2 - 40), dates, [("Вода", water, BLUE)], "Вода (мл) — 7 дней", "мл")
+    _line_panel(
+        draw,
+        (100, h // 2 + 40, w - 20, h - 40),
+        dates,
+        [("Потреблено", cal_in, BLUE), ("Сожжено", cal_out, ORANGE)],
+        "Калории — 7 дней",
+        "ккал",
+    )
+    return encode_image(img, PROFILES["week"])
+
+
+def plot_day(progress: dict) -> bytes:
+    """
+    Прогресс за сегодня (как plots.plot_day): цель vs факт по воде и калориям.
+    """
+    return bar_goal_vs_done(
+        ["Вода (мл)", "Калории (ккал)"],
+        [float(progress["water_goal_ml"]), float(progress["calorie_goal"])],
+        [float(progress["water_ml"]), float(progress["calories_in"])],
+        "Прогресс за сегодня",
+    )
+
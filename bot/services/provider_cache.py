@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from bot.db.repo import Repo
+from bot.utils.cache import SingleFlight, TTLCache
+
+logger = logging.getLogger("bot")
+
+
+def normalize_query(query: str) -> str:
+    """
+    Ключ кэша по запросу: нижний регистр, без лишних пробелов.
+    """
+    return " ".join(query.lower().split())
+
+
+class ProviderCache:
+    """
+    Двухуровневый кэш ответов внешних API поиска еды, ключ - (провайдер, нормализованный запрос):
+    1) in-memory LRU + TTL (TTLCache) - без обращения к БД;
+    2) таблица provider_cache в БД приложения - переживает рестарт бота.
+
+    Непустой ответ живёт ttl_s, пустой («ничего не найдено») - negative_ttl_s.
+    Сбой API (ProviderError из fetch) не кэшируется и пробрасывается вызывающему.
+
+    Одновременные промахи по одному ключу склеиваются (SingleFlight):
+    пачка одинаковых запросов даёт один поход в БД и не больше одного - в API.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker | None = None,
+        *,
+        maxsize: int = 2000,
+        ttl_s: float = 7 * 24 * 3600,
+        negative_ttl_s: float = 3600,
+    ):
+        # None - только in-memory уровень
+        self.session_factory = session_factory
+        self.ttl_s = ttl_s
+        self.negative_ttl_s = negative_ttl_s
+
+        self._memory: TTLCache[tuple[str, str], list[dict]] = TTLCache(maxsize, ttl_s)
+        self._flights: SingleFlight[tuple[str, str], list[dict]] = SingleFlight()
+
+        self.db_hits = 0
+        self.upstream_calls = 0
+
+    async def get_or_fetch(
+        self,
+        provider: str,
+        query: str,
+        fetch: Callable[[], Awaitable[list[dict]]],
+    ) -> list[dict]:
+        """
+        Результат из кэша, иначе - fetch() с записью в оба уровня.
+        """
+        key = (provider, normalize_query(query))
+        cached = self._memory.get(key)
+        if cached is not None:
+            return cached
+        return await self._flights.do(key, lambda: self._load(key, fetch))
+
+    async def _load(self, key: tuple[str, str], fetch: Callable[[], Awaitable[list[dict]]]) -> list[dict]:
+        """
+        Промах памяти: смотрим в БД, затем идём в API.
+        """
+        provider, query = key
+        now = datetime.utcnow()
+
+        if self.session_factory is not None:
+            try:
+                async with self.session_factory() as session:
+                    entry = await Repo(session).get_provider_cache(provider, query)
+            except Exception:
+                logger.warning("provider cache read failed", exc_info=True)
+                entry = None
+
+            if entry is not None and entry.expires_at > now:
+                self.db_hits += 1
+                value = json.loads(entry.payload)
+                self._memory.set(key, value, (entry.expires_at - now).total_seconds())
+                return value
+
+        self.upstream_calls += 1
+        value = await fetch()
+
+        ttl = self.ttl_s if value else self.negative_ttl_s
+        self._memory.set(key, value, ttl)
+
+        if self.session_factory is not None:
+            try:
+                async with self.session_factory() as session:
+                    await Repo(session).put_provider_cache(
+                        provider, query, json.dumps(value, ensure_ascii=False), now + timedelta(seconds=ttl)
+                    )
+                    await session.commit()
+            except Exception:
+                # Второй уровень - best effort: ответ уже есть в памяти
+                logger.warning("provider cache write failed", exc_info=True)
+
+        return value
+
+    def stats(self) -> dict:
+        """
+        Метрики: попадания в память (hits / misses / hit_rate), в БД, походы в API, склеенные запросы.
+        """
+        return {
+            **self._memory.stats(),
+            "db_hits": self.db_hits,
+            "upstream_calls": self.upstream_calls,
+            "coalesced": self._flights.coalesced,
+        }
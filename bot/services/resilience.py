@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+import asyncio
+import bisect
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, TypeVar
+
+from pydantic import BaseModel, ConfigDict
+
+from bot.services.http import ProviderError
+
+logger = logging.getLogger("bot")
+
+T = TypeVar("T")
+
+# Границы корзин гистограммы латентности (мс), последняя корзина - всё, что больше
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpen(ProviderError):
+    """
+    Вызов не выполнялся: провайдер признан нездоровым (circuit breaker открыт).
+
+    Наследник ProviderError - для вызывающего кода это обычный сбой API
+    (не кэшируется, поиск идёт без этого источника).
+    """
+
+
+class BreakerConfig(BaseModel):
+    """
+    Параметры защиты вызовов внешнего API (circuit breaker + адаптивный таймаут).
+
+    window - сколько последних вызовов учитывать в статистике;
+    min_calls / failure_rate - breaker открывается, когда в окне не меньше min_calls
+      вызовов и доля неудачных (ошибка или таймаут) не меньше failure_rate;
+    open_s - сколько провайдер пропускается, прежде чем пробный вызов (half-open)
+      проверит, восстановился ли он;
+    timeout_min_s / timeout_max_s / timeout_p95_factor - таймаут вызова =
+      p95 латентности успешных вызовов в окне x factor, в пределах [min, max];
+      пока успешных вызовов меньше min_calls - timeout_max_s.
+    """
+    model_config = ConfigDict(frozen=True)
+
+    window: int = 50
+    min_calls: int = 5
+    failure_rate: float = 0.5
+    open_s: float = 30.0
+
+    timeout_min_s: float = 0.5
+    timeout_max_s: float = 6.0
+    timeout_p95_factor: float = 2.0
+
+
+class ProviderGuard:
+    """
+    Circuit breaker с адаптивным таймаутом для одного внешнего провайдера.
+
+    Состояния:
+    - closed - вызовы идут, результаты пишутся в скользящее окно;
+    - open - вызовы сразу получают CircuitOpen, без запроса в сеть;
+    - half_open - через open_s после открытия пропускается один пробный вызов:
+      успех закрывает breaker (окно очищается), неудача - снова open.
+
+    Не потокобезопасен - рассчитан на использование из одного event loop.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        config: BreakerConfig | None = None,
+        *,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.config = config or BreakerConfig()
+        self._clock = clock
+
+        # Последние вызовы: (успех, латентность в секундах)
+        self._window: deque[tuple[bool, float]] = deque(maxlen=self.config.window)
+        self.state = CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+
+        self.calls = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self.opened = 0
+        self._histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def timeout_s(self) -> float:
+        """
+        Текущий таймаут вызова: p95 успешных вызовов в окне x factor, в пределах [min, max].
+        """
+        c = self.config
+        p95 = self._percentile(0.95)
+        if p95 is None:
+            return c.timeout_max_s
+        return min(c.timeout_max_s, max(c.timeout_min_s, p95 * c.timeout_p95_factor))
+
+    def _percentile(self, q: float) -> float | None:
+        latencies = sorted(lat for ok, lat in self._window if ok)
+        if len(latencies) < self.config.min_calls:
+            return None
+        return latencies[min(len(latencies) - 1, int(len(latencies) * q))]
+
+    def _allow(self) -> bool:
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and self._clock() - self._opened_at >= self.config.open_s:
+            self.state = HALF_OPEN
+        # half-open: одновременно только один пробный вызов
+        if self.state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    async def call(self, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Выполняет fn() с текущим таймаутом, если breaker пропускает вызов.
+
+        Сбой (ProviderError или таймаут) учитывается в статистике и пробрасывается
+        как ProviderError; при открытом breaker - CircuitOpen без вызова fn.
+        """
+        if not self._allow():
+            self.rejected += 1
+            raise CircuitOpen(f"{self.name}: circuit open")
+
+        probe = self.state == HALF_OPEN
+        timeout = self.timeout_s()
+        t0 = self._clock()
+        try:
+            result = await asyncio.wait_for(fn(), timeout)
+        except asyncio.TimeoutError as e:
+            self.timeouts += 1
+            self._record(False, self._clock() - t0, probe)
+            raise ProviderError(f"{self.name}: timeout {timeout:.2f}s") from e
+        except ProviderError:
+            self._record(False, self._clock() - t0, probe)
+            raise
+        except BaseException:
+            # Отмена вызывающим (бюджет поиска) - не признак нездоровья провайдера
+            if probe:
+                self._probing = False
+            raise
+
+        self._record(True, self._clock() - t0, probe)
+        return result
+
+    def _record(self, ok: bool, latency_s: float, probe: bool) -> None:
+        self.calls += 1
+        if ok:
+            self._histogram[bisect.bisect_left(LATENCY_BUCKETS_MS, latency_s * 1000)] += 1
+        else:
+            self.failures += 1
+
+        if probe:
+            self._probing = False
+            if ok:
+                logger.info("provider %s recovered, circuit closed", self.name)
+                self.state = CLOSED
+                self._window.clear()
+            else:
+                self._open()
+        self._window.append((ok, latency_s))
+
+        if self.state == CLOSED and len(self._window) >= self.config.min_calls:
+            failed = sum(1 for ok_, _ in self._window if not ok_)
+            if failed / len(self._window) >= self.config.failure_rate:
+                logger.warning(
+                    "provider %s unhealthy (%d/%d failed), circuit open for %.0fs",
+                    self.name, failed, len(self._window), self.config.open_s,
+                )
+                self._open()
+
+    def _open(self) -> None:
+        self.state = OPEN
+        self._opened_at = self._clock()
+        self.opened += 1
+
+    def stats(self) -> dict:
+        """
+        Метрики: состояние, счётчики, доля ошибок в окне, текущий таймаут, p50/p95 (мс)
+        и гистограмма латентности успешных вызовов (le_<мс> - накопительно, как у Prometheus).
+        """
+        failed = sum(1 for ok, _ in self._window if not ok)
+        p50 = self._percentile(0.5)
+        p95 = self._percentile(0.95)
+        result = {
+            "state": self.state,
+            "calls": self.calls,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "rejected": self.rejected,
+            "opened": self.opened,
+            "error_rate": round(failed / len(self._window), 3) if self._window else 0.0,
+            "timeout_s": round(self.timeout_s(), 3),
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+        }
+        total = 0
+        for bound, count in zip((*LATENCY_BUCKETS_MS, "inf"), self._histogram):
+            total += count
+            result[f"le_{bound}ms" if bound != "inf" else "le_inf"] = total
+        return result
+
+
+# Guard'ы провайдеров: одни на процесс, параметры задаёт bot/main.py через configure()
+_config = BreakerConfig()
+_guards: dict[str, ProviderGuard] = {}
+
+
+def configure(config: BreakerConfig) -> None:
+    """
+    Задаёт параметры для всех guard'ов (уже созданные пересоздаются со сбросом статистики).
+    """
+    global _config
+    _config = config
+    for name in list(_guards):
+        _guards[name] = ProviderGuard(name, config)
+
+
+def guard(name: str) -> ProviderGuard:
+    """
+    Guard провайдера по имени (создаётся при первом обращении).
+    """
+    g = _guards.get(name)
+    if g is None:
+        g = _guards[name] = ProviderGuard(name, _config)
+    return g
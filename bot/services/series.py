@@ -0,0 +1,228 @@
+"""
+Ряды для графиков за длинный период (30 / 90 / 365 дней) на NumPy.
+
+Число точек на графике - и цена рендера - не зависит от длины истории:
+- до MAX_POINTS дней - ряды по дням из DayStat (дни без записей в БД отсутствуют),
+  тренды - скользящее среднее за 7 дней и накопленный баланс калорий;
+- дальше - из недельного роллапа WeekStat (календарные недели с понедельника):
+  средние за день по неделям (или по группам недель), скользящее среднее за 28 дней;
+- тренды прореживаются LTTB (Largest-Triangle-Three-Buckets): сохраняет форму кривой.
+"""
+from __future__ import annotations
+
+from datetime import date, timedelta
+
+import numpy as np
+
+# Больше точек на графике не нужно: дальше линии сливаются, а рендер дорожает
+MAX_POINTS = 60
+
+# Окно скользящего среднего, дней (и длина недельного бакета)
+ROLLING_DAYS = 7
+
+# Окно скользящего среднего для недельных периодов: на году 7-дневное слишком шумное
+ROLLING_DAYS_LONG = 28
+
+
+def dense_days(
+    rows: list[tuple[date, int, float, float]], start: date, end: date, step: int = 1
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Плотные массивы за [start, end] из строк (день, вода, калории in, калории out):
+    (есть ли данные за день, вода, in, out); дни без строки - нули.
+    step=7 - то же для недельных строк (день - понедельник недели, start - понедельник).
+    """
+    n = (end - start).days // step + 1
+    rows = [r for r in rows if start <= r[0] <= end]
+
+    # Индекс дня (недели) в окне - через ordinal, без перебора всех дат периода
+    idx = (np.fromiter((r[0].toordinal() for r in rows), dtype=np.int64, count=len(rows)) - start.toordinal()) // step
+    values = np.array([r[1:] for r in rows], dtype=np.float64).reshape(len(rows), 3)
+
+    has = np.zeros(n, dtype=bool)
+    has[idx] = True
+    dense = np.zeros((3, n), dtype=np.float64)
+    dense[:, idx] = values.T
+    return has, dense[0], dense[1], dense[2]
+
+
+def rolling_mean(values: np.ndarray, window: int, has: np.ndarray, weights: np.ndarray | None = None) -> np.ndarray:
+    """
+    Скользящее среднее за последние window точек по точкам с данными (has);
+    NaN, если в окне нет ни одной такой точки. weights - сколько дней в точке
+    (тогда values - суммы за эти дни); по умолчанию точка - один день.
+    """
+    n = len(values)
+    if weights is None:
+        weights = np.ones(n)
+    sums = np.cumsum(np.insert(np.where(has, values, 0.0), 0, 0.0))
+    counts = np.cumsum(np.insert(np.where(has, weights, 0.0), 0, 0.0))
+    hi = np.arange(1, n + 1)
+    lo = np.maximum(hi - window, 0)
+    total, count = sums[hi] - sums[lo], counts[hi] - counts[lo]
+    return np.divide(total, count, out=np.full(n, np.nan), where=count > 0)
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Индексы n_out точек ряда, выбранных LTTB: первая и последняя точки сохраняются,
+    из каждого промежуточного бакета - точка, образующая наибольший треугольник
+    с уже выбранной точкой и средним следующего бакета.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    result = np.empty(n_out, dtype=np.int64)
+    result[0], result[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nxt_hi = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[hi:nxt_hi].mean()
+        avg_y = y[hi:nxt_hi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(area.argmax())
+        result[i + 1] = a
+    return result
+
+
+def week_start(day: date) -> date:
+    """
+    Понедельник недели, в которую попадает day (как WeekStat.bucket).
+    """
+    return day - timedelta(days=day.weekday())
+
+
+def week_window(end: date, days: int, max_points: int = MAX_POINTS) -> tuple[date, int]:
+    """
+    (понедельник первой недели, сколько недель в бакете) для графика за days дней
+    по недельному роллапу: период расширяется назад до целых недель и целого числа
+    бакетов (бакет - неделя или несколько, если и недель больше max_points).
+    """
+    last = week_start(end)
+    weeks = (last - week_start(end - timedelta(days=days - 1))).days // ROLLING_DAYS + 1
+    per_bucket = -(-weeks // max_points)
+    weeks = -(-weeks // per_bucket) * per_bucket
+    return last - timedelta(weeks=weeks - 1), per_bucket
+
+
+def _dates(start: date, idx: np.ndarray, step: int = 1) -> list[date]:
+    return [start + timedelta(days=int(i) * step) for i in idx]
+
+
+def range_payload(
+    rows: list[tuple[date, int, float, float]],
+    end: date,
+    days: int,
+    calorie_goal: float | None = None,
+    max_points: int = MAX_POINTS,
+) -> dict:
+    """
+    Данные графика по дням за days (до max_points) дней, заканчивающихся end
+    (простые типы - для процесса рендера):
+    - dates / water / cal_in / cal_out - по дням; дни без данных - NaN (разрыв линии);
+    - avg_dates / cal_in_avg - скользящее среднее потреблённых калорий за 7 дней
+      (по дням, за которые есть данные);
+    - balance_dates / balance - накопленный баланс калорий: потреблено - сожжено - цель
+      (без цели - просто потреблено - сожжено) по дням, за которые есть данные.
+
+    Более длинные периоды - weekly_range_payload (по недельному роллапу).
+    """
+    start = end - timedelta(days=days - 1)
+    has, water, cal_in, cal_out = dense_days(rows, start, end)
+    x = np.arange(days, dtype=np.float64)
+
+    net = cal_in - cal_out
+    if calorie_goal:
+        net = net - calorie_goal
+    balance = np.cumsum(np.where(has, net, 0.0))
+    cal_in_avg = rolling_mean(cal_in, ROLLING_DAYS, has)
+
+    # Скользящее среднее определено не везде (NaN) - LTTB только по определённым точкам
+    avg_valid = np.flatnonzero(~np.isnan(cal_in_avg))
+    avg_idx = avg_valid[lttb(x[avg_valid], cal_in_avg[avg_valid], max_points)]
+    bal_idx = lttb(x, balance, max_points)
+
+    # Дни без данных - разрывы линий, а не провалы в ноль
+    water, cal_in_d, cal_out_d = (np.where(has, v, np.nan) for v in (water, cal_in, cal_out))
+
+    return {
+        "days": days,
+        "bucket_days": 1,
+        "avg_days": ROLLING_DAYS,
+        "has_goal": bool(calorie_goal),
+        "dates": _dates(start, np.arange(days)),
+        "water": np.round(water, 1).tolist(),
+        "cal_in": np.round(cal_in_d, 1).tolist(),
+        "cal_out": np.round(cal_out_d, 1).tolist(),
+        "avg_dates": _dates(start, avg_idx),
+        "cal_in_avg": np.round(cal_in_avg[avg_idx], 1).tolist(),
+        "balance_dates": _dates(start, bal_idx),
+        "balance": np.round(balance[bal_idx], 1).tolist(),
+    }
+
+
+def weekly_range_payload(
+    weeks: list[tuple[date, int, float, float]],
+    end: date,
+    days: int,
+    calorie_goal: float | None = None,
+    max_points: int = MAX_POINTS,
+) -> dict:
+    """
+    Данные графика за длинный период из недельного роллапа (те же ключи, что у range_payload);
+    weeks = [(понедельник, вода, калории in, калории out), ...] за недели из week_window:
+    - dates / water / cal_in / cal_out - средние за день по бакетам из недель (точка -
+      середина бакета); делитель - календарные дни бакета (у текущей недели - прошедшие):
+      сколько из них были с записями, роллап не хранит; бакеты без данных - NaN;
+    - cal_in_avg - скользящее среднее потреблённых калорий за 28 дней (4 недели);
+    - balance - накопленный баланс по неделям с данными (цель - на каждый день недели),
+      точка - последний день недели.
+    """
+    first, per_bucket = week_window(end, days, max_points)
+    has, water, cal_in, cal_out = dense_days(weeks, first, week_start(end), ROLLING_DAYS)
+    n = len(has)
+    x = np.arange(n, dtype=np.float64)
+
+    # Дней в неделе: 7, у текущей - прошедшие (включая сегодня)
+    week_days = np.full(n, float(ROLLING_DAYS))
+    week_days[-1] = end.weekday() + 1
+
+    net = cal_in - cal_out
+    if calorie_goal:
+        net = net - calorie_goal * week_days
+    balance = np.cumsum(np.where(has, net, 0.0))
+    cal_in_avg = rolling_mean(cal_in, ROLLING_DAYS_LONG // ROLLING_DAYS, has, week_days)
+
+    avg_valid = np.flatnonzero(~np.isnan(cal_in_avg))
+    avg_idx = avg_valid[lttb(x[avg_valid], cal_in_avg[avg_valid], max_points)]
+    bal_idx = lttb(x, balance, max_points)
+
+    # Бакеты из per_bucket недель: сумма за бакет / дни бакета
+    bucket_has = has.reshape(-1, per_bucket).any(axis=1)
+    bucket_days = week_days.reshape(-1, per_bucket).sum(axis=1)
+
+    def per_day(v: np.ndarray) -> np.ndarray:
+        total = np.where(has, v, 0.0).reshape(-1, per_bucket).sum(axis=1)
+        return np.where(bucket_has, total / bucket_days, np.nan)
+
+    step = ROLLING_DAYS * per_bucket
+    dates = [first + timedelta(days=i * step + int(d) // 2) for i, d in enumerate(bucket_days)]
+
+    return {
+        "days": days,
+        "bucket_days": step,
+        "avg_days": ROLLING_DAYS_LONG,
+        "has_goal": bool(calorie_goal),
+        "dates": dates,
+        "water": np.round(per_day(water), 1).tolist(),
+        "cal_in": np.round(per_day(cal_in), 1).tolist(),
+        "cal_out": np.round(per_day(cal_out), 1).tolist(),
+        # Середина / конец недели, но не позже сегодня
+        "avg_dates": [min(d, end) for d in _dates(first + timedelta(days=3), avg_idx, ROLLING_DAYS)],
+        "cal_in_avg": np.round(cal_in_avg[avg_idx], 1).tolist(),
+        "balance_dates": [min(d, end) for d in _dates(first + timedelta(days=6), bal_idx, ROLLING_DAYS)],
+        "balance": np.round(balance[bal_idx], 1).tolist(),
+    }
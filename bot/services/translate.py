@@ -1,6 +1,226 @@
 from __future__ import annotations
 
-async def maybe_translate_ru_to_en(text: str, enabled: bool) -> str | None:
+import asyncio
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from bot.db.repo import Repo
+from bot.services.provider_cache import normalize_query
+from bot.utils.cache import SingleFlight, TTLCache
+
+logger = logging.getLogger("bot")
+
+# Маркер промаха кэша ("" - закэшированное «перевод не нужен»)
+_MISS = object()
+
+
+class Translator:
+    """
+    Перевод коротких строк (запросы поиска еды) через deep_translator.GoogleTranslator.
+
+    - синхронный HTTP-вызов переводчика идёт в собственном ограниченном пуле потоков
+      (workers) с таймаутом timeout_s - медленный переводчик не блокирует event loop
+      и не занимает общий пул asyncio.to_thread;
+    - результат кэшируется по нормализованному тексту: in-memory LRU + TTL и таблица
+      provider_cache в БД (provider = "translate:<target>"), переживает рестарт;
+      «перевод не нужен» (совпал с исходным) тоже кэшируется, сбой/таймаут - нет;
+    - одновременные переводы одной строки склеиваются (SingleFlight);
+    - translate_many - пачка строк за один вызов: один SELECT по БД для промахов памяти,
+      остальное - параллельно через пул.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker | None = None,
+        *,
+        source: str = "auto",
+        target: str = "en",
+        workers: int = 2,
+        timeout_s: float = 3.0,
+        maxsize: int = 2000,
+        ttl_s: float = 30 * 24 * 3600,
+    ):
+        # None - только in-memory уровень
+        self.session_factory = session_factory
+        self.source = source
+        self.target = target
+        self.timeout_s = timeout_s
+        self.ttl_s = ttl_s
+        self.provider = f"translate:{target}"
+
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="translate")
+        self._memory: TTLCache[str, str] = TTLCache(maxsize, ttl_s)
+        self._flights: SingleFlight[str, str] = SingleFlight()
+
+        self.db_hits = 0
+        self.upstream_calls = 0
+        self.errors = 0
+        self.timeouts = 0
+
+    async def translate(self, text: str) -> str | None:
+        """
+        Перевод строки или None, если перевод не нужен (совпадает с исходным) либо не удался.
+        Ошибки переводчика не пробрасываются - перевод всегда опционален.
+        """
+        key = normalize_query(text)
+        if not key:
+            return None
+
+        cached = self._memory.get(key, _MISS)
+        if cached is _MISS:
+            try:
+                cached = await self._flights.do(key, lambda: self._load(key))
+            except Exception:
+                return None
+        return cached or None
+
+    async def translate_many(self, texts: list[str]) -> list[str | None]:
+        """
+        Переводит несколько строк за один вызов, порядок результатов - как у texts.
+        """
+        keys = [normalize_query(t) for t in texts]
+        found: dict[str, str] = {}
+        missing: list[str] = []
+        for key in dict.fromkeys(k for k in keys if k):
+            cached = self._memory.get(key, _MISS)
+            if cached is _MISS:
+                missing.append(key)
+            else:
+                found[key] = cached
+
+        # Промахи памяти - одним запросом в БД
+        if missing and self.session_factory is not None:
+            found.update(await self._read_db(missing))
+            missing = [k for k in missing if k not in found]
+
+        if missing:
+            results = await asyncio.gather(
+                *(self._flights.do(k, lambda k=k: self._upstream(k)) for k in missing),
+                return_exceptions=True,
+            )
+            found.update((k, r) for k, r in zip(missing, results) if isinstance(r, str))
+
+        return [found.get(k) or None for k in keys]
+
+    async def _load(self, key: str) -> str:
+        """
+        Промах памяти по одной строке: БД, затем переводчик.
+        """
+        if self.session_factory is not None:
+            found = await self._read_db([key])
+            if key in found:
+                return found[key]
+        return await self._upstream(key)
+
+    async def _read_db(self, keys: list[str]) -> dict[str, str]:
+        """
+        Живые записи из таблицы кэша (с прогревом памяти на оставшийся срок).
+        """
+        now = datetime.utcnow()
+        try:
+            async with self.session_factory() as session:
+                entries = await Repo(session).get_provider_cache_many(self.provider, keys)
+        except Exception:
+            logger.warning("translate cache read failed", exc_info=True)
+            return {}
+
+        found: dict[str, str] = {}
+        for key, entry in entries.items():
+            if entry.expires_at > now:
+                self.db_hits += 1
+                found[key] = json.loads(entry.payload)
+                self._memory.set(key, found[key], (entry.expires_at - now).total_seconds())
+        return found
+
+    async def _upstream(self, key: str) -> str:
+        """
+        Вызов переводчика в пуле потоков с таймаутом; результат - в оба уровня кэша.
+        Пустая строка - «перевод не нужен».
+        """
+        self.upstream_calls += 1
+        loop = asyncio.get_running_loop()
+        try:
+            translated = await asyncio.wait_for(
+                loop.run_in_executor(self._pool, self._translate_sync, key), self.timeout_s
+            )
+        except asyncio.TimeoutError:
+            # Поток доработает сам, но вызывающий его уже не ждёт
+            self.timeouts += 1
+            logger.warning("translate %r: timeout %.1fs", key, self.timeout_s)
+            raise
+        except Exception:
+            self.errors += 1
+            logger.warning("translate %r failed", key, exc_info=True)
+            raise
+
+        value = (translated or "").strip()
+        # Возвращаем перевод только если он реально отличается от исходного текста
+        if value.lower() == key:
+            value = ""
+
+        self._memory.set(key, value)
+        if self.session_factory is not None:
+            try:
+                async with self.session_factory() as session:
+                    await Repo(session).put_provider_cache(
+                        self.provider,
+                        key,
+                        json.dumps(value, ensure_ascii=False),
+                        datetime.utcnow() + timedelta(seconds=self.ttl_s),
+                    )
+                    await session.commit()
+            except Exception:
+                logger.warning("translate cache write failed", exc_info=True)
+
+        return value
+
+    def _translate_sync(self, text: str) -> str | None:
+        # Ленивая загрузка, чтобы не тащить зависимость без надобности
+        from deep_translator import GoogleTranslator
+
+        return GoogleTranslator(source=self.source, target=self.target).translate(text)
+
+    def close(self) -> None:
+        """
+        Останавливает пул потоков (незапущенные переводы отменяются, зависшие не ждём).
+        """
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        """
+        Метрики: попадания в память (hits / misses / hit_rate), в БД, вызовы переводчика,
+        ошибки и таймауты, склеенные запросы.
+        """
+        return {
+            **self._memory.stats(),
+            "db_hits": self.db_hits,
+            "upstream_calls": self.upstream_calls,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "coalesced": self._flights.coalesced,
+        }
+
+
+# Переводчик по умолчанию (только память) - для вызовов без общего экземпляра из bot/main.py
+_default: Translator | None = None
+
+
+def default_translator() -> Translator:
+    global _default
+    if _default is None:
+        _default = Translator()
+    return _default
+
+
+async def maybe_translate_ru_to_en(
+    text: str,
+    enabled: bool,
+    translator: Translator | None = None,
+) -> str | None:
     """
     Пытается перевести текст на английский язык.
 
@@ -9,23 +229,10 @@ async def maybe_translate_ru_to_en(text: str, enabled: bool) -> str | None:
     - None, если перевод отключён, не нужен или произошла ошибка.
 
     Используется как fallback, например, при поиске еды в англоязычных API.
+    translator - общий кэширующий переводчик (см. Translator), по умолчанию - default_translator().
     """
     # Перевод глобально выключен через настройки
     if not enabled:
         return None
 
-    try:
-        # Ленивая загрузка, чтобы не тащить зависимость без надобности
-        from deep_translator import GoogleTranslator
-
-        translated = GoogleTranslator(source="auto", target="en").translate(text)
-
-        # Возвращаем перевод только если он реально отличается от исходного текста
-        if translated and translated.strip().lower() != text.strip().lower():
-            return translated.strip()
-
-        return None
-
-    except Exception:
-        # Любые ошибки перевода не должны ломать основной сценарий
-        return None
+    return await (translator or default_translator()).translate(text)
@@ -1,14 +1,34 @@
 from __future__ import annotations
 
-import aiohttp
 import asyncio
+import logging
+import time
+from typing import Callable
+
+import aiohttp
+
+from bot.services import resilience
+from bot.services.http import ProviderError, use_session
+from bot.utils.cache import SingleFlight
+
+logger = logging.getLogger("bot")
+
+# Имя провайдера в метриках (breaker, латентность)
+PROVIDER = "openweather"
 
 
-async def get_temperature_c(city: str, api_key: str) -> float | None:
+async def get_temperature_c(
+    city: str,
+    api_key: str,
+    session: aiohttp.ClientSession | None = None,
+) -> float | None:
     """
     Получает текущую температуру воздуха в градусах Цельсия для указанного города
     через OpenWeather API.
 
+    session - общий HTTP-клиент приложения (без него создаётся временный).
+    Запрос идёт через circuit breaker с адаптивным таймаутом (bot.services.resilience).
+
     Возвращает:
     - float — температура в °C, если запрос успешен;
     - None — если город не задан, API вернул ошибку или произошла сетевая проблема.
@@ -16,6 +36,21 @@ async def get_temperature_c(city: str, api_key: str) -> float | None:
     if not city:
         return None
 
+    try:
+        return await resilience.guard(PROVIDER).call(lambda: _fetch_temperature(city, api_key, session))
+    except ProviderError:
+        # Сеть / таймаут / breaker открыт - без температуры
+        return None
+
+
+async def _fetch_temperature(
+    city: str,
+    api_key: str,
+    session: aiohttp.ClientSession | None,
+) -> float | None:
+    """
+    Запрос к OpenWeather. Город не найден - None; сбой API - ProviderError.
+    """
     url = "https://api.openweathermap.org/data/2.5/weather"
     params = {
         "q": city,
@@ -24,14 +59,14 @@ async def get_temperature_c(city: str, api_key: str) -> float | None:
         "lang": "ru",
     }
 
-    # Таймаут ограничиваем, чтобы бот не зависал
-    timeout = aiohttp.ClientTimeout(total=6, connect=3, sock_read=3)
-
     try:
-        async with aiohttp.ClientSession(timeout=timeout) as session:
-            async with session.get(url, params=params) as resp:
-                if resp.status != 200:
+        # Таймауты - из настроек общего клиента, чтобы бот не зависал
+        async with use_session(session) as http:
+            async with http.get(url, params=params) as resp:
+                if resp.status == 404:
                     return None
+                if resp.status != 200:
+                    raise ProviderError(f"{PROVIDER}: HTTP {resp.status}")
 
                 data = await resp.json()
                 main = data.get("main", {})
@@ -39,9 +74,194 @@ async def get_temperature_c(city: str, api_key: str) -> float | None:
 
                 return float(temp) if temp is not None else None
 
-    except (aiohttp.ClientError, asyncio.TimeoutError):
+    except ProviderError:
+        raise
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
         # Сеть / таймаут / DNS и т.п.
-        return None
-    except Exception:
+        raise ProviderError(f"{PROVIDER}: {e!r}") from e
+    except Exception as e:
         # Любые неожиданные ошибки не должны ломать основной сценарий
-        return None
+        raise ProviderError(f"{PROVIDER}: {e!r}") from e
+
+
+class WeatherService:
+    """
+    Температура по городам с кэшем, чтобы хэндлеры не ждали OpenWeather:
+    - свежее значение (моложе ttl_s) отдаётся из кэша;
+    - устаревшее, но не старше stale_s, тоже отдаётся сразу, а обновление идёт в фоне;
+    - при промахе ждём ответ не дольше wait_s, иначе None (запрос доработает и заполнит кэш);
+    - одновременные запросы одного города склеиваются (SingleFlight);
+    - «город не найден» (404) тоже кэшируется, на negative_ttl_s: хэндлеры не ждут
+      wait_s на каждом просмотре, а фоновое обновление такие города пропускает;
+    - run_refresher() заранее обновляет города пользователей, активных за active_window_s.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        session: aiohttp.ClientSession | None = None,
+        *,
+        ttl_s: float = 1800,
+        stale_s: float = 3 * 3600,
+        negative_ttl_s: float = 3600,
+        wait_s: float = 1.0,
+        refresh_interval_s: float = 600,
+        active_window_s: float = 3600,
+        refresh_concurrency: int = 5,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.api_key = api_key
+        self.session = session
+        self.ttl_s = ttl_s
+        self.stale_s = stale_s
+        self.negative_ttl_s = negative_ttl_s
+        self.wait_s = wait_s
+        self.refresh_interval_s = refresh_interval_s
+        self.active_window_s = active_window_s
+        self.refresh_concurrency = refresh_concurrency
+        self._clock = clock
+
+        # ключ города -> (время получения, температура; None - город не найден)
+        self._entries: dict[str, tuple[float, float | None]] = {}
+        # ключ города -> (последнее обращение, название города для запроса)
+        self._active: dict[str, tuple[float, str]] = {}
+        self._flights: SingleFlight[str, float | None] = SingleFlight()
+        # Ссылки на фоновые обновления (чтобы задачи не собрал GC)
+        self._background: set[asyncio.Task] = set()
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.errors = 0
+        self.not_found = 0
+
+    @staticmethod
+    def _key(city: str) -> str:
+        return " ".join(city.lower().split())
+
+    async def temperature(self, city: str | None) -> float | None:
+        """
+        Температура в городе (°C) или None, если город / ключ API не заданы
+        или значения нет и OpenWeather не ответил за wait_s.
+        """
+        if not city or not self.api_key:
+            return None
+
+        key = self._key(city)
+        now = self._clock()
+        self._active[key] = (now, city)
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            fetched_at, temp = entry
+            age = now - fetched_at
+            if temp is None:
+                # Город не найден - без повторного запроса до истечения negative_ttl_s
+                if age < self.negative_ttl_s:
+                    self.hits += 1
+                    return None
+            elif age < self.ttl_s:
+                self.hits += 1
+                return temp
+            if age < self.stale_s:
+                self.stale_hits += 1
+                self._refresh_in_background(key, city)
+                return temp
+
+        self.misses += 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(self._refresh(key, city)), self.wait_s)
+        except asyncio.TimeoutError:
+            return None
+
+    def _refresh_in_background(self, key: str, city: str) -> None:
+        task = asyncio.create_task(self._refresh(key, city))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _refresh(self, key: str, city: str) -> float | None:
+        """
+        Запрос к OpenWeather (один на город одновременно) с записью в кэш.
+        """
+        return await self._flights.do(key, lambda: self._fetch(key, city))
+
+    async def _fetch(self, key: str, city: str) -> float | None:
+        self.refreshes += 1
+        try:
+            temp = await resilience.guard(PROVIDER).call(lambda: _fetch_temperature(city, self.api_key, self.session))
+        except ProviderError:
+            # Сбой API: старое значение (если есть) не затираем
+            self.errors += 1
+            return self._entries.get(key, (0.0, None))[1]
+        if temp is None:
+            # Город не найден - кэшируем отрицательный результат (negative_ttl_s)
+            self.not_found += 1
+        self._entries[key] = (self._clock(), temp)
+        return temp
+
+    def age_s(self, city: str) -> float | None:
+        """
+        Возраст закэшированного значения для города (секунды) или None.
+        """
+        entry = self._entries.get(self._key(city))
+        return None if entry is None else self._clock() - entry[0]
+
+    async def refresh_active(self) -> int:
+        """
+        Обновляет города активных пользователей, чьё значение устареет до следующего прохода.
+        Неактивные города забываются. Возвращает количество обновлённых городов.
+        """
+        now = self._clock()
+        for key in [k for k, (seen, _) in self._active.items() if now - seen > self.active_window_s]:
+            del self._active[key]
+            self._entries.pop(key, None)
+
+        due = [
+            (key, city)
+            for key, (_, city) in self._active.items()
+            if (entry := self._entries.get(key, (float("-inf"), 0.0)))[1] is not None
+            and now - entry[0] > self.ttl_s - self.refresh_interval_s
+        ]
+        sem = asyncio.Semaphore(self.refresh_concurrency)
+
+        async def one(key: str, city: str) -> None:
+            async with sem:
+                await self._refresh(key, city)
+
+        await asyncio.gather(*(one(key, city) for key, city in due))
+        return len(due)
+
+    async def run_refresher(self) -> None:
+        """
+        Фоновая задача: раз в refresh_interval_s обновляет города активных пользователей.
+        """
+        while True:
+            await asyncio.sleep(self.refresh_interval_s)
+            try:
+                await self.refresh_active()
+            except Exception:
+                logger.exception("weather refresh failed")
+
+    def stats(self) -> dict:
+        """
+        Метрики: попадания (в т.ч. устаревшие и «не найден»), промахи, hit rate,
+        возраст значений, обновления.
+        """
+        total = self.hits + self.stale_hits + self.misses
+        now = self._clock()
+        ages = [now - fetched_at for fetched_at, temp in self._entries.values() if temp is not None]
+        return {
+            "cities": len(ages),
+            "unknown_cities": len(self._entries) - len(ages),
+            "active_cities": len(self._active),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.stale_hits) / total, 3) if total else 0.0,
+            "max_age_s": round(max(ages), 1) if ages else 0.0,
+            "mean_age_s": round(sum(ages) / len(ages), 1) if ages else 0.0,
+            "refreshes": self.refreshes,
+            "errors": self.errors,
+            "not_found": self.not_found,
+        }
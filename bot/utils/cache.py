@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Generic, Hashable, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+# Маркер «нет значения» (None - допустимое значение в кэше)
+_MISSING: Any = object()
+
+
+class TTLCache(Generic[K, V]):
+    """
+    Ограниченный по размеру in-memory кэш: вытеснение LRU + время жизни записи (TTL).
+
+    Не потокобезопасен - рассчитан на использование из одного event loop.
+    Считает попадания/промахи, чтобы эффект можно было проверить по метрикам.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl_s: float,
+        *,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.maxsize = maxsize
+        self.ttl_s = ttl_s
+        self._clock = clock
+
+        # key -> (expires_at, value); порядок = давность использования
+        self._data: OrderedDict[K, tuple[float, V]] = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: K, default: V | None = None) -> V | None:
+        """
+        Возвращает значение по ключу или default, если записи нет или она устарела.
+        """
+        entry = self._data.get(key, _MISSING)
+        if entry is _MISSING:
+            self.misses += 1
+            return default
+
+        expires_at, value = entry
+        if expires_at <= self._clock():
+            del self._data[key]
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: K, value: V, ttl_s: float | None = None) -> None:
+        """
+        Кладёт значение в кэш. ttl_s - индивидуальный TTL записи (по умолчанию общий).
+        """
+        ttl = self.ttl_s if ttl_s is None else ttl_s
+        self._data[key] = (self._clock() + ttl, value)
+        self._data.move_to_end(key)
+
+        # Вытесняем самые давно использованные записи
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: K) -> None:
+        """
+        Удаляет запись (инвалидация), если она есть.
+        """
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """
+        Полностью очищает кэш (счётчики сохраняются).
+        """
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        """
+        Счётчики для метрик: размер, попадания, промахи, hit rate.
+        """
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+class SingleFlight(Generic[K, V]):
+    """
+    Склейка одновременных одинаковых запросов (single-flight): пока для ключа
+    выполняется fn, остальные вызовы с тем же ключом ждут её результат,
+    а не запускают свою копию. Исключение fn получают все ожидающие.
+
+    fn выполняется в отдельной задаче: отмена любого из ожидающих (например,
+    по бюджету времени) не отменяет общий запрос - он доработает для остальных.
+    """
+
+    def __init__(self):
+        self._inflight: dict[K, asyncio.Task] = {}
+        self.coalesced = 0
+
+    async def do(self, key: K, fn: Callable[[], Awaitable[V]]) -> V:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, k=key: self._forget(k, t))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key: K, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Исключение доставлено ожидающим (или им уже никто не интересуется) - без «never retrieved»
+        if not task.cancelled():
+            task.exception()
+
+    def __len__(self) -> int:
+        return len(self._inflight)
@@ -1,9 +1,8 @@
 from __future__ import annotations
 
 from aiogram.types import Message
-from sqlalchemy.ext.asyncio import async_sessionmaker
 
-from bot.db.repo import Repo
+from bot.context_mw import UserContext
 from bot.menu import menu_full, menu_new_user
 
 
@@ -19,30 +18,18 @@ def has_profile(u) -> bool:
 
 async def show_menu_for_user(
     message: Message,
-    session_factory: async_sessionmaker,
+    ctx: UserContext,
     text_msg: str = "Меню 👇",
-    *,
-    tg_id: int | None = None,
 ) -> None:
     """
     Показывает пользователю меню (новичок/полное) в зависимости от наличия профиля.
 
-    tg_id:
-      - если передан явно — используем его;
-      - иначе берём message.from_user.id (и только если это не бот).
+    Профиль берётся из контекста апдейта (ctx): из кэша профилей
+    или из уже загруженного хэндлером пользователя - без лишних запросов к БД.
     """
-    # Определяем фактический tg_id
-    actual_tg_id = tg_id
-    if actual_tg_id is None and message.from_user and not message.from_user.is_bot:
-        actual_tg_id = message.from_user.id
+    profile = await ctx.profile()
 
-    async with session_factory() as session:
-        repo = Repo(session)
-
-        # Создаём пользователя при первом обращении (по tg_id)
-        user = await repo.get_or_create_user(actual_tg_id)
-
-        # Выбираем нужную клавиатуру в зависимости от профиля
-        keyboard = menu_full() if has_profile(user) else menu_new_user()
+    # Выбираем нужную клавиатуру в зависимости от профиля
+    keyboard = menu_full() if has_profile(profile) else menu_new_user()
 
     await message.answer(text_msg, reply_markup=keyboard)